@@ -0,0 +1,227 @@
+'''
+Batch of boards for badukpy, run in lockstep with numpy
+
+N positions of one size live in one (N, size+2, size+2) int8 array with
+the same codes and border as simple_go.Board, so flat index y*stride + x
+means the same point in both. Every step plays one move in every game at
+once: the stone is written with one fancy index, neighbours of the moves
+are gathered with the four flat offsets, and captures, suicide and
+territory are found by batched flood fill, growing a mask by one
+dilation step (a shift in all four directions) per iteration for all
+games together until no game changes any more.
+
+Flood fills only run on the games that need them: captures only where
+the move touches an opponent stone, the suicide check only where the
+move has no empty neighbour. Suicide is not ruled out before the move;
+a game whose move turns out to be suicide gets it taken back and passes
+instead.
+
+Needs numpy.
+'''
+
+import numpy
+from simple_go import EMPTY_CODE, BLACK_CODE, WHITE_CODE, BORDER_CODE, \
+     BLACK, WHITE, color_code, board_geometry
+
+other = numpy.array([EMPTY_CODE, WHITE_CODE, BLACK_CODE, BORDER_CODE], numpy.int8)
+
+class BatchBoard:
+    def __init__(self, size, count):
+        """Initialize count empty boards:
+              argument: size, count
+        """
+        self.size = size
+        self.count = count
+        self.geometry = board_geometry(size)
+        self.stride = size + 2
+        self.area = self.stride * self.stride
+        stride = self.stride
+        #down, up, left, right: same as BoardGeometry.offsets
+        self.offsets = numpy.array([-stride, stride, -1, 1])
+        #board[game, y, x], stones the flat (count, area) view of it
+        empty = numpy.frombuffer(self.geometry.empty_board, numpy.int8)
+        self.stones = numpy.tile(empty, (count, 1))
+        self.board = self.stones.reshape((count, stride, stride))
+        self.side = numpy.empty(count, numpy.int8)  # colour code to move
+        self.side[:] = BLACK_CODE
+        self.captures = numpy.zeros((count, 3), numpy.int32)  # by colour code
+        self.ko = numpy.zeros(count, numpy.int32)  # ko point, 0 if none
+        self.passes = numpy.zeros(count, numpy.int32)  # passes in a row
+        self.moves = 0  # steps played
+
+    def dilate(self, mask):
+        ''' (count, area) bool mask grown by one step in all four
+            directions. Not clipped: callers and it with a mask of real
+            points, which the border never is.
+        '''
+        stride = self.stride
+        grown = mask.copy()
+        grown[:, 1:] |= mask[:, :-1]
+        grown[:, :-1] |= mask[:, 1:]
+        grown[:, stride:] |= mask[:, :-stride]
+        grown[:, :-stride] |= mask[:, stride:]
+        return grown
+
+    def flood(self, seed, inside):
+        ''' the parts of inside connected to seed, by dilation inside
+            inside until no game changes
+        '''
+        fill = seed & inside
+        while True:
+            grown = self.dilate(fill) & inside
+            if numpy.array_equal(grown, fill):
+                return fill
+            fill = grown
+
+    def breathing(self, stones, code):
+        ''' stones of colour code (one code per row) that are in a chain
+            with a liberty
+        '''
+        own = stones == code[:, None]
+        return self.flood(self.dilate(stones == EMPTY_CODE), own)
+
+    def candidates(self):
+        ''' (count, area) bool: empty points that are not ko and not an
+            eye of the side to move (all neighbours own stones or border)
+        '''
+        stones = self.stones
+        empty = stones == EMPTY_CODE
+        wall = (stones == self.side[:, None]) | (stones == BORDER_CODE)
+        stride = self.stride
+        eye = empty.copy()
+        eye[:, stride:-stride] &= wall[:, :-2 * stride]
+        eye[:, stride:-stride] &= wall[:, 2 * stride:]
+        eye[:, 1:-1] &= wall[:, :-2]
+        eye[:, 1:-1] &= wall[:, 2:]
+        result = empty & ~eye
+        result[numpy.arange(self.count), self.ko] = False
+        return result
+
+    def random_moves(self):
+        ''' one uniformly random point from candidates per game, 0 (pass)
+            for games without one
+        '''
+        allowed = self.candidates()
+        keys = numpy.random.random_sample(allowed.shape)
+        keys[~allowed] = -1.0
+        points = keys.argmax(1)
+        points[~allowed.any(1)] = 0
+        return points
+
+    def play(self, points):
+        """Play one move per game: points are flat indexes, 0 to pass.
+              The points must be empty and not ko (see candidates).
+              A move that would be suicide is taken back and the game
+              passes. Every game changes sides.
+              Returns a bool array, true where a stone was played.
+        """
+        stones = self.stones
+        points = numpy.asarray(points)
+        games = numpy.flatnonzero(points)
+        moved = points[games]
+        code = self.side[games]
+        stones[games, moved] = code
+        around = stones[games[:, None], moved[:, None] + self.offsets]
+        captured_count = numpy.zeros(len(games), numpy.int32)
+        captured_point = numpy.zeros(len(games), numpy.int32)
+
+        #captures, where the move touches an opponent stone
+        touch = numpy.flatnonzero((around == other[code][:, None]).any(1))
+        if len(touch):
+            rows = games[touch]
+            sub = stones[rows]
+            opponent = other[code[touch]]
+            dead = (sub == opponent[:, None]) & ~self.breathing(sub, opponent)
+            sub[dead] = EMPTY_CODE
+            stones[rows] = sub
+            count = dead.sum(1)
+            self.captures[rows, opponent] += count
+            captured_count[touch] = count
+            captured_point[touch] = dead.argmax(1)
+
+        #suicide, where the move had no empty neighbour and took nothing
+        played = numpy.ones(len(games), bool)
+        closed = numpy.flatnonzero(~(around == EMPTY_CODE).any(1) & (captured_count == 0))
+        if len(closed):
+            rows = games[closed]
+            breathing = self.breathing(stones[rows], code[closed])
+            suicide = ~breathing[numpy.arange(len(closed)), moved[closed]]
+            stones[rows[suicide], moved[closed][suicide]] = EMPTY_CODE
+            played[closed[suicide]] = False
+
+        #ko: a lone stone took a lone stone and is left in atari
+        lone = ~(around == code[:, None]).any(1)
+        after = stones[games[:, None], moved[:, None] + self.offsets]
+        atari = (after == EMPTY_CODE).sum(1) == 1
+        ko = played & lone & atari & (captured_count == 1)
+        self.ko[:] = 0
+        self.ko[games[ko]] = captured_point[ko]
+
+        result = numpy.zeros(self.count, bool)
+        result[games[played]] = True
+        self.passes[result] = 0
+        self.passes[~result] += 1
+        self.side = other[self.side]
+        self.moves += 1
+        return result
+
+    def finished(self):
+        ''' bool array, true for games that ended with two passes '''
+        return self.passes >= 2
+
+    def playout(self, max_moves=None):
+        """Random moves from candidates in every game until all games
+              ended with two passes, or max_moves steps (default three
+              times the number of points) were played.
+              Returns area scores, see score.
+        """
+        if max_moves is None:
+            max_moves = 3 * self.size * self.size
+        for i in range(max_moves):
+            if self.finished().all():
+                break
+            points = self.random_moves()
+            points[self.finished()] = 0
+            self.play(points)
+        return self.score()
+
+    def score(self, komi=0.0):
+        """Area (Tromp-Taylor) score of every game, black minus white
+              minus komi: stones plus empty points only black (white)
+              stones can reach through empty points. Same as
+              simple_go.score_board with AREA.
+        """
+        stones = self.stones
+        empty = stones == EMPTY_CODE
+        black = stones == BLACK_CODE
+        white = stones == WHITE_CODE
+        black_reach = self.flood(self.dilate(black), empty)
+        white_reach = self.flood(self.dilate(white), empty)
+        black = black.sum(1) + (black_reach & ~white_reach).sum(1)
+        white = white.sum(1) + (white_reach & ~black_reach).sum(1)
+        return black - white - komi
+
+    def copy(self):
+        ''' independent copy of all games '''
+        result = BatchBoard(self.size, self.count)
+        result.stones[:] = self.stones
+        result.side[:] = self.side
+        result.captures[:] = self.captures
+        result.ko[:] = self.ko
+        result.passes[:] = self.passes
+        result.moves = self.moves
+        return result
+
+def batch_from_board(board, count):
+    ''' BatchBoard of count copies of a simple_go.Board '''
+    result = BatchBoard(board.size, count)
+    result.stones[:] = numpy.frombuffer(board.stones, numpy.int8)
+    result.side[:] = color_code[board.side]
+    result.captures[:, BLACK_CODE] = board.captures[BLACK]
+    result.captures[:, WHITE_CODE] = board.captures[WHITE]
+    result.ko[:] = board.ko_point
+    return result
+
+def batch_from_game(game, count):
+    ''' BatchBoard of count copies of the current position of a simple_go.Game '''
+    return batch_from_board(game.current_board, count)
@@ -0,0 +1,76 @@
+'''
+batchboard_bench
+
+random playouts to the end (two passes, own eyes never filled) from the
+empty board: one simple_go.Board at a time against batchboard.BatchBoard
+with growing batch sizes
+
+usage: python batchboard_bench.py [size] [seconds]
+'''
+
+import sys, time, random
+import numpy
+from simple_go import Board, BORDER_CODE, PASS_MOVE, color_code
+from batchboard import BatchBoard
+
+def is_own_eye(board, point):
+    ''' all neighbours are stones of the side to move or border '''
+    code = color_code[board.side]
+    for neighbour in board.geometry.neighbours[point]:
+        if board.stones[neighbour] != code and board.stones[neighbour] != BORDER_CODE:
+            return False
+    return True
+
+def scalar_playout(board, max_moves):
+    ''' same policy as BatchBoard.playout on a single Board '''
+    passes = 0
+    for i in range(max_moves):
+        if passes == 2: break
+        points = list(board.empty_points)
+        random.shuffle(points)
+        for point in points:
+            if board.legal_point(point) and not is_own_eye(board, point):
+                board.play_point(point)
+                board.change_side()
+                passes = 0
+                break
+        else:
+            board.make_move(PASS_MOVE)
+            passes += 1
+
+def scalar_games(size, seconds):
+    ''' (games, elapsed) for one Board after the other '''
+    games = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        scalar_playout(Board(size), 3 * size * size)
+        games += 1
+    return games, time.time() - start
+
+def batch_games(size, seconds, count):
+    ''' (games, elapsed) for batches of count games '''
+    games = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        BatchBoard(size, count).playout()
+        games += count
+    return games, time.time() - start
+
+def main():
+    size = 9
+    seconds = 5.0
+    if len(sys.argv) > 1:
+        size = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        seconds = float(sys.argv[2])
+    random.seed(1)
+    numpy.random.seed(1)
+    print "%dx%d random playouts to the end" % (size, size)
+    games, elapsed = scalar_games(size, seconds)
+    print "%-14s %8.1f games/sec" % ("Board", games / elapsed)
+    for count in (1, 16, 64, 256, 1024):
+        games, elapsed = batch_games(size, seconds, count)
+        print "%-14s %8.1f games/sec" % ("BatchBoard %d" % count, games / elapsed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import simple_go
+from simple_go import BLACK, WHITE, PASS_MOVE
+from batchboard import BatchBoard, batch_from_board, batch_from_game
+import numpy
+import random
+import unittest
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.size = 7
+        self.batch = BatchBoard(self.size, 4)
+
+    def test_init(self):
+        self.assertEqual(self.batch.board.shape, (4, self.size + 2, self.size + 2))
+        self.assertEqual(self.batch.board.dtype, numpy.int8)
+        self.assertEqual(list(self.batch.side), [simple_go.BLACK_CODE] * 4)
+        empty = simple_go.Board(self.size)
+        for game in range(4):
+            self.assertEqual(self.batch.stones[game].tostring(), empty.stones.tostring())
+
+    def test_same_as_board(self):
+        ''' random games in lockstep with simple_go.Board, one per row '''
+        random.seed(5)
+        count = 6
+        boards = [simple_go.Board(self.size) for i in range(count)]
+        batch = BatchBoard(self.size, count)
+        for step in range(120):
+            points = []
+            for board in boards:
+                move = board.random_legal_move()
+                if move != PASS_MOVE:
+                    points.append(board.geometry.point_of[move])
+                else:
+                    points.append(0)
+                board.make_move(move)
+            played = batch.play(points)
+            self.assertEqual(list(played), [p != 0 for p in points])
+            for game, board in enumerate(boards):
+                self.assertEqual(batch.stones[game].tostring(), board.stones.tostring())
+                self.assertEqual(batch.captures[game, simple_go.BLACK_CODE], board.captures[BLACK])
+                self.assertEqual(batch.captures[game, simple_go.WHITE_CODE], board.captures[WHITE])
+                self.assertEqual(batch.ko[game], board.ko_point)
+                self.assertEqual(batch.side[game], simple_go.color_code[board.side])
+        scores = batch.score(0.5)
+        for game, board in enumerate(boards):
+            result = simple_go.score_board(board, 0.5, simple_go.AREA)
+            self.assertEqual(scores[game], result.margin())
+
+    def test_suicide_passes(self):
+        board = simple_go.Board(self.size)
+        board.add_stones([(1, 2), (2, 1)], WHITE)
+        batch = batch_from_board(board, 2)
+        point = board.geometry.point_of[1, 1]
+        played = batch.play([point, 0])
+        self.assertEqual(list(played), [False, False])
+        self.assertEqual(batch.stones[0].tostring(), board.stones.tostring())
+        self.assertEqual(list(batch.passes), [1, 1])
+        self.assertEqual(list(batch.side), [simple_go.WHITE_CODE] * 2)
+
+    def test_playout(self):
+        numpy.random.seed(3)
+        game = simple_go.Game(5)
+        game.make_move((3, 3))
+        batch = batch_from_game(game, 16)
+        self.assertEqual(list(batch.side), [simple_go.WHITE_CODE] * 16)
+        scores = batch.playout()
+        self.assertEqual(len(scores), 16)
+        self.assertTrue(batch.finished().all())
+        # every point ends up black, white or dame, so the margin is bounded
+        self.assertTrue((abs(scores) <= 25).all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,318 @@
+'''
+Bitboard backend for badukpy
+
+Same rules as simple_go.Board, but the position is three Python integers
+used as bit sets: black stones, white stones and empty points. Point
+(x, y) is bit (y-1)*stride + (x-1) with stride = size+1, so every row
+has one padding bit at its end. Shifting a mask by 1 moves every point
+one column, shifting by stride moves it one row, and the padding bit
+keeps the left and right edges from wrapping into the next row.
+
+Whole board questions become a handful of big integer operations:
+one dilation step (see BitBoard.dilate) grows every point of a mask
+by its four neighbours at once, a chain is grown from one stone by
+repeated dilation inside the stones of its colour, and its liberties
+are the dilation of the chain and the empty mask.
+'''
+
+from simple_go import EMPTY, BLACK, WHITE, PASS_MOVE, other_side, x_coords_string
+
+def popcount(mask):
+    ''' number of set bits '''
+    return bin(mask).count('1')
+
+def low_bits(mask):
+    ''' generator over the single bit masks set in mask, lowest first '''
+    while mask:
+        low = mask & -mask
+        yield low
+        mask ^= low
+
+class BitBoard:
+    def __init__(self, size):
+        """Initialize board:
+              argument: size
+        """
+        self.size = size
+        self.stride = size + 1
+        self.on_board = 0
+        for y in range(size):
+            self.on_board |= ((1 << size) - 1) << (y * self.stride)
+        self.side = BLACK  # side to move
+        self.captures = {}  # number of stones captured
+        self.captures[WHITE] = 0
+        self.captures[BLACK] = 0
+        self.territory_white = 0
+        self.territory_black = 0
+        #stone masks
+        self.masks = {BLACK: 0, WHITE: 0, EMPTY: self.on_board}
+        self.ko = 0  # bit of the point the side to move may not retake
+
+    def __eq__(left, right):
+        if not isinstance(right, BitBoard):
+            return False
+        return left.captures == right.captures and left.masks == right.masks
+
+    def __ne__(left, right):
+        return not left.__eq__(right)
+
+    def bit(self, pos):
+        ''' single bit mask of a (x, y) position, 0 if off the board '''
+        x, y = pos
+        if 1 <= x <= self.size and 1 <= y <= self.size:
+            return 1 << ((y - 1) * self.stride + (x - 1))
+        return 0
+
+    def position(self, bit):
+        ''' (x, y) of a single bit mask '''
+        y, x = divmod(bit.bit_length() - 1, self.stride)
+        return x + 1, y + 1
+
+    def positions(self, mask):
+        ''' list of (x, y) set in mask '''
+        return [self.position(bit) for bit in low_bits(mask)]
+
+    def iterate_goban(self):
+        """This goes trough all positions in goban
+        """
+        for x in range(1, self.size + 1):
+            for y in range(1, self.size + 1):
+                yield x, y
+
+    def color(self, pos):
+        ''' EMPTY, BLACK or WHITE at given position '''
+        bit = self.bit(pos)
+        if self.masks[BLACK] & bit: return BLACK
+        if self.masks[WHITE] & bit: return WHITE
+        return EMPTY
+
+    def change_side(self):
+        self.side = other_side[self.side]
+
+    def dilate(self, mask):
+        ''' mask grown by one step in all four directions, clipped to the board '''
+        stride = self.stride
+        return (mask | (mask << 1) | (mask >> 1) | (mask << stride) | (mask >> stride)) & self.on_board
+
+    def neighbours(self, mask):
+        ''' points next to mask but not in it '''
+        return self.dilate(mask) & ~mask
+
+    def flood(self, seed, inside):
+        ''' connected part of inside that contains seed (seed must be in inside):
+            dilate and clip to inside until nothing changes
+        '''
+        fill = seed
+        while True:
+            grown = self.dilate(fill) & inside
+            if grown == fill:
+                return fill
+            fill = grown
+
+    def components(self, inside):
+        ''' generator over the connected parts of inside '''
+        while inside:
+            part = self.flood(inside & -inside, inside)
+            yield part
+            inside &= ~part
+
+    def chain(self, bit):
+        ''' mask of the chain containing a stone '''
+        for color in (BLACK, WHITE):
+            if self.masks[color] & bit:
+                return self.flood(bit, self.masks[color])
+        return 0
+
+    def chain_liberties(self, chain):
+        ''' mask of the liberties of a chain mask '''
+        return self.neighbours(chain) & self.masks[EMPTY]
+
+    def liberties(self, pos):
+        """Count liberties for group at given position.
+              Returns number of liberties, for an empty point the number of
+              empty neighbours (same as simple_go.Board).
+        """
+        bit = self.bit(pos)
+        if self.masks[EMPTY] & bit:
+            return popcount(self.neighbours(bit) & self.masks[EMPTY])
+        return popcount(self.chain_liberties(self.chain(bit)))
+
+    def group(self, pos):
+        ''' Find the group that pos exists in, as a list of (x, y) '''
+        bit = self.bit(pos)
+        if self.masks[EMPTY] & bit:
+            return self.positions(self.flood(bit, self.masks[EMPTY]))
+        return self.positions(self.chain(bit))
+
+    def is_eye(self, pos, color):
+        ''' true if pos is an empty point whose neighbours are all color '''
+        bit = self.bit(pos)
+        return bool(self.masks[EMPTY] & bit) and not (self.neighbours(bit) & ~self.masks[color])
+
+    def legal_move(self, move):
+        """Test whether given move is legal.
+              Returns truth value.
+
+              Returns false if play would result in suicide
+        """
+        if move == PASS_MOVE:
+            return True
+        bit = self.bit(move)
+        if not (bit & self.masks[EMPTY]) or bit == self.ko:
+            return False
+        around = self.neighbours(bit)
+        if around & self.masks[EMPTY]:
+            return True
+        # own chain that keeps another liberty
+        own = self.masks[self.side]
+        chains = around & own
+        while chains:
+            chain = self.flood(chains & -chains, own)
+            if self.chain_liberties(chain) & ~bit:
+                return True
+            chains &= ~chain
+        # opponent chain in atari gets captured
+        opponent = self.masks[other_side[self.side]]
+        chains = around & opponent
+        while chains:
+            chain = self.flood(chains & -chains, opponent)
+            if not (self.chain_liberties(chain) & ~bit):
+                return True
+            chains &= ~chain
+        return False
+
+    def make_move(self, move, change_sides=True):
+        """Make move given in argument.
+              Returns list of captured positions, the move for a pass or
+              None if illegal.
+        """
+        if move == PASS_MOVE:
+            self.ko = 0
+            if change_sides: self.change_side()
+            return move
+        if not self.legal_move(move):
+            return None
+        bit = self.bit(move)
+        masks = self.masks
+        remove_color = other_side[self.side]
+        masks[self.side] |= bit
+        masks[EMPTY] &= ~bit
+        captured = 0
+        chains = self.neighbours(bit) & masks[remove_color]
+        while chains:
+            chain = self.flood(chains & -chains, masks[remove_color])
+            if not self.chain_liberties(chain):
+                captured |= chain
+            chains &= ~chain
+        if captured:
+            masks[remove_color] &= ~captured
+            masks[EMPTY] |= captured
+            self.captures[remove_color] += popcount(captured)
+        # lone stone that took a lone stone and is left in atari: ko
+        self.ko = 0
+        if (change_sides and popcount(captured) == 1 and not (self.neighbours(bit) & masks[self.side])
+            and popcount(self.chain_liberties(bit)) == 1):
+            self.ko = captured
+        if change_sides: self.change_side()
+        return self.positions(captured)
+
+    def alive_chains(self, color):
+        ''' Benson's algorithm on masks, returns list of chain masks.
+            X are the chains of color, R the regions (connected parts of
+            everything that is not color). R is vital to X when all empty
+            points of R are liberties of X.
+
+            1.Remove from X all chains with less than two vital regions in R.
+            2.Remove from R all regions with a surrounding stone in a chain
+            not in X.
+
+            Stop when neither step removes anything.
+        '''
+        own = self.masks[color]
+        empty = self.masks[EMPTY]
+        chains = list(self.components(own))
+        regions = list(self.components(self.on_board & ~own))
+        liberties = [self.chain_liberties(chain) for chain in chains]
+        borders = [self.neighbours(region) for region in regions]
+        alive = range(len(chains))
+        healthy = range(len(regions))
+        while True:
+            keep = []
+            for i in alive:
+                vital = 0
+                for j in healthy:
+                    region_empty = regions[j] & empty
+                    if borders[j] & chains[i] and not (region_empty & ~liberties[i]):
+                        vital += 1
+                        if vital == 2: break
+                if vital == 2:
+                    keep.append(i)
+            removed = len(keep) != len(alive)
+            alive = keep
+            alive_mask = 0
+            for i in alive:
+                alive_mask |= chains[i]
+            keep = [j for j in healthy if not (borders[j] & own & ~alive_mask)]
+            removed = removed or len(keep) != len(healthy)
+            healthy = keep
+            if not removed or not alive:
+                break
+        return [chains[i] for i in alive]
+
+    def get_alive(self, color):
+        ''' unconditionally alive chains of color as lists of (x, y),
+            see alive_chains
+        '''
+        return [self.positions(chain) for chain in self.alive_chains(color)]
+
+    def count_territory(self):
+        """
+            Calculate territory for both colors.
+            An empty region counts for a colour when every stone around it
+            is of that colour. Like simple_go.Board, captured stones are
+            added (Japanese counting) and the result is stored in
+            territory_black and territory_white.
+        """
+        black = white = 0
+        for region in self.components(self.masks[EMPTY]):
+            around = self.neighbours(region)
+            if not (around & self.masks[WHITE]) and (around & self.masks[BLACK]):
+                black += popcount(region)
+            elif not (around & self.masks[BLACK]) and (around & self.masks[WHITE]):
+                white += popcount(region)
+        self.territory_black = black + self.captures[WHITE]
+        self.territory_white = white + self.captures[BLACK]
+
+    def __str__(self):
+        """Convert position to string suitable for printing to screen.
+        """
+        s = self.side + " to move:\n"
+        s = s + "Captured stones: "
+        s = s + "White: " + str(self.captures[WHITE])
+        s = s + " Black: " + str(self.captures[BLACK]) + "\n"
+        board_x_coords = "   " + x_coords_string[:self.size]
+        s = s + board_x_coords + "\n"
+        s = s + "  +" + "-"*self.size + "+\n"
+        for y in range(self.size, 0, -1):
+            board_y_coord = "%2d" % y
+            line = board_y_coord + "|"
+            for x in range(1, self.size + 1):
+                line = line + self.color((x, y))
+            s = s + line + "|" + board_y_coord + "\n"
+        s = s + "  +" + "-"*self.size + "+\n"
+        s = s + board_x_coords + "\n"
+        return s
+
+def bitboard_from_board(board):
+    ''' BitBoard with the same stones, side, captures and ko as a simple_go.Board '''
+    result = BitBoard(board.size)
+    for color in (BLACK, WHITE):
+        for pos in board.get_pos_list(color):
+            bit = result.bit(pos)
+            result.masks[color] |= bit
+            result.masks[EMPTY] &= ~bit
+    result.side = board.side
+    result.captures = dict(board.captures)
+    if board.ko_point:
+        result.ko = result.bit(board.geometry.pos_of[board.ko_point])
+    return result
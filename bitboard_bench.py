@@ -0,0 +1,62 @@
+'''
+bitboard_bench
+
+compare bitboard.BitBoard with simple_go.Board on positions taken from
+random games: legal move scan, count_territory and get_alive
+
+usage: python bitboard_bench.py [size] [positions]
+'''
+
+import sys, time, random
+from simple_go import Board, BLACK, WHITE
+from bitboard import bitboard_from_board
+
+def random_position(size, fill):
+    ''' simple_go.Board after random legal moves until fill of the board is covered '''
+    board = Board(size)
+    while len(board.get_pos_list(BLACK)) + len(board.get_pos_list(WHITE)) < fill * size * size:
+        moves = [m for m in board.iterate_goban() if board.legal_move(m)]
+        if not moves: break
+        board.make_move(random.choice(moves))
+    return board
+
+def timed(function, boards, repeat):
+    ''' seconds per call of function on each board '''
+    start = time.time()
+    for i in range(repeat):
+        for board in boards:
+            function(board)
+    return (time.time() - start) / (repeat * len(boards))
+
+def legal_scan(board):
+    return [m for m in board.iterate_goban() if board.legal_move(m)]
+
+def alive(board):
+    board.get_alive(BLACK)
+    board.get_alive(WHITE)
+
+def territory(board):
+    board.count_territory()
+
+def main():
+    size = 9
+    count = 10
+    if len(sys.argv) > 1:
+        size = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        count = int(sys.argv[2])
+    random.seed(1)
+    boards = [random_position(size, 0.6) for i in range(count)]
+    bitboards = [bitboard_from_board(board) for board in boards]
+    print "%dx%d, %d positions 60%% full" % (size, size, count)
+    print "%-16s %12s %12s %8s" % ("operation", "Board ms", "BitBoard ms", "speedup")
+    for name, function, repeat in (("legal_move scan", legal_scan, 5),
+                                   ("count_territory", territory, 1),
+                                   ("get_alive x2", alive, 1)):
+        board_time = timed(function, boards, repeat)
+        bitboard_time = timed(function, bitboards, repeat)
+        print "%-16s %12.3f %12.3f %7.1fx" % (name, board_time * 1000, bitboard_time * 1000,
+                                               board_time / bitboard_time)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import simple_go
+from simple_go import BLACK, WHITE, EMPTY, PASS_MOVE, string_as_move
+from bitboard import BitBoard, bitboard_from_board
+import random
+import unittest
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.size = 7
+        self.board = BitBoard(self.size)
+
+    def test_init(self):
+        self.assertEqual(self.board.side, BLACK)
+        self.assertEqual(self.board.masks[EMPTY], self.board.on_board)
+        self.assertEqual(len(self.board.positions(self.board.on_board)), self.size * self.size)
+
+    def test_edges_do_not_wrap(self):
+        self.assertEqual(sorted(self.board.positions(self.board.neighbours(self.board.bit((7, 3))))),
+                         [(6, 3), (7, 2), (7, 4)])
+        self.assertEqual(sorted(self.board.positions(self.board.neighbours(self.board.bit((1, 1))))),
+                         [(1, 2), (2, 1)])
+
+    def test_same_as_board(self):
+        ''' random games in lockstep with simple_go.Board '''
+        random.seed(11)
+        for game in range(4):
+            board = simple_go.Board(self.size)
+            bits = BitBoard(self.size)
+            for i in range(100):
+                legal = [m for m in board.iterate_goban() if board.legal_move(m)]
+                self.assertEqual(legal, [m for m in bits.iterate_goban() if bits.legal_move(m)])
+                if not legal: break
+                move = random.choice(legal)
+                self.assertEqual(sorted(board.make_move(move)), sorted(bits.make_move(move)))
+                self.assertEqual(board.captures, bits.captures)
+                converted = bitboard_from_board(board)
+                self.assertEqual(converted, bits)
+                self.assertEqual(converted.ko, bits.ko)
+                for pos in board.iterate_goban():
+                    self.assertEqual(board.liberties(pos), bits.liberties(pos))
+                for color in (BLACK, WHITE):
+                    self.assertEqual(sorted([sorted(g) for g in board.get_alive(color)]),
+                                     sorted([sorted(g) for g in bits.get_alive(color)]))
+
+    def test_ko_from_board(self):
+        ''' a BitBoard made in the middle of a ko keeps the ko '''
+        board = simple_go.Board(self.size)
+        for move in [(2, 1), (3, 1), (1, 2), (4, 2), (2, 3), (3, 3), (5, 5), (2, 2), (3, 2)]:
+            board.make_move(move)
+        self.assertFalse(board.legal_move((2, 2)))
+        bits = bitboard_from_board(board)
+        self.assertFalse(bits.legal_move((2, 2)))
+        self.assertEqual([m for m in bits.iterate_goban() if bits.legal_move(m)],
+                         [m for m in board.iterate_goban() if board.legal_move(m)])
+
+    def test_life(self):
+        ''' same position as simple_go.life_test '''
+        board = BitBoard(5)
+        black = ['A5','A4','B4','C4','C5','D4','E4']
+        white = ['A2','B2','B1','C2','D2','E2','E3']
+        for i in range(7):
+            board.make_move(string_as_move(black[i], 5))
+            board.make_move(string_as_move(white[i], 5))
+        self.assertEqual([sorted(g) for g in board.get_alive(BLACK)],
+                         [sorted(map(lambda m: string_as_move(m, 5), black))])
+        self.assertEqual([sorted(g) for g in board.get_alive(WHITE)],
+                         [sorted(map(lambda m: string_as_move(m, 5), white))])
+        self.assertTrue(board.is_eye(string_as_move('B5', 5), BLACK))
+        self.assertFalse(board.is_eye(string_as_move('D5', 5), BLACK))
+        board.count_territory()
+        self.assertEqual(board.territory_black, 3)
+        self.assertEqual(board.territory_white, 4)
+
+    def test_pass(self):
+        self.assertEqual(self.board.make_move(PASS_MOVE), PASS_MOVE)
+        self.assertEqual(self.board.side, WHITE)
+
+if __name__ == '__main__':
+    unittest.main()
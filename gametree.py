@@ -1,8 +1,30 @@
 '''
 Game Tree for badukpy
 
+Nodes are not objects but numbers: node n is entry n of a set of
+parallel arrays (struct of arrays), so a node costs a few dozen bytes
+and a line of moves is linear in memory.
+
+    parent[n]          node before n, -1 for a first move
+    depth[n]           moves before n, 0 for a first move
+    move[n]            x * 256 + y, -1 for pass (see encode_move)
+    side[n]            colour that made the move
+    board_hash[n]      64 bit Board.key() after the move, for ko test
+                       (a HashColumn)
+    first_child[n]     first of the following nodes, -1 if none
+    last_child[n]      last of them, so adding one is O(1)
+    next_sibling[n]    next node with the same parent, -1 if none
+    index[n]           position among the children of its parent
+    capture_start[n]   where its captures start in the captures arena
+    capture_count[n]   number of captured stones
+
+Captured stones of all nodes are kept as x, y byte pairs in one arena
+array. Paths (child indexes from the first move down, as series takes
+them) are made when asked for by walking parents.
 '''
 
+from array import array
+
 EMPTY = "."
 BLACK = "X"
 WHITE = "O"
@@ -14,84 +36,355 @@ sgf_side = {BLACK: 'B', WHITE: 'W'}
 
 PASS_MOVE = (-1, -1)
 
-class Node:
-    def __init__(self,previous,index,move,side,board_hash,captures):
-        self.next = []  #updomming nodes
-        self.previous = previous #the node before this one
-        if previous:
-            self.path = previous.path + [index] #add index in next to path
-        else:
-            self.path = [index] #a first move
-        self.move = move
-        self.side = side
-        self.board_hash = board_hash # for ko test
-        self.captures = captures
+NO_NODE = -1
+
+def encode_move(move):
+    ''' (x, y) as one integer for the move column '''
+    if move == PASS_MOVE:
+        return -1
+    return move[0] * 256 + move[1]
+
+def decode_move(code):
+    ''' (x, y) of encode_move '''
+    if code < 0:
+        return PASS_MOVE
+    return divmod(code, 256)
+
+class HashColumn:
+    """Column of 64 bit hashes (Board.key) kept as two array('I') of
+          their high and low 32 bits. array has no 64 bit type in Python 2
+          and 'L' is 32 bits where a C long is (Windows, 32 bit builds).
+          Indexes, append and pop like an array.
+    """
+    itemsize = 8
+
+    def __init__(self):
+        self.high = array('I')
+        self.low = array('I')
+
+    def __len__(self):
+        return len(self.low)
+
+    def __getitem__(self, index):
+        return self.high[index] << 32 | self.low[index]
+
+    def append(self, value):
+        self.high.append(value >> 32)
+        self.low.append(value & 0xffffffff)
+
+    def pop(self):
+        return self.high.pop() << 32 | self.low.pop()
 
 class GoGameTree:
     def __init__(self,bp=None,wp=None):
         self.black_placed = bp #stones placed by black on the first move
         self.white_placed = wp #white stones placed
-        self.current = None
+        self.current = None #node of the last move, None before the first
         self.firsts = [] #first moves, allowing multiple first moves
+        #board_hash -> number of nodes with it from the first move to
+        #current, kept up to date by make_move, undo_move and goto
+        self.path_hashes = {}
+        #node columns, see module doc
+        self.parent = array('i')
+        self.depth = array('i')
+        self.move = array('i')
+        self.side = array('c')
+        self.board_hash = HashColumn()
+        self.first_child = array('i')
+        self.last_child = array('i')
+        self.next_sibling = array('i')
+        self.index = array('i')
+        self.capture_start = array('i')
+        self.capture_count = array('i')
+        self.capture_points = array('B')  # x, y of every capture
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add_node(self,previous,move,side,board_hash):
+        ''' new node after previous (None for a first move), returns it '''
+        node = len(self.parent)
+        if previous is None:
+            previous = NO_NODE
+            self.depth.append(0)
+            self.index.append(len(self.firsts))
+            self.firsts.append(node)
+        else:
+            self.depth.append(self.depth[previous] + 1)
+            last = self.last_child[previous]
+            if last == NO_NODE:
+                self.first_child[previous] = node
+                self.index.append(0)
+            else:
+                self.next_sibling[last] = node
+                self.index.append(self.index[last] + 1)
+            self.last_child[previous] = node
+        self.parent.append(previous)
+        self.move.append(encode_move(move))
+        self.side.append(side)
+        self.board_hash.append(board_hash)
+        self.first_child.append(NO_NODE)
+        self.last_child.append(NO_NODE)
+        self.next_sibling.append(NO_NODE)
+        self.capture_start.append(0)
+        self.capture_count.append(0)
+        return node
+
+    def previous(self,node):
+        ''' node before node, None for a first move '''
+        parent = self.parent[node]
+        if parent == NO_NODE:
+            return None
+        return parent
+
+    def get_move(self,node):
+        ''' (x, y) or PASS_MOVE of node '''
+        return decode_move(self.move[node])
+
+    def children(self,node):
+        ''' list of the nodes following node, None for the first moves '''
+        if node is None:
+            return list(self.firsts)
+        result = []
+        child = self.first_child[node]
+        while child != NO_NODE:
+            result.append(child)
+            child = self.next_sibling[child]
+        return result
+
+    def path(self,node):
+        ''' child indexes from the first move down to node, see series '''
+        result = []
+        while node != NO_NODE:
+            result.append(self.index[node])
+            node = self.parent[node]
+        result.reverse()
+        return result
 
-    def walk(self,root=None):
+    def following(self,node):
+        ''' next node with the same parent as node, first moves included,
+            NO_NODE if it is the last one
+        '''
+        if self.parent[node] != NO_NODE:
+            return self.next_sibling[node]
+        index = self.index[node] + 1
+        if index < len(self.firsts):
+            return self.firsts[index]
+        return NO_NODE
+
+    def starts(self,root):
+        ''' (first node, whether to go on to its siblings) of a walk '''
+        if root is None:
+            if not self.firsts:
+                return NO_NODE, False
+            return self.firsts[0], True
+        return root, False
+
+    def walk(self,root=None,max_depth=None,prune=None):
         ''' if root is none, walks the whole tree,
             otherwise starts at the given root,
-            recursive depth tree traverse
+            depth first, every node before the ones following it.
+            Nodes are made one at a time from a stack as long as the
+            line, no recursion, so lines of any length can be walked.
+            max_depth: no nodes more than this many moves below root
+              (below the first moves if root is none)
+            prune: function of (node, depth), a node it returns true
+              for is skipped together with everything below it
+        '''
+        start, siblings = self.starts(root)
+        if start == NO_NODE: return
+        stack = [(start, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if siblings or depth:
+                sibling = self.following(node)
+                if sibling != NO_NODE:
+                    stack.append((sibling, depth))
+            if prune is not None and prune(node, depth):
+                continue
+            yield node
+            child = self.first_child[node]
+            if child != NO_NODE and (max_depth is None or depth < max_depth):
+                stack.append((child, depth + 1))
+
+    def walk_breadth(self,root=None,max_depth=None,prune=None):
+        ''' like walk, but breadth first: all nodes of one depth before
+            the nodes of the next one
         '''
-        if root:
-            yield root
-            for item in root.next:
-                self.walk(item)
+        start, siblings = self.starts(root)
+        if start == NO_NODE: return
+        if siblings:
+            level = list(self.firsts)
         else:
-            for item in self.firsts:
-                self.walk(item)
+            level = [start]
+        depth = 0
+        while level:
+            following = []
+            for node in level:
+                if prune is not None and prune(node, depth):
+                    continue
+                yield node
+                if max_depth is None or depth < max_depth:
+                    child = self.first_child[node]
+                    while child != NO_NODE:
+                        following.append(child)
+                        child = self.next_sibling[child]
+            level = following
+            depth += 1
+
+    def visit(self,board,root=None,max_depth=None,prune=None):
+        ''' walk (same arguments and order) with the position of every
+            node: yields (node, board) with the moves from the first move
+            down to node played on board. board is the position before
+            the first move and is changed in place, one move played going
+            down and undone going back up, so the whole walk costs one
+            make_move and one undo per node; copy it to keep a position.
+            When the walk ends or is left early (the generator closed),
+            board is back where it started, side to move included.
+            prune is called before the node's move is played.
+        '''
+        start, siblings = self.starts(root)
+        if start == NO_NODE: return
+        side = board.side  # play sets it for every move
+        played = 0
+        if root is not None and self.parent[root] != NO_NODE:
+            for node in self.series(self.path(self.parent[root])):
+                self.play(board, node)
+                played += 1
+        #entries (node, depth), (NO_NODE, 0) to undo a move
+        stack = [(start, 0)]
+        try:
+            while stack:
+                node, depth = stack.pop()
+                if node == NO_NODE:
+                    board.undo()
+                    played -= 1
+                    continue
+                if siblings or depth:
+                    sibling = self.following(node)
+                    if sibling != NO_NODE:
+                        stack.append((sibling, depth))
+                if prune is not None and prune(node, depth):
+                    continue
+                self.play(board, node)
+                played += 1
+                stack.append((NO_NODE, 0))
+                yield node, board
+                child = self.first_child[node]
+                if child != NO_NODE and (max_depth is None or depth < max_depth):
+                    stack.append((child, depth + 1))
+        finally:
+            for i in range(played):
+                board.undo()
+            board.side = side
+
+    def play(self,board,node):
+        ''' play the move of node on board, by the side that made it
+            (board.side is set to it, undo does not put it back)
+        '''
+        board.side = self.side[node]
+        if board.make_move(self.get_move(node)) is None:
+            raise ValueError("illegal move in tree: %s" % (self.get_move(node),))
 
     def series(self,path):
         '''
         generator for getting nodes in a path
         '''
-        cursor = firsts[path[0]]
+        cursor = self.firsts[path[0]]
         yield cursor
         if len(path) > 1:
-            for index in path[2:]:
-                cursor = cursor.next[index]
+            for index in path[1:]:
+                cursor = self.first_child[cursor]
+                for i in range(index):
+                    cursor = self.next_sibling[cursor]
                 yield cursor
-            
-    def make_move(self,move,board_hash):
+
+    def push_hash(self,board_hash):
+        self.path_hashes[board_hash] = self.path_hashes.get(board_hash, 0) + 1
+
+    def pop_hash(self,board_hash):
+        count = self.path_hashes[board_hash] - 1
+        if count:
+            self.path_hashes[board_hash] = count
+        else:
+            del self.path_hashes[board_hash]
+
+    def repeats(self,board_hash):
+        ''' true if a node on the current path has this board hash '''
+        return board_hash in self.path_hashes
+
+    def make_move(self,move,board_hash,side=None):
         ''' make a move if ko test passes
             if ko test fails, return false
             else add move, advance current, and return true
+            side defaults to black first, then the other side of the
+            current move
         '''
         #if current is None, first move
         if self.current == None:
-            index = len(self.firsts)
-            self.current = Node(None,index,move,BLACK,board_hash,[])
-            self.firsts.append(self.current)
+            self.current = self.add_node(None,move,side or BLACK,board_hash)
+            self.push_hash(board_hash)
             return True
 
         #ko test - make sure board hash isn't in current path
-        hashes = [node.board_hash for node in self.series(self.cursor.path)]
-        if board_hash in hashes:
+        #(a pass never changes the position, so it is never a repetition)
+        if move != PASS_MOVE and self.repeats(board_hash):
             return False
 
-        index = len(self.current.next)
-        new_node = Node(self.current,index,other_side[self.current.side],
-                        board_hash,[])
-        self.current.next.append(new_node)
-        self.current = new_node
+        self.current = self.add_node(self.current,move,
+                                     side or other_side[self.side[self.current]],board_hash)
+        self.push_hash(board_hash)
         return True
 
+    def goto(self,node):
+        ''' make node current (None for before the first move), for
+            switching variations: both nodes are walked up by depth to
+            the last node their paths share, popping the hashes of the
+            old branch and pushing those of the new one, so the cost is
+            the length of the two branches only
+        '''
+        old = self.current
+        if old is None:
+            old = NO_NODE
+        new = node
+        if new is None:
+            new = NO_NODE
+        depth = self.depth
+        pushed = []
+        while old != new:
+            if new == NO_NODE or (old != NO_NODE and depth[old] >= depth[new]):
+                self.pop_hash(self.board_hash[old])
+                old = self.parent[old]
+            else:
+                pushed.append(self.board_hash[new])
+                new = self.parent[new]
+        for board_hash in reversed(pushed):
+            self.push_hash(board_hash)
+        self.current = node
+
     def set_captures(self,captures):
-        self.current.captures = captures
+        ''' captured (x, y) of the current move, appended to the arena '''
+        node = self.current
+        self.capture_start[node] = len(self.capture_points) / 2
+        self.capture_count[node] = len(captures)
+        for x, y in captures:
+            self.capture_points.append(x)
+            self.capture_points.append(y)
+
+    def captures(self,node):
+        ''' list of (x, y) captured by the move of node '''
+        start = 2 * self.capture_start[node]
+        points = self.capture_points
+        return [(points[i], points[i + 1])
+                for i in range(start, start + 2 * self.capture_count[node], 2)]
 
     def get_captures(self):
-        return self.current.captures
+        return self.captures(self.current)
 
     def undo_move(self):
-        ''' Undo a move, if current is none (first move) return None '''
+        ''' Undo a move, return its node; if current is none (first move) return None '''
         if self.current == None: return None
         old = self.current
-        self.current = self.current.previous
+        self.pop_hash(self.board_hash[old])
+        self.current = self.previous(old)
         return old
-        
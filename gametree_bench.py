@@ -0,0 +1,137 @@
+'''
+gametree_bench
+
+memory and time of building a large GoGameTree: games of random moves,
+each new one branching off a random node of the one before, until the
+tree holds the given number of nodes; then scoring every leaf of a tree
+of legal 9x9 games with GoGameTree.visit against replaying each leaf's
+line from an empty board
+
+usage: python gametree_bench.py [nodes] [game length] [leaf tree nodes]
+'''
+
+import sys, time, random, resource
+from gametree import GoGameTree, PASS_MOVE
+from simple_go import Board, AREA, score_board
+
+def rss_kb():
+    ''' peak resident size of this process in kB (Linux) '''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def build_tree(nodes, length):
+    ''' tree of about nodes nodes in lines of at most length moves '''
+    tree = GoGameTree()
+    board_hash = 0
+    while len(tree) < nodes:
+        if len(tree):
+            tree.goto(random.randrange(len(tree)))
+        for i in range(length):
+            if len(tree) >= nodes: break
+            board_hash += 1
+            if i % 50 == 49:
+                tree.make_move(PASS_MOVE, board_hash)
+            else:
+                tree.make_move((random.randrange(19), random.randrange(19)), board_hash)
+            if i % 10 == 0:
+                tree.set_captures([(random.randrange(19), random.randrange(19))])
+    return tree
+
+def column_bytes(tree):
+    ''' bytes held by the node columns and the captures arena '''
+    total = 0
+    for column in (tree.parent, tree.depth, tree.move, tree.side, tree.board_hash,
+                   tree.first_child, tree.last_child, tree.next_sibling,
+                   tree.index, tree.capture_start, tree.capture_count,
+                   tree.capture_points):
+        total += column.itemsize * len(column)
+    return total
+
+def legal_tree(nodes, size=9):
+    ''' tree of random legal games, each branching off a random node '''
+    tree = GoGameTree()
+    while len(tree) < nodes:
+        board = Board(size)
+        tree.goto(None)
+        if len(tree):
+            start = random.randrange(len(tree))
+            for node in tree.series(tree.path(start)):
+                tree.play(board, node)
+            tree.goto(start)
+        for i in range(size * size):
+            if len(tree) >= nodes: break
+            move = board.random_legal_move()
+            if move == PASS_MOVE: break
+            board.make_move(move)
+            if not tree.make_move(move, board.key()): break  # superko
+    return tree
+
+def score_leaves(tree, size=9):
+    ''' score every leaf with visit, returns (leaves, seconds) '''
+    leaves = 0
+    start = time.time()
+    for node, board in tree.visit(Board(size)):
+        if tree.first_child[node] < 0:
+            score_board(board, 0.0, AREA)
+            leaves += 1
+    return leaves, time.time() - start
+
+def score_leaves_replayed(tree, size=9):
+    ''' score every leaf replaying its line, returns (leaves, seconds) '''
+    leaves = 0
+    start = time.time()
+    for node in tree.walk():
+        if tree.first_child[node] < 0:
+            board = Board(size)
+            for step in tree.series(tree.path(node)):
+                tree.play(board, step)
+            score_board(board, 0.0, AREA)
+            leaves += 1
+    return leaves, time.time() - start
+
+def main():
+    nodes = 1000000
+    length = 300
+    if len(sys.argv) > 1:
+        nodes = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        length = int(sys.argv[2])
+    leaf_nodes = 20000
+    if len(sys.argv) > 3:
+        leaf_nodes = int(sys.argv[3])
+    random.seed(1)
+    before = rss_kb()
+    start = time.time()
+    tree = build_tree(nodes, length)
+    elapsed = time.time() - start
+    after = rss_kb()
+    print "%d nodes in %.2fs (%.0f nodes/s)" % (len(tree), elapsed, len(tree) / elapsed)
+    print "columns: %.1f MB, %.1f bytes/node" % (
+        column_bytes(tree) / 1e6, column_bytes(tree) / float(len(tree)))
+    print "peak RSS growth: %.1f MB, %.1f bytes/node" % (
+        (after - before) / 1024.0, (after - before) * 1024.0 / len(tree))
+    start = time.time()
+    count = 0
+    for node in tree.walk():
+        count += 1
+    print "walk: %d nodes in %.2fs" % (count, time.time() - start)
+    start = time.time()
+    for i in range(10000):
+        tree.path(random.randrange(len(tree)))
+    print "path: %.1f us each" % ((time.time() - start) / 10000 * 1e6)
+    elapsed = 0.0
+    for i in range(10000):
+        node = random.randrange(len(tree))
+        sibling = tree.children(tree.previous(node))[0]
+        tree.goto(node)
+        start = time.time()
+        tree.goto(sibling)
+        elapsed += time.time() - start
+    print "goto a sibling: %.1f us each" % (elapsed / 10000 * 1e6)
+    tree = legal_tree(leaf_nodes)
+    leaves, elapsed = score_leaves(tree)
+    print "visit: %d leaves of %d nodes scored in %.2fs" % (leaves, len(tree), elapsed)
+    leaves, elapsed = score_leaves_replayed(tree)
+    print "replay: %d leaves scored in %.2fs" % (leaves, elapsed)
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,16 @@
-from gametree import GoGameTree
+from gametree import GoGameTree, HashColumn, PASS_MOVE
+from simple_go import Board
 import unittest
 
+def path_hashes(tree):
+    ''' multiset of the hashes on the current path, counted from scratch '''
+    result = {}
+    if tree.current is not None:
+        for node in tree.series(tree.path(tree.current)):
+            board_hash = tree.board_hash[node]
+            result[board_hash] = result.get(board_hash, 0) + 1
+    return result
+
 class TestSequenceFunctions(unittest.TestCase):
 
     def setUp(self):
@@ -19,5 +29,145 @@ class TestSequenceFunctions(unittest.TestCase):
     def testEmptyUndo(self):
         self.assertEqual(self.gametree.undo_move(), None)
 
+    def testSuperko(self):
+        self.assertTrue(self.gametree.make_move((1, 1), 11))
+        self.assertTrue(self.gametree.make_move((2, 2), 12))
+        self.assertFalse(self.gametree.make_move((3, 3), 11))
+        self.assertTrue(self.gametree.make_move(PASS_MOVE, 12))
+        self.assertEqual(self.gametree.path_hashes, {11: 1, 12: 2})
+        self.gametree.undo_move()
+        self.gametree.undo_move()
+        self.assertEqual(self.gametree.path_hashes, {11: 1})
+        self.assertTrue(self.gametree.make_move((3, 3), 12))
+
+    def testHashColumn(self):
+        ''' full 64 bit hashes, whatever the size of a C long '''
+        column = HashColumn()
+        values = [0, 1, 2 ** 32 - 1, 2 ** 32, 2 ** 63 + 5, 2 ** 64 - 1]
+        for value in values:
+            column.append(value)
+        self.assertEqual([column[i] for i in range(len(values))], values)
+        self.assertEqual(column[-1], 2 ** 64 - 1)
+        self.assertEqual(column.pop(), 2 ** 64 - 1)
+        self.assertEqual(len(column), len(values) - 1)
+        self.assertTrue(self.gametree.make_move((1, 1), 2 ** 64 - 3))
+        self.assertTrue(self.gametree.make_move((2, 2), 2 ** 63))
+        self.assertFalse(self.gametree.make_move((3, 3), 2 ** 64 - 3))
+        self.assertEqual(self.gametree.board_hash[1], 2 ** 63)
+
+    def testGoto(self):
+        ''' switching between variations keeps the path hashes right '''
+        tree = self.gametree
+        for i in range(1, 6):
+            tree.make_move((i, i), i)
+        main_line = tree.current
+        tree.goto(tree.previous(tree.previous(main_line)))
+        for i in range(6, 10):
+            tree.make_move((i, 1), i)
+        variation = tree.current
+        self.assertFalse(tree.repeats(4))
+        self.assertTrue(tree.repeats(7))
+        for node in [main_line, variation, tree.previous(main_line), None, variation]:
+            tree.goto(node)
+            self.assertEqual(tree.current, node)
+            self.assertEqual(tree.path_hashes, path_hashes(tree))
+        tree.goto(main_line)
+        self.assertFalse(tree.make_move((9, 9), 4))
+        self.assertTrue(tree.make_move((9, 9), 7))
+
+    def testNodes(self):
+        ''' columns, paths, walk order and captures of a small tree '''
+        tree = self.gametree
+        tree.make_move((3, 3), 1)
+        tree.make_move((4, 4), 2)
+        tree.set_captures([(1, 2), (2, 1)])
+        tree.make_move(PASS_MOVE, 3)
+        tree.goto(0)
+        tree.make_move((5, 5), 4)
+        tree.make_move((6, 6), 5)
+        self.assertEqual(len(tree), 5)
+        self.assertEqual(tree.children(0), [1, 3])
+        self.assertEqual(tree.path(4), [0, 1, 0])
+        self.assertEqual(list(tree.depth), [0, 1, 2, 1, 2])
+        self.assertEqual(list(tree.series([0, 1, 0])), [0, 3, 4])
+        self.assertEqual(list(tree.walk()), [0, 1, 2, 3, 4])
+        self.assertEqual(list(tree.walk(3)), [3, 4])
+        self.assertEqual(tree.get_move(2), PASS_MOVE)
+        self.assertEqual(tree.get_move(4), (6, 6))
+        self.assertEqual([tree.side[node] for node in tree.series([0, 1, 0])], ['X', 'O', 'X'])
+        self.assertEqual(tree.captures(1), [(1, 2), (2, 1)])
+        self.assertEqual(tree.captures(4), [])
+        self.assertEqual(tree.undo_move(), 4)
+        self.assertEqual(tree.current, 3)
+        self.assertEqual(tree.undo_move(), 3)
+        self.assertEqual(tree.undo_move(), 0)
+        self.assertEqual(tree.undo_move(), None)
+
+    def small_tree(self):
+        ''' 0 (1,1) - 1 (2,2) - 2 (3,3)
+                        \ 3 (4,4)
+            4 (5,5) - 5 (6,6)
+        '''
+        tree = self.gametree
+        for i in range(1, 4):
+            tree.make_move((i, i), i)
+        tree.goto(0)
+        tree.make_move((4, 4), 4)
+        tree.goto(None)
+        tree.make_move((5, 5), 5)
+        tree.make_move((6, 6), 6)
+        return tree
+
+    def testWalk(self):
+        tree = self.small_tree()
+        self.assertEqual(list(tree.walk()), [0, 1, 2, 3, 4, 5])
+        self.assertEqual(list(tree.walk(max_depth=1)), [0, 1, 3, 4, 5])
+        self.assertEqual(list(tree.walk(0, max_depth=0)), [0])
+        self.assertEqual(list(tree.walk(1)), [1, 2])
+        self.assertEqual(list(tree.walk(prune=lambda node, depth: node == 1)), [0, 3, 4, 5])
+        self.assertEqual(list(tree.walk_breadth()), [0, 4, 1, 3, 5, 2])
+        self.assertEqual(list(tree.walk_breadth(0)), [0, 1, 3, 2])
+        self.assertEqual(list(tree.walk_breadth(max_depth=1, prune=lambda node, depth: node == 4)),
+                         [0, 1, 3])
+
+    def testDeepWalk(self):
+        ''' no recursion, a line far longer than the recursion limit '''
+        tree = self.gametree
+        for i in range(5000):
+            tree.make_move(PASS_MOVE, 0)
+        self.assertEqual(list(tree.walk()), range(5000))
+        self.assertEqual(len(list(tree.walk_breadth())), 5000)
+
+    def testVisit(self):
+        ''' the board at every node is the one replayed from scratch '''
+        tree = self.small_tree()
+        board = Board(9)
+        board.change_side()  # white to move, the first moves are black's
+        before = board.copy()
+        start = board.key()
+        seen = []
+        for node, position in tree.visit(board):
+            replayed = Board(9)
+            for step in tree.series(tree.path(node)):
+                replayed.make_move(tree.get_move(step))
+            self.assertEqual(position.key(), replayed.key())
+            self.assertEqual(position.side, replayed.side)
+            seen.append(node)
+        self.assertEqual(seen, list(tree.walk()))
+        self.assertEqual(board.key(), start)
+        self.assertEqual(board.journal, [])
+        self.assertEqual(board, before)
+        self.assertEqual(board.side, before.side)
+        self.assertEqual([node for node, position in tree.visit(board, 1)], [1, 2])
+        #left early: the board is put back
+        visit = tree.visit(board, max_depth=1)
+        visit.next()
+        visit.next()
+        visit.close()
+        self.assertEqual(board.key(), start)
+        self.assertEqual(board.journal, [])
+        self.assertEqual(board, before)
+        self.assertEqual(board.side, before.side)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,110 @@
+'''
+Root parallel search for badukpy
+
+One Python process only ever uses one core, so ParallelSearch runs a
+search.UCTSearch in each of a pool of worker processes instead. Every
+move the parent sends each worker the same position as a compact
+Board.snapshot and a different random seed; each worker searches on its
+own, with its own tree, and sends back visits and wins of the root moves.
+The parent adds those up per move and plays the most visited one.
+
+The pool is started once and kept for the whole game, so process start
+and imports are paid once, and every worker keeps its search tree
+between moves the way UCTSearch does (a move is not always searched by
+the same worker, so this helps less than in one process).
+'''
+
+import random
+from multiprocessing import Pool
+from simple_go import PASS_MOVE, board_geometry, board_from_snapshot
+from search import UCTSearch
+
+#the worker's own search, kept between moves, see search_root
+worker_search = None
+
+def search_root(task):
+    """Runs in a worker: search a snapshot and return the root
+          statistics as a list of (flat point, visits, wins), 0 for pass.
+          task is (snapshot, seed, playouts, seconds, komi).
+    """
+    global worker_search
+    snapshot, seed, playouts, seconds, komi = task
+    board = board_from_snapshot(snapshot)
+    if worker_search is None or worker_search.geometry.size != board.size:
+        worker_search = UCTSearch(board.size)
+    worker_search.playouts = playouts
+    worker_search.seconds = seconds
+    worker_search.komi = komi
+    random.seed(seed)
+    root = worker_search.search(board)
+    return [(point, count, count * rate)
+            for count, rate, point in worker_search.ranked_moves(root)]
+
+class ParallelSearch:
+    def __init__(self, size, workers=2, playouts=1000, seconds=None, komi=6.5, seed=None):
+        """Initialize search and start the worker processes:
+              workers: number of processes
+              playouts, seconds: budget of every worker per move, see
+                UCTSearch
+              seed: base of the worker seeds, from random if not given
+        """
+        self.geometry = board_geometry(size)
+        self.workers = workers
+        self.playouts = playouts
+        self.seconds = seconds
+        self.komi = komi
+        if seed is None:
+            seed = random.getrandbits(31)
+        self.seed = seed
+        self.searches = 0
+        self.pool = Pool(workers)
+
+    def close(self):
+        ''' stop the worker processes '''
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def root_statistics(self, board):
+        """One search per worker from board.
+              Returns {flat point: [visits, wins]} summed over workers.
+        """
+        snapshot = board.snapshot()
+        base = self.seed + self.searches * self.workers
+        self.searches += 1
+        tasks = [(snapshot, base + i, self.playouts, self.seconds, self.komi)
+                 for i in range(self.workers)]
+        merged = {}
+        for result in self.pool.map(search_root, tasks, 1):
+            for point, count, wins in result:
+                total = merged.setdefault(point, [0, 0.0])
+                total[0] += count
+                total[1] += wins
+        return merged
+
+    def ranked_moves(self, board):
+        ''' root moves of all workers as (visits, win rate, flat point),
+            best first, like UCTSearch.ranked_moves
+        '''
+        merged = self.root_statistics(board)
+        result = [(count, wins / count, point) for point, (count, wins) in merged.iteritems()]
+        result.sort(reverse=True)
+        return result
+
+    def best_move(self, board, excluded=()):
+        """Most visited move over all workers as (x, y) or PASS_MOVE,
+              skipping moves whose Board.key is in excluded
+        """
+        pos_of = self.geometry.pos_of
+        for count, rate, point in self.ranked_moves(board):
+            if not point:
+                return PASS_MOVE
+            move = pos_of[point]
+            if board.hash_new_move(move) not in excluded:
+                return move
+        return PASS_MOVE
+
+    def generate_move(self, game):
+        ''' best_move for a simple_go.Game, see UCTSearch.generate_move '''
+        return self.best_move(game.current_board, game.position_seen)
@@ -0,0 +1,55 @@
+'''
+parallel_bench
+
+scaling of parallel.ParallelSearch: every worker runs the same number of
+playouts per move, so with perfect scaling total playouts per second grow
+with the number of workers. Pool start up is not timed, the first search
+of every pool (imports, first tree) is not timed either. Pools get no
+more workers than there are cores, and on one core nothing is timed.
+
+usage: python parallel_bench.py [size] [playouts per worker] [moves]
+'''
+
+import sys, time, random
+from simple_go import Board
+from multiprocessing import cpu_count
+from parallel import ParallelSearch
+
+def main():
+    size = 9
+    playouts = 200
+    moves = 3
+    if len(sys.argv) > 1:
+        size = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        playouts = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        moves = int(sys.argv[3])
+    random.seed(1)
+    board = Board(size)
+    for i in range(size * size / 4):
+        board.make_move(board.random_legal_move())
+    print "%dx%d, %d playouts per worker per move, %d moves, %d cores" % (
+        size, size, playouts, moves, cpu_count())
+    if cpu_count() == 1:
+        print "one core: workers can only take turns, no scaling to measure"
+        return
+    print "%8s %14s %8s %10s" % ("workers", "playouts/sec", "speedup", "efficiency")
+    single = None
+    for workers in (1, 2, 4, 8, 16):
+        if workers > cpu_count():
+            break
+        search = ParallelSearch(size, workers, playouts, seed=1)
+        search.ranked_moves(board)
+        start = time.time()
+        for i in range(moves):
+            search.ranked_moves(board)
+        rate = workers * playouts * moves / (time.time() - start)
+        search.close()
+        if single is None:
+            single = rate
+        print "%8d %14.1f %7.2fx %9.0f%%" % (workers, rate, rate / single,
+                                              100 * rate / (single * workers))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import simple_go
+from simple_go import board_from_snapshot
+import parallel
+from parallel import ParallelSearch, search_root
+import os
+import random
+import unittest
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(9)
+        parallel.worker_search = None  # the workers are forked with this one
+        self.search = ParallelSearch(5, workers=2, playouts=100, komi=0.5, seed=1)
+
+    def tearDown(self):
+        self.search.close()
+
+    def test_snapshot(self):
+        board = simple_go.Board(5)
+        for i in range(12):
+            board.make_move(board.random_legal_move())
+        copy = board_from_snapshot(board.snapshot())
+        self.assertEqual(copy.stones, board.stones)
+        self.assertEqual(copy.captures, board.captures)
+        self.assertEqual(copy.key(), board.key())
+        self.assertEqual(copy.side, board.side)
+        self.assertEqual(copy.ko_point, board.ko_point)
+        self.assertEqual(sorted(copy.legal_moves()), sorted(board.legal_moves()))
+
+    def test_merge(self):
+        ''' root visits of both workers add up '''
+        board = simple_go.Board(5)
+        ranked = self.search.ranked_moves(board)
+        self.assertEqual(sum([count for count, rate, point in ranked]), 2 * 100)
+        self.assertEqual(ranked, sorted(ranked, reverse=True))
+
+    def test_worker_statistics(self):
+        ''' the merged statistics are what search_root gives in the worker,
+            one worker so the order of its searches is known
+        '''
+        search = ParallelSearch(5, workers=1, playouts=60, komi=0.5, seed=4)
+        try:
+            board = simple_go.Board(5)
+            for seed in (4, 5):
+                expected = dict([(point, [count, wins]) for point, count, wins
+                                 in search_root((board.snapshot(), seed, 60, None, 0.5))])
+                self.assertEqual(search.root_statistics(board), expected)
+        finally:
+            search.close()
+            parallel.worker_search = None
+
+    def test_pool_reused(self):
+        ''' the same worker processes serve every move of a game '''
+        game = simple_go.Game(5)
+        game.engine = self.search
+        pids = set()
+        for i in range(4):
+            pids |= set(self.search.pool.map(worker_pid, range(4), 1))
+            self.assertTrue(game.make_move(game.generate_move()))
+        self.assertTrue(len(pids) <= 2)
+
+    def test_worker_failure(self):
+        ''' an error in a worker reaches the caller, the pool goes on '''
+        self.assertRaises(ValueError, self.search.pool.map, search_root,
+                          [('not a snapshot', 1, 10, None, 0.5)] * 2, 1)
+        ranked = self.search.ranked_moves(simple_go.Board(5))
+        self.assertEqual(sum([count for count, rate, point in ranked]), 2 * 100)
+
+    def test_search_root(self):
+        board = simple_go.Board(5)
+        result = search_root((board.snapshot(), 3, 50, None, 0.5))
+        self.assertEqual(sum([count for point, count, wins in result]), 50)
+
+def worker_pid(i):
+    return os.getpid()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,339 @@
+'''
+3x3 patterns for badukpy playouts
+
+The eight points around a point, read in the order of NEIGHBOURS, each
+give their two bit code from the board array (EMPTY_CODE, BLACK_CODE,
+WHITE_CODE or BORDER_CODE), so every neighbourhood, edge and corner ones
+included, is a 16 bit number. A table gives each such code a weight from
+0 to 255 for black to move; white to move looks up the code with the
+colours swapped.
+
+PatternState keeps the code of every point of one Board up to date: a
+stone put down or taken away changes two bits in the codes of its eight
+neighbours, nothing else. It also keeps the weight of every empty point
+for both colours and the sum of those per board row, so after a change
+only the changed points are touched, and drawing a point with chance
+proportional to its weight reads the row sums and then one row. Turn it
+on with enable_patterns(board); Board.copy copies it along.
+
+Weights are stored in a small binary file, one record per class of codes
+that are the same up to rotation and reflection, see save_table and
+load_table. Running this module writes the default table (see
+default_weight) to patterns.dat.
+
+usage: python pattern.py [file]
+'''
+
+import os, sys, struct, random
+from array import array
+from simple_go import EMPTY_CODE, BLACK_CODE, WHITE_CODE, BORDER_CODE, color_code
+
+#(dx, dy) of the eight neighbours, neighbour i is bits 2i and 2i+1 of a code
+NEIGHBOURS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+#the same orthogonal neighbours as BoardGeometry.offsets: down, up, left, right
+ORTHOGONAL = [1, 6, 3, 4]
+
+MAGIC = 'BP33'
+RECORD = struct.Struct('<HB')
+DEFAULT_WEIGHT = 10
+
+table_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'patterns.dat')
+
+def code_points(code):
+    ''' list of the eight neighbour codes of a pattern code '''
+    return [(code >> (2 * i)) & 3 for i in range(8)]
+
+def points_code(points):
+    ''' pattern code of eight neighbour codes '''
+    code = 0
+    for i in range(8):
+        code |= points[i] << (2 * i)
+    return code
+
+def symmetries():
+    ''' for each of the 8 rotations and reflections, where neighbour i goes '''
+    result = []
+    for swap in (False, True):
+        for sx in (1, -1):
+            for sy in (1, -1):
+                moved = []
+                for dx, dy in NEIGHBOURS:
+                    if swap:
+                        dx, dy = dy, dx
+                    moved.append(NEIGHBOURS.index((dx * sx, dy * sy)))
+                result.append(moved)
+    return result
+
+def transform(code, moved):
+    ''' code with neighbour i moved to moved[i] '''
+    points = code_points(code)
+    result = [0] * 8
+    for i in range(8):
+        result[moved[i]] = points[i]
+    return points_code(result)
+
+def swap_colors(code):
+    ''' code with black and white exchanged '''
+    swap = [EMPTY_CODE, WHITE_CODE, BLACK_CODE, BORDER_CODE]
+    return points_code([swap[c] for c in code_points(code)])
+
+def valid_codes():
+    ''' every code that can happen around an on-board point: border only
+        on whole sides, as on the edge or in a corner of a board of at
+        least 2x2
+    '''
+    codes = []
+    for bx in (-1, 0, 1):
+        for by in (-1, 0, 1):
+            inside = [i for i, (dx, dy) in enumerate(NEIGHBOURS)
+                      if not (bx and dx == bx) and not (by and dy == by)]
+            for n in range(3 ** len(inside)):
+                points = [BORDER_CODE] * 8
+                for i in inside:
+                    n, points[i] = divmod(n, 3)
+                codes.append(points_code(points))
+    return codes
+
+def canonical(code, moves=None):
+    ''' smallest code of the symmetry class of code '''
+    if moves is None:
+        moves = symmetries()
+    return min([transform(code, moved) for moved in moves])
+
+def default_weight(code):
+    """Weight of a pattern code for black to move, simple shape rules:
+          0 for own eyes (all four orthogonal neighbours black or border)
+          so playouts do not fill them, more for contact with a white
+          stone, a lot more for cutting points, a hane at the head of
+          stones, less for empty triangles and for empty points on the
+          edge with nothing around.
+    """
+    points = code_points(code)
+    orthogonal = [points[i] for i in ORTHOGONAL]
+    own = BLACK_CODE
+    opponent = WHITE_CODE
+    if not [c for c in orthogonal if c != own and c != BORDER_CODE]:
+        return 0
+    weight = DEFAULT_WEIGHT
+    stones = [c for c in points if c == own or c == opponent]
+    if not stones:
+        if BORDER_CODE in points:
+            return DEFAULT_WEIGHT / 2
+        return DEFAULT_WEIGHT
+    if opponent in orthogonal:
+        weight += 20
+    triangles = 0
+    #pairs of orthogonal neighbours that touch, and the diagonal between them
+    for a, b, corner in ((1, 3, 0), (1, 4, 2), (6, 3, 5), (6, 4, 7)):
+        if points[a] == opponent and points[b] == opponent and points[corner] != opponent:
+            weight += 30  # cut
+        if points[a] == own and points[b] == own and points[corner] == own:
+            triangles += 1  # empty triangle
+        if ((points[a] == own and points[corner] == opponent and points[b] == EMPTY_CODE) or
+            (points[b] == own and points[corner] == opponent and points[a] == EMPTY_CODE)):
+            weight += 10  # hane
+    weight /= 3 ** triangles
+    return max(1, min(255, weight))
+
+def save_table(path, weights):
+    """Write a table (array of 65536 weights for black to move) in the
+          compact format: MAGIC, record count, then one (code, weight)
+          record per symmetry class of valid codes.
+    """
+    moves = symmetries()
+    records = {}
+    for code in valid_codes():
+        records[canonical(code, moves)] = weights[code]
+    data = [MAGIC, struct.pack('<H', len(records))]
+    for code in sorted(records):
+        data.append(RECORD.pack(code, records[code]))
+    handle = open(path, 'wb')
+    handle.write(''.join(data))
+    handle.close()
+
+def load_table(path=None):
+    """Read a table written by save_table (table_file if no path given)
+          and spread every record over its symmetry class.
+          Returns PatternTable.
+    """
+    if path is None:
+        path = table_file
+    handle = open(path, 'rb')
+    data = handle.read()
+    handle.close()
+    if data[:4] != MAGIC:
+        raise ValueError("not a pattern table: %s" % path)
+    count = struct.unpack('<H', data[4:6])[0]
+    weights = array('B', [DEFAULT_WEIGHT]) * 65536
+    moves = symmetries()
+    for i in range(count):
+        code, weight = RECORD.unpack_from(data, 6 + i * RECORD.size)
+        for moved in moves:
+            weights[transform(code, moved)] = weight
+    return PatternTable(weights)
+
+def default_table():
+    ''' PatternTable of default_weight for every code '''
+    return PatternTable(array('B', [default_weight(code) for code in range(65536)]))
+
+class PatternTable:
+    def __init__(self, black):
+        """Weights by pattern code, for black to move (argument) and for
+              white to move (the same with colours swapped)
+        """
+        self.weights = [None, black, array('B', [0]) * 65536, None]
+        white = self.weights[WHITE_CODE]
+        #swap four neighbours at a time
+        low = [0] * 256
+        for code in range(256):
+            low[code] = swap_colors(code)
+        high = [code << 8 for code in low]
+        for code in range(65536):
+            white[code] = black[low[code & 255] | high[code >> 8]]
+
+class PatternState:
+    def __init__(self, board, table):
+        """Pattern codes and weights of board, see enable_patterns
+        """
+        geometry = board.geometry
+        self.board = board
+        self.table = table
+        self.stride = geometry.stride
+        area = geometry.area
+        #(neighbour point, bit shift of this point in the neighbour's code)
+        self.around = [()] * area
+        self.offsets = [dy * self.stride + dx for dx, dy in NEIGHBOURS]
+        for point in geometry.points:
+            self.around[point] = tuple([(point - self.offsets[i], 2 * i) for i in range(8)])
+        self.codes = array('H', [0]) * area
+        self.weights = [None, array('i', [0]) * area, array('i', [0]) * area, None]
+        self.rows = [None, array('i', [0]) * self.stride, array('i', [0]) * self.stride, None]
+        self.totals = [0, 0, 0, 0]
+        self.reset()
+
+    def reset(self):
+        ''' recompute everything from the board's stones '''
+        stones = self.board.stones
+        stride = self.stride
+        for point in self.board.geometry.points:
+            code = 0
+            for i in range(8):
+                code |= stones[point + self.offsets[i]] << (2 * i)
+            self.codes[point] = code
+        for color in (BLACK_CODE, WHITE_CODE):
+            weights = self.weights[color]
+            rows = self.rows[color]
+            table = self.table.weights[color]
+            for i in range(len(rows)):
+                rows[i] = 0
+            total = 0
+            for point in self.board.geometry.points:
+                weight = 0
+                if stones[point] == EMPTY_CODE:
+                    weight = table[self.codes[point]]
+                weights[point] = weight
+                rows[point / stride] += weight
+                total += weight
+            self.totals[color] = total
+
+    def copy(self, board):
+        ''' the same state for a copy of the board '''
+        result = EmptyState()
+        result.__class__ = PatternState
+        result.board = board
+        result.table = self.table
+        result.stride = self.stride
+        result.offsets = self.offsets
+        result.around = self.around
+        result.codes = self.codes[:]
+        result.weights = [None, self.weights[1][:], self.weights[2][:], None]
+        result.rows = [None, self.rows[1][:], self.rows[2][:], None]
+        result.totals = self.totals[:]
+        return result
+
+    def set_weight(self, point, empty):
+        ''' weights of point for both colours from its code, 0 if not empty '''
+        row = point / self.stride
+        code = self.codes[point]
+        for color in (BLACK_CODE, WHITE_CODE):
+            weight = 0
+            if empty:
+                weight = self.table.weights[color][code]
+            weights = self.weights[color]
+            change = weight - weights[point]
+            if change:
+                weights[point] = weight
+                self.rows[color][row] += change
+                self.totals[color] += change
+
+    def update(self, point, code):
+        ''' the stone at point changed to code, called by Board '''
+        stones = self.board.stones
+        codes = self.codes
+        for neighbour, shift in self.around[point]:
+            codes[neighbour] = (codes[neighbour] & ~(3 << shift)) | (code << shift)
+            if stones[neighbour] == EMPTY_CODE:
+                self.set_weight(neighbour, True)
+        self.set_weight(point, code == EMPTY_CODE)
+
+    def sample(self):
+        """Legal point for the side to move drawn with chance proportional
+              to its weight, 0 if no point with a weight is legal. Points
+              found illegal (suicide, ko) get weight 0 until the draw is
+              over.
+        """
+        board = self.board
+        color = color_code[board.side]
+        weights = self.weights[color]
+        rows = self.rows[color]
+        stride = self.stride
+        rand = random.random
+        rejected = []
+        point = 0
+        while self.totals[color] > 0:
+            left = int(rand() * self.totals[color])
+            row = 0
+            while left >= rows[row]:
+                left -= rows[row]
+                row += 1
+            point = row * stride
+            while left >= weights[point]:
+                left -= weights[point]
+                point += 1
+            if board.legal_point(point):
+                break
+            rejected.append((point, weights[point]))
+            rows[row] -= weights[point]
+            self.totals[color] -= weights[point]
+            weights[point] = 0
+            point = 0
+        for rejected_point, weight in rejected:
+            weights[rejected_point] = weight
+            rows[rejected_point / stride] += weight
+            self.totals[color] += weight
+        return point
+
+class EmptyState:
+    """PatternState.copy fills one of these in, see Board.copy
+    """
+    pass
+
+def enable_patterns(board, table=None):
+    """Keep pattern codes and weights for board from now on, with the
+          table from table_file if none given.
+          Returns the PatternState, also in board.patterns.
+    """
+    if table is None:
+        table = load_table()
+    board.patterns = PatternState(board, table)
+    return board.patterns
+
+def main():
+    path = table_file
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    save_table(path, default_table().weights[BLACK_CODE])
+    print "wrote %s, %d bytes" % (path, os.path.getsize(path))
+
+if __name__ == '__main__':
+    main()
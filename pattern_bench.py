@@ -0,0 +1,90 @@
+'''
+pattern_bench
+
+3x3 pattern playouts against uniform random ones: moves per second of
+a playout from the empty board picking moves from a legal move list
+(as Game.list_moves does), by uniform sampling (playout.playout_point)
+and by pattern weight (pattern.PatternState.sample), then games between
+the pattern and the uniform policy, colours alternating
+
+usage: python pattern_bench.py [size] [seconds] [games]
+'''
+
+import sys, time, random
+from simple_go import Board, BLACK, WHITE, PASS_MOVE, AREA, score_board
+from playout import own_eye, playout_point
+from pattern import load_table, enable_patterns
+
+def list_point(board):
+    ''' random point from the list of legal moves that are not own eyes '''
+    is_eye = own_eye(board)
+    point_of = board.geometry.point_of
+    points = [point_of[move] for move in board.legal_moves()]
+    points = [point for point in points if not is_eye(point)]
+    if points:
+        return random.choice(points)
+    return 0
+
+def pattern_point(board):
+    return board.patterns.sample()
+
+def play_game(board, black, white, max_moves):
+    ''' play with a point chooser per colour until two passes, returns moves made '''
+    choose = {BLACK: black, WHITE: white}
+    passes = 0
+    moves = 0
+    while passes < 2 and moves < max_moves:
+        point = choose[board.side](board)
+        if point:
+            board.play_point(point)
+            board.change_side()
+            passes = 0
+        else:
+            board.make_move(PASS_MOVE)
+            passes += 1
+        moves += 1
+    return moves
+
+def moves_per_second(size, seconds, choose, table):
+    moves = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        board = Board(size)
+        if table is not None:
+            enable_patterns(board, table)
+        moves += play_game(board, choose, choose, 3 * size * size)
+    return moves / (time.time() - start)
+
+def main():
+    size = 9
+    seconds = 3.0
+    games = 100
+    if len(sys.argv) > 1:
+        size = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        seconds = float(sys.argv[2])
+    if len(sys.argv) > 3:
+        games = int(sys.argv[3])
+    random.seed(1)
+    table = load_table()
+    print "%dx%d playout moves/sec" % (size, size)
+    for name, choose, patterns in (("legal move list", list_point, None),
+                                   ("uniform sample", playout_point, None),
+                                   ("patterns", pattern_point, table)):
+        print "%-16s %10.1f" % (name, moves_per_second(size, seconds, choose, patterns))
+    wins = 0
+    for game in range(games):
+        board = Board(size)
+        enable_patterns(board, table)
+        if game % 2:
+            play_game(board, playout_point, pattern_point, 3 * size * size)
+            pattern_color = WHITE
+        else:
+            play_game(board, pattern_point, playout_point, 3 * size * size)
+            pattern_color = BLACK
+        if score_board(board, 0.5, AREA).winner() == pattern_color:
+            wins += 1
+    print "patterns won %d of %d games against uniform" % (wins, games)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import simple_go
+from simple_go import BLACK, WHITE, BLACK_CODE, WHITE_CODE
+import pattern
+from pattern import enable_patterns, load_table, save_table, default_table, \
+     symmetries, transform, swap_colors, valid_codes, canonical
+from playout import playout
+import os
+import random
+import tempfile
+import unittest
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(21)
+        self.table = load_table()
+
+    def check_state(self, board):
+        ''' incremental codes and weights match a fresh PatternState '''
+        fresh = pattern.PatternState(board, self.table)
+        state = board.patterns
+        for point in board.geometry.points:
+            self.assertEqual(state.codes[point], fresh.codes[point])
+        for color in (BLACK_CODE, WHITE_CODE):
+            self.assertEqual(state.weights[color], fresh.weights[color])
+            self.assertEqual(state.rows[color], fresh.rows[color])
+            self.assertEqual(state.totals[color], fresh.totals[color])
+
+    def test_incremental(self):
+        ''' moves, captures, undo and copies keep the state right '''
+        board = simple_go.Board(7)
+        enable_patterns(board, self.table)
+        for i in range(150):
+            if board.journal and random.random() < 0.2:
+                board.undo()
+            else:
+                board.make_move(board.random_legal_move())
+            self.check_state(board)
+        self.assertTrue(board.captures[BLACK] + board.captures[WHITE] > 0)
+        copy = board.copy()
+        copy.make_move(copy.random_legal_move())
+        self.check_state(copy)
+        self.check_state(board)
+        board.add_stones([board.geometry.pos_of[board.empty_points[0]]], BLACK)
+        self.check_state(board)
+
+    def test_code(self):
+        board = simple_go.Board(5)
+        board.add_stones([(2, 2)], BLACK)
+        board.add_stones([(1, 2)], WHITE)
+        state = enable_patterns(board, self.table)
+        code = state.codes[board.geometry.point_of[1, 1]]
+        # below the corner is border, above it (1, 2) white and (2, 2) black
+        self.assertEqual(pattern.code_points(code), [3, 3, 3, 3, 0, 3, 2, 1])
+
+    def test_table_file(self):
+        ''' the file holds one record per symmetry class and loads back '''
+        table = default_table()
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        save_table(path, table.weights[BLACK_CODE])
+        loaded = load_table(path)
+        os.remove(path)
+        moves = symmetries()
+        classes = set([canonical(code, moves) for code in valid_codes()])
+        self.assertEqual(os.path.getsize(pattern.table_file), 6 + 3 * len(classes))
+        for code in valid_codes():
+            for color in (BLACK_CODE, WHITE_CODE):
+                self.assertEqual(loaded.weights[color][code], table.weights[color][code])
+                self.assertEqual(self.table.weights[color][code], table.weights[color][code])
+
+    def test_symmetry(self):
+        table = default_table().weights
+        moves = symmetries()
+        self.assertEqual(len(set([tuple(m) for m in moves])), 8)
+        for code in valid_codes()[::7]:
+            for moved in moves:
+                self.assertEqual(table[BLACK_CODE][transform(code, moved)], table[BLACK_CODE][code])
+            self.assertEqual(table[WHITE_CODE][code], table[BLACK_CODE][swap_colors(code)])
+
+    def test_eyes(self):
+        ''' own eyes weigh nothing, the opponent may play there '''
+        board = simple_go.Board(5)
+        board.add_stones([(1, 2), (2, 1)], BLACK)
+        state = enable_patterns(board, self.table)
+        corner = board.geometry.point_of[1, 1]
+        self.assertEqual(state.weights[BLACK_CODE][corner], 0)
+        self.assertTrue(state.weights[WHITE_CODE][corner] > 0)
+
+    def test_sample(self):
+        ''' samples are legal, and a pattern playout ends the game '''
+        board = simple_go.Board(5)
+        state = enable_patterns(board, self.table)
+        for i in range(200):
+            point = state.sample()
+            if not point:
+                break
+            self.assertTrue(board.legal_point(point))
+            board.play_point(point)
+            board.change_side()
+        self.check_state(board)
+        score = playout(board.copy(), 0.5)
+        self.assertTrue(score.winner() in (BLACK, WHITE))
+
+if __name__ == '__main__':
+    unittest.main()
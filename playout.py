@@ -0,0 +1,183 @@
+'''
+Monte Carlo playouts for badukpy
+
+A playout plays uniformly random legal moves from a position until both
+sides pass or a move cap is reached, then scores the end position by
+area (Tromp-Taylor). A side never fills one of its own eyes (an empty
+point with only its own stones or the border around it), so groups with
+two eyes stay alive and games come to an end.
+
+Everything here works on a copy of a simple_go.Board and drives it
+through play_point directly, so the hot loop pays for none of Game's
+SGF and game tree bookkeeping. Functions taking a position accept a
+Game (its current board and komi are used) or a Board.
+'''
+
+import time
+from simple_go import Game, PASS_MOVE, BLACK, WHITE, BORDER_CODE, \
+     BLACK_CODE, WHITE_CODE, AREA, color_code, score_board
+
+def board_and_komi(position, komi=None):
+    ''' (copy of the board, komi) of a Game or Board, komi from the game
+        unless given, 0 for a Board
+    '''
+    if isinstance(position, Game):
+        if komi is None:
+            komi = position.komi
+        return position.current_board.copy(), komi
+    if komi is None:
+        komi = 0.0
+    return position.copy(), komi
+
+def own_eye(board):
+    ''' function telling whether a point is an eye of the side to move:
+        all its neighbours are own stones or border
+    '''
+    code = color_code[board.side]
+    stones = board.stones
+    neighbours = board.geometry.neighbours
+    def is_eye(point):
+        for neighbour in neighbours[point]:
+            other = stones[neighbour]
+            if other != code and other != BORDER_CODE:
+                return False
+        return True
+    return is_eye
+
+def playout_point(board):
+    ''' random legal point for the side to move that does not fill one of
+        its own eyes, 0 if there is none
+    '''
+    return board.random_legal_point(own_eye(board))
+
+def playout(board, komi=0.0, max_moves=None):
+    """Play random moves on board (changed in place) until two passes in
+          a row or max_moves moves, three times the number of points if
+          not given. Moves are drawn by 3x3 pattern weight when the board
+          has patterns turned on (see pattern.py), uniformly otherwise.
+          Returns the simple_go.Score of the end position, area scoring.
+    """
+    if max_moves is None:
+        max_moves = 3 * board.size * board.size
+    patterns = board.patterns
+    passes = 0
+    moves = 0
+    while passes < 2 and moves < max_moves:
+        if patterns is not None:
+            point = patterns.sample()
+        else:
+            point = playout_point(board)
+        if point:
+            board.play_point(point)
+            board.change_side()
+            passes = 0
+        else:
+            board.make_move(PASS_MOVE)
+            passes += 1
+        moves += 1
+    return score_board(board, komi, AREA)
+
+class Playouts:
+    """Results of many playouts from one position, see run_playouts.
+          count: playouts run
+          black_wins, white_wins: playouts won by that colour, a draw
+            is counted for neither
+          owner: per flat board index, number of playouts that ended with
+            the point black minus number that ended with it white
+          elapsed: seconds taken
+    """
+    def __init__(self, board):
+        self.geometry = board.geometry
+        self.count = 0
+        self.black_wins = 0
+        self.white_wins = 0
+        self.owner = [0] * board.geometry.area
+        self.elapsed = 0.0
+
+    def add(self, score):
+        ''' count in the Score of one playout '''
+        self.count += 1
+        winner = score.winner()
+        if winner == BLACK:
+            self.black_wins += 1
+        elif winner == WHITE:
+            self.white_wins += 1
+        owner = self.owner
+        for point, code in enumerate(score.owner):
+            if code == BLACK_CODE:
+                owner[point] += 1
+            elif code == WHITE_CODE:
+                owner[point] -= 1
+
+    def win_rate(self, color):
+        ''' fraction of the playouts color won, draws count half '''
+        if not self.count:
+            return 0.5
+        if color == BLACK:
+            wins, losses = self.black_wins, self.white_wins
+        else:
+            wins, losses = self.white_wins, self.black_wins
+        return (wins + 0.5 * (self.count - wins - losses)) / float(self.count)
+
+    def ownership(self, pos):
+        ''' from -1.0 (always white) to 1.0 (always black) for (x, y) '''
+        if not self.count:
+            return 0.0
+        return self.owner[self.geometry.point_of[pos]] / float(self.count)
+
+    def rate(self):
+        ''' playouts per second '''
+        if not self.elapsed:
+            return 0.0
+        return self.count / self.elapsed
+
+def run_playouts(position, count, komi=None, max_moves=None):
+    """count playouts from a Game or Board, which is not changed.
+          Returns Playouts.
+    """
+    root, komi = board_and_komi(position, komi)
+    result = Playouts(root)
+    start = time.time()
+    for i in range(count):
+        result.add(playout(root.copy(), komi, max_moves))
+    result.elapsed = time.time() - start
+    return result
+
+def flat_monte_carlo(position, playouts_per_move, komi=None, max_moves=None):
+    """Flat Monte Carlo move choice: playouts_per_move playouts after each
+          legal move that does not fill an own eye, the move with the
+          best win rate for the side to move wins.
+          Returns (move, {move: win rate}), move is PASS_MOVE if there is
+          nothing else to play.
+    """
+    root, komi = board_and_komi(position, komi)
+    side = root.side
+    is_eye = own_eye(root)
+    pos_of = root.geometry.pos_of
+    rates = {}
+    for point in list(root.empty_points):
+        if not root.legal_point(point) or is_eye(point):
+            continue
+        child = root.copy()
+        child.play_point(point)
+        child.change_side()
+        result = run_playouts(child, playouts_per_move, komi, max_moves)
+        rates[pos_of[point]] = result.win_rate(side)
+    if not rates:
+        return PASS_MOVE, rates
+    best = max(rates.values())
+    for move in root.iterate_goban():
+        if rates.get(move) == best:
+            return move, rates
+
+def playouts_per_second(position, seconds=1.0, komi=None, max_moves=None):
+    """Run playouts from position for about the given number of seconds.
+          Returns Playouts, see its rate().
+    """
+    root, komi = board_and_komi(position, komi)
+    result = Playouts(root)
+    start = time.time()
+    while time.time() - start < seconds:
+        result.add(playout(root.copy(), komi, max_moves))
+    result.elapsed = time.time() - start
+    return result
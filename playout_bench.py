@@ -0,0 +1,41 @@
+'''
+playout_bench
+
+playouts per second from the empty board and from the middle of a game,
+and the time one flat Monte Carlo move choice takes
+
+usage: python playout_bench.py [size] [seconds] [playouts per move]
+'''
+
+import sys, time, random
+from simple_go import Game, BLACK
+from playout import playouts_per_second, flat_monte_carlo
+
+def main():
+    size = 9
+    seconds = 5.0
+    per_move = 10
+    if len(sys.argv) > 1:
+        size = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        seconds = float(sys.argv[2])
+    if len(sys.argv) > 3:
+        per_move = int(sys.argv[3])
+    random.seed(1)
+    game = Game(size)
+    print "%dx%d playouts" % (size, size)
+    result = playouts_per_second(game, seconds)
+    print "%-16s %8.1f playouts/sec  black wins %.2f" % (
+        "empty board", result.rate(), result.win_rate(BLACK))
+    for i in range(size * size / 3):
+        game.make_move(game.select_random_move())
+    result = playouts_per_second(game, seconds)
+    print "%-16s %8.1f playouts/sec  black wins %.2f" % (
+        "%d moves in" % (size * size / 3), result.rate(), result.win_rate(BLACK))
+    start = time.time()
+    move, rates = flat_monte_carlo(game, per_move)
+    print "flat Monte Carlo, %d playouts x %d moves: %.2fs" % (
+        per_move, len(rates), time.time() - start)
+
+if __name__ == '__main__':
+    main()
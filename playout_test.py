@@ -0,0 +1,58 @@
+import simple_go
+from simple_go import BLACK, WHITE, string_as_move
+from playout import own_eye, playout, playout_point, run_playouts, flat_monte_carlo, playouts_per_second
+import random
+import unittest
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(7)
+        self.game = simple_go.Game(5)
+        black = ['A5','A4','B4','C4','C5','D4','E4']
+        white = ['A2','B2','B1','C2','D2','E2','E3']
+        for i in range(7):
+            self.game.make_move(string_as_move(black[i], 5))
+            self.game.make_move(string_as_move(white[i], 5))
+
+    def test_playout_ends(self):
+        board = simple_go.Board(5)
+        score = playout(board, 0.5)
+        self.assertEqual(playout_point(board), 0)
+        board.change_side()
+        self.assertEqual(playout_point(board), 0)
+        self.assertEqual(score.black + score.white - 0.5 + score.dame, 25)
+        self.assertTrue(score.winner() in (BLACK, WHITE))
+
+    def test_ownership(self):
+        ''' both groups of the life_test position are alive, so are their eyes '''
+        board = self.game.current_board.copy()
+        result = run_playouts(self.game, 20)
+        self.assertEqual(self.game.current_board, board)
+        self.assertEqual(result.count, 20)
+        self.assertEqual(result.black_wins + result.white_wins, 20)
+        self.assertEqual(result.ownership(string_as_move('B5', 5)), 1.0)
+        self.assertEqual(result.ownership(string_as_move('A1', 5)), -1.0)
+        self.assertEqual(result.win_rate(BLACK) + result.win_rate(WHITE), 1.0)
+
+    def test_flat_monte_carlo(self):
+        ''' black saves the game by capturing the white stone at C4 '''
+        board = simple_go.Board(5)
+        board.add_stones([(1, 3), (2, 3), (3, 3), (4, 4), (5, 3), (2, 4)], BLACK)
+        board.add_stones([(1, 2), (2, 2), (3, 2), (4, 3), (5, 2), (4, 2), (3, 4)], WHITE)
+        move, rates = flat_monte_carlo(board, 30)
+        is_eye = own_eye(board)
+        self.assertEqual(sorted(rates.keys()),
+                         sorted([m for m in board.legal_moves()
+                                 if not is_eye(board.geometry.point_of[m])]))
+        self.assertEqual(rates[move], max(rates.values()))
+        self.assertEqual(move, (3, 5))
+
+    def test_playouts_per_second(self):
+        result = playouts_per_second(simple_go.Board(5), 0.2)
+        self.assertTrue(result.count > 0)
+        self.assertTrue(result.rate() > 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,276 @@
+'''
+UCT search for badukpy
+
+Monte Carlo tree search: every iteration walks down the tree from the
+root picking moves by UCB1 (win rate plus an exploration bonus for moves
+tried less often), adds one new node, finishes the game with a random
+playout (see playout.py) and counts the result in every node on the way.
+
+Nodes are positions, not paths: a transposition table maps the position
+key (Zobrist hash of the stones, side to move and ko point) to the node,
+so move orders that reach the same position share its statistics. The
+tree is kept in flat arrays instead of node objects:
+
+    visits[node], wins[node]   playouts through the node, and how many
+                               of those the side that just moved won
+    side[node]                 colour code to move
+    first_edge[node]           index of its first edge, -1 until the
+                               node is expanded
+    edge_count[node]           number of edges
+    edge_move[edge]            flat board index, 0 for pass
+    edge_node[edge]            node the edge leads to, -1 until tried
+
+Between moves of a game the part of the graph that can be reached from
+the new root is copied into fresh arrays and everything else dropped, so
+the work done on the moves that were actually played is kept.
+'''
+
+import time, random
+from math import sqrt, log
+from array import array
+from simple_go import PASS_MOVE, BLACK, EMPTY, WHITE_CODE, AREA, color_code, board_geometry, score_board
+from playout import playout, own_eye
+from pattern import enable_patterns
+
+def position_key(board):
+    ''' Zobrist key of stones, side to move and ko point '''
+    geometry = board.geometry
+    key = board.hash ^ geometry.zobrist_ko[board.ko_point]
+    if color_code[board.side] == WHITE_CODE:
+        key ^= geometry.zobrist_side
+    return key
+
+class UCTSearch:
+    def __init__(self, size, playouts=1000, seconds=None, komi=6.5,
+                 exploration=0.7, max_nodes=1000000, patterns=None):
+        """Initialize search:
+              size: board size
+              playouts, seconds: budget of one search, it stops at the
+                first one reached, None for no limit (not both)
+              komi: for scoring the playouts
+              exploration: UCB1 constant
+              max_nodes: no new nodes are added after this many, playouts
+                go on from the leaves of the full tree
+              patterns: pattern.PatternTable for the playouts, uniform
+                random playouts if None
+        """
+        self.geometry = board_geometry(size)
+        self.playouts = playouts
+        self.seconds = seconds
+        self.komi = komi
+        self.exploration = exploration
+        self.max_nodes = max_nodes
+        self.patterns = patterns
+        self.clear()
+
+    def clear(self):
+        ''' drop all nodes '''
+        self.table = {}  # position key -> node
+        self.visits = array('i')
+        self.wins = array('d')
+        self.side = array('b')
+        self.first_edge = array('i')
+        self.edge_count = array('i')
+        self.edge_move = array('h')
+        self.edge_node = array('i')
+
+    def add_node(self, key, side):
+        ''' new unexpanded node for a position, returns its index '''
+        node = len(self.visits)
+        self.table[key] = node
+        self.visits.append(0)
+        self.wins.append(0.0)
+        self.side.append(side)
+        self.first_edge.append(-1)
+        self.edge_count.append(0)
+        return node
+
+    def expand(self, node, board):
+        ''' edges for every legal move that does not fill an own eye, in
+            random order, and pass last
+        '''
+        is_eye = own_eye(board)
+        moves = [point for point in board.empty_points
+                 if board.legal_point(point) and not is_eye(point)]
+        random.shuffle(moves)
+        moves.append(0)
+        self.first_edge[node] = len(self.edge_move)
+        self.edge_count[node] = len(moves)
+        self.edge_move.extend(moves)
+        self.edge_node.extend([-1] * len(moves))
+
+    def select(self, node):
+        ''' UCB1 edge of an expanded node, an untried edge first '''
+        visits = self.visits
+        wins = self.wins
+        edge_node = self.edge_node
+        bonus = self.exploration * sqrt(log(max(visits[node], 1)))
+        best = -1
+        best_value = -1.0
+        first = self.first_edge[node]
+        for edge in range(first, first + self.edge_count[node]):
+            child = edge_node[edge]
+            if child < 0 or not visits[child]:
+                return edge
+            count = visits[child]
+            value = wins[child] / count + bonus / sqrt(count)
+            if value > best_value:
+                best = edge
+                best_value = value
+        return best
+
+    def set_root(self, board):
+        """Make the position of board the root. Nodes that can not be
+              reached from it are dropped and the rest renumbered, so the
+              arrays only hold what this search can use.
+              Returns the root node.
+        """
+        key = position_key(board)
+        root = self.table.get(key)
+        if root is None:
+            self.clear()
+            return self.add_node(key, color_code[board.side])
+        keep = [root]
+        number = {root: 0}
+        i = 0
+        while i < len(keep):
+            node = keep[i]
+            first = self.first_edge[node]
+            if first >= 0:
+                for edge in range(first, first + self.edge_count[node]):
+                    child = self.edge_node[edge]
+                    if child >= 0 and child not in number:
+                        number[child] = len(keep)
+                        keep.append(child)
+            i += 1
+        old = (self.visits, self.wins, self.side, self.first_edge, self.edge_count,
+               self.edge_move, self.edge_node)
+        visits, wins, side, first_edge, edge_count, edge_move, edge_node = old
+        keys = dict([(node, key) for key, node in self.table.iteritems() if node in number])
+        self.clear()
+        for node in keep:
+            self.table[keys[node]] = number[node]
+            self.visits.append(visits[node])
+            self.wins.append(wins[node])
+            self.side.append(side[node])
+            first = first_edge[node]
+            if first < 0:
+                self.first_edge.append(-1)
+                self.edge_count.append(0)
+                continue
+            self.first_edge.append(len(self.edge_move))
+            self.edge_count.append(edge_count[node])
+            for edge in range(first, first + edge_count[node]):
+                self.edge_move.append(edge_move[edge])
+                child = edge_node[edge]
+                if child >= 0:
+                    child = number[child]
+                self.edge_node.append(child)
+        return 0
+
+    def iterate(self, root, root_board):
+        ''' one walk down the tree, playout and update '''
+        board = root_board.copy()
+        table = self.table
+        path = [root]
+        on_path = set(path)
+        node = root
+        passes = 0
+        while True:
+            if self.first_edge[node] < 0:
+                self.expand(node, board)
+            edge = self.select(node)
+            point = self.edge_move[edge]
+            if point:
+                board.play_point(point)
+                board.change_side()
+                passes = 0
+            else:
+                board.make_move(PASS_MOVE)
+                passes += 1
+            child = self.edge_node[edge]
+            new = False
+            if child < 0:
+                key = position_key(board)
+                child = table.get(key)
+                if child is None:
+                    if len(self.visits) >= self.max_nodes:
+                        break
+                    child = self.add_node(key, color_code[board.side])
+                    new = True
+                self.edge_node[edge] = child
+            if child in on_path:
+                break  # position repeats, evaluate it from here
+            path.append(child)
+            on_path.add(child)
+            node = child
+            if new or passes == 2:
+                break
+        if passes == 2:
+            score = score_board(board, self.komi, AREA)
+        else:
+            score = playout(board, self.komi)
+        black_result = {BLACK: 1.0, EMPTY: 0.5}.get(score.winner(), 0.0)
+        visits = self.visits
+        wins = self.wins
+        side = self.side
+        for node in path:
+            visits[node] += 1
+            if side[node] == WHITE_CODE:
+                wins[node] += black_result  # black moved into it
+            else:
+                wins[node] += 1.0 - black_result
+
+    def search(self, board):
+        """Search from the position of board (not changed) until the
+              playout or time budget is used.
+              Returns the root node.
+        """
+        root = self.set_root(board)
+        if self.patterns is not None and board.patterns is None:
+            board = board.copy()
+            enable_patterns(board, self.patterns)
+        start = time.time()
+        count = 0
+        while True:
+            if self.playouts is not None and count >= self.playouts:
+                break
+            if self.seconds is not None and time.time() - start >= self.seconds:
+                break
+            self.iterate(root, board)
+            count += 1
+        return root
+
+    def ranked_moves(self, root):
+        ''' root moves as (visits, win rate, flat point) best first '''
+        result = []
+        first = self.first_edge[root]
+        for edge in range(first, first + self.edge_count[root]):
+            child = self.edge_node[edge]
+            if child >= 0 and self.visits[child]:
+                count = self.visits[child]
+                result.append((count, self.wins[child] / count, self.edge_move[edge]))
+        result.sort(reverse=True)
+        return result
+
+    def best_move(self, board, excluded=()):
+        """Search and return the most visited move as (x, y) or
+              PASS_MOVE. Moves whose stones hash (Board.key) is in excluded
+              are skipped, see generate_move.
+        """
+        root = self.search(board)
+        pos_of = self.geometry.pos_of
+        for count, rate, point in self.ranked_moves(root):
+            if not point:
+                return PASS_MOVE
+            move = pos_of[point]
+            if board.hash_new_move(move) not in excluded:
+                return move
+        return PASS_MOVE
+
+    def generate_move(self, game):
+        ''' best_move for the current position of a simple_go.Game,
+            never a move that repeats an earlier position of the line
+            played to it (superko, see Game.position_seen)
+        '''
+        return self.best_move(game.current_board, game.position_seen)
@@ -0,0 +1,112 @@
+import simple_go
+from simple_go import BLACK, WHITE, PASS_MOVE
+from search import UCTSearch, position_key
+import random
+import unittest
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(3)
+        self.search = UCTSearch(5, playouts=200, komi=0.5)
+
+    def test_capture(self):
+        ''' black saves the game by capturing the white stone at C4 '''
+        board = simple_go.Board(5)
+        board.add_stones([(1, 3), (2, 3), (3, 3), (4, 4), (5, 3), (2, 4)], BLACK)
+        board.add_stones([(1, 2), (2, 2), (3, 2), (4, 3), (5, 2), (4, 2), (3, 4)], WHITE)
+        self.assertEqual(self.search.best_move(board), (3, 5))
+        self.assertEqual(self.search.visits[0], 200)
+
+    def test_transposition(self):
+        ''' two move orders reaching one position share its node '''
+        first = simple_go.Board(5)
+        second = simple_go.Board(5)
+        for move in [(2, 2), (4, 4), (3, 2)]:
+            first.make_move(move)
+        for move in [(3, 2), (4, 4), (2, 2)]:
+            second.make_move(move)
+        self.assertEqual(position_key(first), position_key(second))
+        first.make_move(PASS_MOVE)
+        self.assertNotEqual(position_key(first), position_key(second))
+        # on 3x3 the search soon meets positions by more than one path
+        search = UCTSearch(3, playouts=500)
+        search.search(simple_go.Board(3))
+        links = [node for node in search.edge_node if node >= 0]
+        self.assertEqual(len(search.table), len(search.visits))
+        self.assertTrue(set(links) >= set(range(1, len(search.visits))))
+        self.assertTrue(len(links) > len(set(links)))
+
+    def test_reuse(self):
+        ''' the subtree of the moves played is kept, nothing else '''
+        board = simple_go.Board(5)
+        root = self.search.search(board)
+        ranked = self.search.ranked_moves(root)
+        count, rate, point = ranked[0]
+        board.play_point(point)
+        board.change_side()
+        nodes = len(self.search.visits)
+        self.search.playouts = 0
+        root = self.search.search(board)
+        self.assertEqual(root, 0)
+        self.assertEqual(self.search.visits[0], count)
+        self.assertTrue(len(self.search.visits) < nodes)
+        self.assertEqual(len(self.search.table), len(self.search.visits))
+        # an unknown position starts over
+        self.search.search(simple_go.Board(5))
+        self.assertEqual(len(self.search.visits), 1)
+
+    def test_max_nodes(self):
+        ''' a full tree still gets the whole playout budget, from its leaves '''
+        search = UCTSearch(5, playouts=500, max_nodes=10)
+        root = search.search(simple_go.Board(5))
+        self.assertEqual(len(search.visits), 10)
+        self.assertEqual(search.visits[root], 500)
+        root = search.search(simple_go.Board(5))  # reused, already full
+        self.assertEqual(search.visits[root], 1000)
+
+    def test_draw(self):
+        ''' a drawn game counts half a win for both sides '''
+        # on 1x1 the only move is suicide, so every playout is a 0-0 draw
+        search = UCTSearch(1, playouts=20, komi=0)
+        root = search.search(simple_go.Board(1))
+        self.assertEqual(search.wins[root], 10.0)
+        self.assertEqual(search.ranked_moves(root), [(20, 0.5, 0)])
+
+    def test_time_budget(self):
+        self.search.playouts = None
+        self.search.seconds = 0.2
+        root = self.search.search(simple_go.Board(5))
+        self.assertTrue(self.search.visits[root] > 0)
+
+    def test_game(self):
+        ''' Game.generate_move plays legal moves until both pass '''
+        game = simple_go.Game(5)
+        game.engine = UCTSearch(5, playouts=50)
+        passes = 0
+        for i in range(60):
+            move = game.generate_move()
+            self.assertTrue(game.make_move(move))
+            if move == PASS_MOVE:
+                passes += 1
+                if passes == 2: break
+            else:
+                passes = 0
+        self.assertEqual(passes, 2)
+
+    def test_generate_after_undo(self):
+        ''' a position only seen on a line taken back is allowed again '''
+        game = simple_go.Game(5)
+        game.engine = UCTSearch(5, playouts=100)
+        move = game.generate_move()
+        game.make_move(move)
+        game.make_move((1, 1) if move != (1, 1) else (5, 5))
+        game.undo_move()
+        game.undo_move()
+        self.assertEqual(game.position_seen, {game.current_board.key(): 1})
+        game.engine.playouts = 0  # the kept tree ranks the moves as before
+        self.assertEqual(game.generate_move(), move)
+
+if __name__ == '__main__':
+    unittest.main()
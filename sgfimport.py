@@ -0,0 +1,271 @@
+'''
+Bulk SGF import for badukpy
+
+import_games replays every game of a set of SGF files (directories,
+globs or file names, see sgf_files) through a Board in a pool of worker
+processes and hands one compact record per game to a sink in the parent:
+
+  (path, game number in the file, board size, RE of the root or None,
+   moves as an array of gametree.encode_move, their sides as a string
+   of 'B' and 'W', Board.key of the final position, error or None)
+
+Work is cut into tasks of about chunk_bytes of SGF each (see
+plan_tasks): small files are batched together, and files larger than
+that are first scanned by a worker (sgfindex.scan, nothing is saved)
+and split into ranges of games (see split_file), which go to the pool
+as further tasks, so no file is read in the parent. Workers map the
+files and parse with sgfparser.MappedSGFParser, so the games are read
+from the page cache, and only the records (not sgflib trees) are
+pickled back. Records do not come in file order; path and game number
+say where each came from.
+
+A game that does not parse ends its task's range of the file with an
+error record; a move that is not legal ends that game's replay, the
+record keeps the moves up to it.
+
+usage: python sgfimport.py [-j workers] output path...
+'''
+
+import os, sys, glob, time, marshal
+from array import array
+from collections import deque
+from multiprocessing import Pool, cpu_count
+from sgflib import EndOfDataParseError, GameTreeParseError, NodePropertyParseError, \
+     PropertyValueParseError, DuplicatePropertyError
+from sgfparser import MappedSGFParser
+from sgfindex import map_file, scan
+from simple_go import Board, main_line, sgf_color
+from gametree import encode_move
+
+CHUNK_BYTES = 1 << 20
+MAX_SIZE = 52  # largest SZ of FF[4], points a..z and A..Z
+
+PARSE_ERRORS = (EndOfDataParseError, GameTreeParseError, NodePropertyParseError,
+                PropertyValueParseError, DuplicatePropertyError)
+
+def sgf_files(paths):
+    """SGF files named by paths: a directory stands for the *.sgf files
+          under it, a name with wildcards for the files it matches.
+    """
+    result = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirectories, names in os.walk(path):
+                subdirectories.sort()
+                result += [os.path.join(directory, name) for name in sorted(names)
+                           if name.endswith('.sgf')]
+        elif glob.has_magic(path):
+            result += sorted(glob.glob(path))
+        else:
+            result.append(path)
+    return result
+
+def plan_tasks(files, chunk_bytes=CHUNK_BYTES):
+    """Work for the pool: (tasks, large files). tasks are lists for
+          import_task of about chunk_bytes each of files up to that size,
+          whole: (path, 0, 0, None, bytes); large files are (path,
+          bytes, chunk_bytes) for split_file.
+    """
+    tasks = []
+    large = []
+    batch = []
+    batch_bytes = 0
+    for path in files:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0  # the worker reports it
+        if size > chunk_bytes:
+            large.append((path, size, chunk_bytes))
+            continue
+        batch.append((path, 0, 0, None, size))
+        batch_bytes += size
+        if batch_bytes >= chunk_bytes:
+            tasks.append(batch)
+            batch = []
+            batch_bytes = 0
+    if batch:
+        tasks.append(batch)
+    return tasks, large
+
+def split_file(large):
+    """Runs in a worker: tasks for import_task of about chunk_bytes each,
+          ranges of the games of a large file of plan_tasks as (path,
+          byte offset, first game number, games, bytes). One task for
+          the whole file if it does not scan, import_task reports why.
+    """
+    path, size, chunk_bytes = large
+    try:
+        offsets, ends, info = scan(map_file(path), ())
+    except PARSE_ERRORS + (EnvironmentError,):
+        return [[(path, 0, 0, None, size)]]
+    tasks = []
+    first = 0
+    while first < len(offsets):
+        last = first + 1
+        while last < len(offsets) and ends[last - 1] - offsets[first] < chunk_bytes:
+            last += 1
+        tasks.append([(path, offsets[first], first, last - first,
+                       ends[last - 1] - offsets[first])])
+        first = last
+    return tasks
+
+def replay(tree):
+    """Main line of an sgflib GameTree (see simple_go.main_line) played
+          on a Board, each move by the side of its B or W property.
+          Returns (size, result, moves, sides, key, error), see the
+          module doc.
+    """
+    root = tree[0].data
+    size = 19  # the SGF default
+    result = None
+    if 'RE' in root:
+        result = root['RE'][0]
+    moves = array('h')
+    sides = []
+    try:
+        if 'SZ' in root:
+            size = int(root['SZ'][0])
+    except ValueError:
+        return size, result, moves, '', 0, 'bad size'
+    if not 1 <= size <= MAX_SIZE:
+        return size, result, moves, '', 0, 'bad size'
+    board = Board(size)
+    error = None
+    try:
+        for prop, value in main_line(tree, size):
+            if prop in ('AB', 'AW'):
+                board.add_stones(value, sgf_color[prop])
+                continue
+            board.side = sgf_color[prop]
+            if board.make_move(value) is None:
+                error = 'illegal move %d' % (len(moves) + 1)
+                break
+            moves.append(encode_move(value))
+            sides.append(prop)
+    except (ValueError, IndexError):
+        error = 'illegal move %d' % (len(moves) + 1)  # a point that is not on the board
+    return size, result, moves, ''.join(sides), board.key(), error
+
+def import_task(task):
+    """Runs in a worker: replay the games of a task of plan_tasks.
+          Returns (list of records, bytes of SGF in the task).
+    """
+    records = []
+    total = 0
+    for path, offset, first, count, size in task:
+        total += size
+        game = first
+        try:
+            parser = MappedSGFParser(map_file(path))
+        except EnvironmentError, e:
+            records.append((path, game, 0, None, array('h'), '', 0, str(e)))
+            continue
+        parser.index = offset
+        while count is None or game < first + count:
+            try:
+                tree = parser.parseOneGame()
+            except PARSE_ERRORS, e:
+                records.append((path, game, 0, None, array('h'), '', 0, e.__class__.__name__))
+                break
+            if not tree:
+                break
+            records.append((path, game) + replay(tree))
+            game += 1
+    return records, total
+
+def import_games(paths, sink, workers=None, chunk_bytes=CHUNK_BYTES, progress=None):
+    """Replay every game of the SGF files paths (see sgf_files) in a pool
+          of workers processes (cpu_count() if None, 0 to do it all in
+          this one) and call sink(record) for each, see the module doc.
+          progress(games, errors, bytes, seconds) is called after every
+          task.
+          Returns (games, errors, bytes, seconds).
+    """
+    start = time.time()
+    tasks, large = plan_tasks(sgf_files(paths), chunk_bytes)
+    pool = None
+    if workers != 0:
+        pool = Pool(workers or cpu_count())
+    def submit(function, task):
+        if pool is None:
+            return LocalTask(function, task)
+        return pool.apply_async(function, (task,))
+    games = errors = done = 0
+    try:
+        #large files are split first, their ranges queued when they come
+        splits = deque([submit(split_file, item) for item in large])
+        pending = deque([submit(import_task, task) for task in tasks])
+        while splits or pending:
+            if splits and (splits[0].ready() or not pending):
+                pending.extend([submit(import_task, task) for task in splits.popleft().get()])
+                continue
+            records, size = pending.popleft().get()
+            for record in records:
+                sink(record)
+                if record[-1] is not None:
+                    errors += 1
+            games += len(records)
+            done += size
+            if progress:
+                progress(games, errors, done, time.time() - start)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return games, errors, done, time.time() - start
+
+class LocalTask:
+    ''' a task run in this process when its result is asked for, like
+        the result of Pool.apply_async
+    '''
+    def __init__(self, function, task):
+        self.function = function
+        self.task = task
+
+    def ready(self):
+        return True
+
+    def get(self):
+        return self.function(self.task)
+
+def record_writer(handle):
+    ''' sink writing records to an open file, see read_records '''
+    def write(record):
+        marshal.dump(record[:4] + (record[4].tostring(),) + record[5:], handle)
+    return write
+
+def read_records(handle):
+    ''' records written by record_writer, one at a time '''
+    while True:
+        try:
+            record = marshal.load(handle)
+        except EOFError:
+            return
+        moves = array('h')
+        moves.fromstring(record[4])
+        yield record[:4] + (moves,) + record[5:]
+
+def show_progress(games, errors, size, seconds):
+    sys.stderr.write("\r%d games, %d errors, %.1f MB, %.0f games/s, %.2f MB/s" %
+                     (games, errors, size / 1e6, games / max(seconds, 1e-6),
+                      size / 1e6 / max(seconds, 1e-6)))
+
+def main():
+    args = sys.argv[1:]
+    workers = None
+    if args[:1] == ['-j']:
+        workers = int(args[1])
+        args = args[2:]
+    if len(args) < 2:
+        print __doc__.strip().split('\n')[-1]
+        return
+    output = open(args[0], 'wb')
+    games, errors, size, seconds = import_games(args[1:], record_writer(output), workers,
+                                                progress=show_progress)
+    output.close()
+    sys.stderr.write('\n')
+    print "%d games (%d errors) in %.1f s" % (games, errors, seconds)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+'''
+sgfimport_bench
+
+throughput of sgfimport.import_games over a directory of copies of the
+sgf/ samples, one game collection per file, and over one collection
+file of the samples repeated, larger than the import's chunk size so it
+is split by a worker; in this process and with pools of 1, 2, 4 and 8
+workers (no more than the cores, and none on one core). Pool start up
+is timed, the files are read once first so they are in the page cache.
+
+usage: python sgfimport_bench.py [files] [collection MB]
+'''
+
+import os, sys, shutil, tempfile
+from multiprocessing import cpu_count
+from sgfimport import import_games, CHUNK_BYTES
+
+sgf_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sgf')
+
+def read_samples():
+    ''' contents of the *.sgf files in sgf/ '''
+    samples = []
+    for name in sorted(os.listdir(sgf_dir)):
+        if not name.endswith('.sgf'):
+            continue
+        handle = open(os.path.join(sgf_dir, name))
+        samples.append(handle.read())
+        handle.close()
+    return samples
+
+def make_corpus(directory, files):
+    ''' files copies of the sgf/ samples in directory '''
+    samples = read_samples()
+    for i in range(files):
+        handle = open(os.path.join(directory, '%06d.sgf' % i), 'wb')
+        handle.write(samples[i % len(samples)])
+        handle.close()
+
+def make_collection(directory, size):
+    ''' one file of the sgf/ samples repeated to about size bytes '''
+    sample = '\n'.join([data.strip() for data in read_samples()]) + '\n'
+    handle = open(os.path.join(directory, 'collection.sgf'), 'wb')
+    handle.write(sample * max(1, size / len(sample)))
+    handle.close()
+
+def count(record):
+    pass
+
+def run(title, directory):
+    ''' print the rates of importing directory with more and more workers '''
+    import_games([directory], count, 0)
+    print title
+    print "%8s %10s %8s %8s %10s" % ("workers", "games/sec", "MB/s", "speedup", "efficiency")
+    single = None
+    for workers in (0, 1, 2, 4, 8):
+        if workers > cpu_count() or (workers and cpu_count() == 1):
+            break
+        games, errors, size, seconds = import_games([directory], count, workers)
+        rate = games / seconds
+        if single is None:
+            single = rate
+        print "%8d %10.0f %8.2f %8.2f %10.2f" % (workers, rate, size / 1e6 / seconds,
+                                                 rate / single, rate / single / max(workers, 1))
+
+def main():
+    files = 20000
+    megabytes = 16.0
+    if len(sys.argv) > 1:
+        files = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        megabytes = float(sys.argv[2])
+    print "%d cores" % cpu_count()
+    if cpu_count() == 1:
+        print "one core: workers can only take turns, only this process is timed"
+    directory = tempfile.mkdtemp()
+    try:
+        make_corpus(directory, files)
+        run("%d files" % files, directory)
+    finally:
+        shutil.rmtree(directory)
+    directory = tempfile.mkdtemp()
+    try:
+        make_collection(directory, int(megabytes * 1e6))
+        run("one %.0f MB collection, %.0f MB chunks" % (megabytes, CHUNK_BYTES / 1e6), directory)
+        print "files in its directory after:", sorted(os.listdir(directory))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import simple_go
+from simple_go import BLACK, WHITE, PASS_MOVE
+from sgfimport import sgf_files, plan_tasks, split_file, import_games, record_writer, \
+     read_records
+from gametree import decode_move
+import os
+import shutil
+import tempfile
+import unittest
+
+sgf_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sgf')
+
+def collect(paths, workers, chunk_bytes=1 << 20):
+    ''' records of import_games sorted by file and game, and its totals '''
+    records = []
+    totals = import_games(paths, records.append, workers, chunk_bytes)
+    records.sort()
+    return records, totals
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        handle = open(path, 'wb')
+        handle.write(data)
+        handle.close()
+        return path
+
+    def test_files(self):
+        ''' directories, wildcards and plain names '''
+        os.mkdir(os.path.join(self.directory, 'sub'))
+        a = self.write('a.sgf', '')
+        b = self.write(os.path.join('sub', 'b.sgf'), '')
+        self.write('notes.txt', '')
+        self.assertEqual(sgf_files([self.directory]), [a, b])
+        self.assertEqual(sgf_files([os.path.join(self.directory, '*.txt'), a]),
+                         [os.path.join(self.directory, 'notes.txt'), a])
+
+    def test_replay(self):
+        ''' moves, sides, result and final position of every game '''
+        path = self.write('games.sgf', '(;SZ[9]RE[B+R]AB[cc]AW[dd];B[ee];W[ff];B[];W[tt])\n'
+                                       '(;SZ[5];W[aa](;B[bb])(;B[cc]))')
+        records, totals = collect([path], 0)
+        self.assertEqual(totals[:3], (2, 0, os.path.getsize(path)))
+        first, second = records
+        self.assertEqual(first[:4], (path, 0, 9, 'B+R'))
+        self.assertEqual(map(decode_move, first[4]), [(5, 5), (6, 6), PASS_MOVE, PASS_MOVE])
+        self.assertEqual(first[5], 'BWBW')
+        board = simple_go.Board(9)
+        board.add_stones([(3, 3), (5, 5)], BLACK)
+        board.add_stones([(4, 4), (6, 6)], WHITE)
+        self.assertEqual(first[6], board.key())
+        self.assertEqual(first[7], None)
+        self.assertEqual(second[1:4], (1, 5, None))
+        self.assertEqual(map(decode_move, second[4]), [(1, 1), (2, 2)])
+        self.assertEqual(second[5], 'WB')
+
+    def test_samples(self):
+        ''' the games of sgf/ replay as game_from_file replays them '''
+        records, totals = collect([sgf_dir], 0)
+        self.assertEqual(totals[1], 0)
+        for path, game, size, result, moves, sides, key, error in records:
+            self.assertEqual(key, simple_go.game_from_sgf(open(path).read(), game)
+                             .current_board.key())
+
+    def test_workers(self):
+        ''' the same records from a pool, and with a collection split in
+            ranges of games
+        '''
+        samples = [open(os.path.join(sgf_dir, name)).read() for name in sorted(os.listdir(sgf_dir))
+                   if name.endswith('.sgf')]
+        for i in range(4):
+            self.write('%d.sgf' % i, samples[i])
+        path = self.write('collection.sgf', '\n'.join(samples) * 5)
+        tasks, large = plan_tasks(sgf_files([self.directory]), 2000)
+        self.assertFalse([item for task in tasks for item in task if item[0] == path])
+        ranges = split_file([item for item in large if item[0] == path][0])
+        self.assertTrue(len(ranges) > 1)
+        self.assertEqual([len(task) for task in ranges], [1] * len(ranges))
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['0.sgf', '1.sgf', '2.sgf', '3.sgf', 'collection.sgf'])  # no index
+        single, totals = collect([self.directory], 0, 2000)
+        pooled, pooled_totals = collect([self.directory], 3, 2000)
+        self.assertEqual(pooled, single)
+        self.assertEqual(pooled_totals[:3], totals[:3])
+        games = len(collect([sgf_dir], 0)[0])
+        self.assertEqual(len([record for record in single if record[0] == path]), 5 * games)
+        self.assertEqual([record[1] for record in single if record[0] == path],
+                         range(5 * games))
+
+    def test_errors(self):
+        ''' an illegal move ends its game, bad SGF the rest of the file '''
+        path = self.write('bad.sgf', '(;SZ[5];B[aa];W[bb];B[aa];W[cc])(;B[ab]x)(;B[cc])')
+        missing = os.path.join(self.directory, 'missing.sgf')
+        records, totals = collect([path, missing], 2)
+        self.assertEqual(totals[:2], (3, 3))
+        self.assertEqual(records[0][1], 0)
+        self.assertEqual(map(decode_move, records[0][4]), [(1, 1), (2, 2)])
+        self.assertEqual(records[0][7], 'illegal move 3')
+        self.assertEqual(records[1][1], 1)
+        self.assertEqual(records[1][7], 'GameTreeParseError')
+        self.assertEqual(records[2][0], missing)
+        self.assertNotEqual(records[2][7], None)
+
+    def test_bad_size(self):
+        ''' a size off the SGF range ends its game, not the import '''
+        path = self.write('sizes.sgf', '(;SZ[200];B[aa])(;SZ[0];B[aa])(;SZ[-3])(;SZ[x])'
+                                       '(;SZ[52];B[aa])')
+        records, totals = collect([path], 0)
+        self.assertEqual(totals[:2], (5, 4))
+        self.assertEqual([record[7] for record in records], ['bad size'] * 4 + [None])
+        self.assertEqual(map(decode_move, records[4][4]), [(1, 1)])
+
+    def test_truncated(self):
+        ''' a large file cut off inside a value is reported, not hung on '''
+        path = self.write('cut.sgf', '(;SZ[5];B[aa])\n' * 50 + '(;B[bb]C[' + 'a b ' * 1000)
+        records, totals = collect([path], 2, 500)
+        self.assertEqual(totals[:2], (51, 1))
+        self.assertEqual(records[-1][1:2] + records[-1][7:], (50, 'PropertyValueParseError'))
+
+    def test_record_file(self):
+        ''' records written and read back '''
+        records, totals = collect([sgf_dir], 0)
+        path = os.path.join(self.directory, 'records')
+        handle = open(path, 'wb')
+        write = record_writer(handle)
+        for record in records:
+            write(record)
+        handle.close()
+        handle = open(path, 'rb')
+        self.assertEqual(list(read_records(handle)), records)
+        handle.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,286 @@
+'''
+Lazy SGF collection index for badukpy
+
+scan() goes once over an SGF collection and notes where every game
+starts and ends (byte offsets) and a few properties of its root node
+(FIELDS: board size, players, result, date). Only root nodes are
+parsed; the rest of a game is skipped with one regular expression match
+from each "(" or ")" to the next, over whole property values (escaped
+"]"s included).
+
+SGFIndex holds that and, when asked to (save=True), saves it next to
+the collection file (the file name plus INDEX_SUFFIX) together with the
+file's size and modification time, so opening the collection again
+reads the index instead of the collection, and filtering by player or
+result never looks at a move. An index saved before is used whether or
+not a new one would be saved.
+LazyCollection is an sgflib.Collection that parses a game the first
+time it is indexed, straight from the data at the game's offset;
+open_collection gives one over an mmap of the file, parsed with
+sgfparser.MappedSGFParser, so no game is copied out of the page cache
+(which processes mapping the same file share) and moves stay buffer
+objects until decoded.
+
+usage: collection = open_collection(path, save=True)
+       for k in collection.index.find(PB='Honinbo Shusaku'):
+           game = collection[k]
+'''
+
+import os, sys, re, struct, marshal, mmap
+from array import array
+from sgflib import Collection, Cursor, EndOfDataParseError, PropertyValueParseError
+from sgfparser import FastSGFParser, MappedSGFParser, skip_whitespace
+
+FIELDS = ('SZ', 'PB', 'PW', 'RE', 'DT')
+
+MAGIC = 'BPI2'
+OFFSET_BYTES = 8
+HEADER = struct.Struct('<4sBQdI')  # magic, OFFSET_BYTES, file size, mtime, games
+INDEX_SUFFIX = '.idx'
+
+#everything up to the next "(" or ")" outside a property value; values
+#are matched as runs of plain characters between escapes, so there is
+#only one way to match them and a "[" that is never closed is given up
+#on in linear time
+SKIP = re.compile(r'(?:[^\[()]+|\[[^\]\\]*(?:\\.[^\]\\]*)*\])*', re.S)
+
+class OffsetColumn:
+    """Byte offsets into a file as two array('I') of their high and low
+          32 bits, like gametree.HashColumn: array('L') is 32 bits where a
+          C long is (Windows, 32 bit builds), too few past 4 GB. Indexes
+          and appends like an array; saved as little endian words, the
+          same on every machine.
+    """
+    itemsize = OFFSET_BYTES
+
+    def __init__(self):
+        self.high = array('I')
+        self.low = array('I')
+
+    def __len__(self):
+        return len(self.low)
+
+    def __getitem__(self, index):
+        return self.high[index] << 32 | self.low[index]
+
+    def __eq__(left, right):
+        return (isinstance(right, OffsetColumn) and
+                left.high == right.high and left.low == right.low)
+
+    def __ne__(left, right):
+        return not left.__eq__(right)
+
+    def append(self, value):
+        self.high.append(value >> 32)
+        self.low.append(value & 0xffffffff)
+
+    def tofile(self, handle):
+        for column in (self.high, self.low):
+            if sys.byteorder == 'big':
+                column = array('I', column)
+                column.byteswap()
+            column.tofile(handle)
+
+    def fromfile(self, handle, count):
+        ''' read count offsets written by tofile, EOFError if cut short '''
+        for column in (self.high, self.low):
+            column.fromfile(handle, count)
+            if sys.byteorder == 'big':
+                column.byteswap()
+
+def scan(data, fields=FIELDS):
+    """Games of an SGF collection (a string or an mmap), like
+          FastSGFParser.parse() reading stops at the first thing that is
+          not the start of a game.
+          Returns (offsets, ends, info): OffsetColumns of the byte offset of each
+          game's "(" and of the byte after its ")", and per game a tuple
+          of the first value of each field in its root node, None if it
+          does not have it.
+    """
+    end = len(data)
+    parser = FastSGFParser(data)
+    offsets = OffsetColumn()
+    ends = OffsetColumn()
+    info = []
+    i = 0
+    while True:
+        start = skip_whitespace(data, i, end)
+        if start >= end or data[start] != '(':
+            break
+        i = skip_whitespace(data, start + 1, end)
+        if i >= end or data[i] != ';':
+            break  # no root node, parse stops there too
+        root, i = parser.parseNode(i + 1)
+        values = tuple([root.data[prop][0] if prop in root.data else None
+                        for prop in fields])
+        depth = 1
+        while depth:
+            i = SKIP.match(data, i).end()
+            if i >= end:
+                raise EndOfDataParseError
+            c = data[i]
+            i += 1
+            if c == '(':
+                depth += 1
+            elif c == ')':
+                depth -= 1
+            else:
+                raise PropertyValueParseError  # "[" never closed
+        offsets.append(start)
+        ends.append(i)
+        info.append(values)
+    return offsets, ends, info
+
+class SGFIndex:
+    def __init__(self, offsets, ends, info, fields=FIELDS, size=0, mtime=0.0):
+        """Where the games of a collection are and their root properties,
+              see scan; size and mtime of the file it was made from
+        """
+        self.offsets = offsets
+        self.ends = ends
+        self.info = info
+        self.fields = fields
+        self.size = size
+        self.mtime = mtime
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get(self, game, field):
+        ''' first value of a root property of a game, None if not there '''
+        return self.info[game][self.fields.index(field)]
+
+    def find(self, **values):
+        """Numbers of the games whose root properties have the given
+              values, e.g. find(PB='Honinbo Shusaku', RE='W+R')
+        """
+        wanted = [(self.fields.index(field), value) for field, value in values.items()]
+        return [game for game, row in enumerate(self.info)
+                if not [1 for column, value in wanted if row[column] != value]]
+
+    def save(self, path):
+        """Write the index: HEADER, offsets and ends (see
+              OffsetColumn.tofile), then the fields and root values
+              marshalled
+        """
+        handle = open(path, 'wb')
+        handle.write(HEADER.pack(MAGIC, OFFSET_BYTES, self.size, self.mtime,
+                                 len(self.offsets)))
+        self.offsets.tofile(handle)
+        self.ends.tofile(handle)
+        marshal.dump((self.fields, self.info), handle)
+        handle.close()
+
+def load_index(path):
+    """Read an index written by SGFIndex.save.
+          Returns SGFIndex, None if it is not an index (of this version)
+          or is cut short or damaged.
+    """
+    handle = open(path, 'rb')
+    try:
+        header = handle.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return None
+        magic, itemsize, size, mtime, count = HEADER.unpack(header)
+        if magic != MAGIC or itemsize != OFFSET_BYTES:
+            return None
+        offsets = OffsetColumn()
+        ends = OffsetColumn()
+        try:
+            offsets.fromfile(handle, count)
+            ends.fromfile(handle, count)
+            fields, info = marshal.load(handle)
+            if len(info) != count:
+                return None
+        except (EOFError, ValueError, TypeError):
+            return None  # cut short or damaged
+    finally:
+        handle.close()
+    return SGFIndex(offsets, ends, info, fields, size, mtime)
+
+def map_file(path):
+    ''' read only mmap of a file, '' if the file is empty '''
+    handle = open(path, 'rb')
+    try:
+        if not os.fstat(handle.fileno()).st_size:
+            return ''
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        handle.close()
+
+def index_file(path, fields=FIELDS, rebuild=False, save=False):
+    """Index of the collection in file path: the saved one if it is up to
+          date with the file and has the fields, otherwise a new scan,
+          which is saved if save (and the directory can be written).
+          Returns (SGFIndex, contents of the file as an mmap).
+    """
+    data = map_file(path)
+    stat = os.stat(path)
+    saved = path + INDEX_SUFFIX
+    if not rebuild and os.path.exists(saved):
+        index = load_index(saved)
+        if (index is not None and index.size == stat.st_size and
+            index.mtime == stat.st_mtime and index.fields == tuple(fields)):
+            return index, data
+    offsets, ends, info = scan(data, fields)
+    index = SGFIndex(offsets, ends, info, tuple(fields), stat.st_size, stat.st_mtime)
+    if save:
+        try:
+            index.save(saved)
+        except IOError:
+            pass
+    return index, data
+
+class LazyCollection(Collection):
+    """
+    An sgflib 'Collection' whose games are parsed when first indexed.
+    Instance attributes:
+    - self.source : string or mmap -- The SGF data.
+    - self.index : 'SGFIndex' -- Where its games are.
+    - self.parser : class -- FastSGFParser or a subclass, for the games.
+    - self.games : dictionary -- Games parsed so far, by number."""
+
+    def __init__(self, source, index, parser=FastSGFParser):
+        Collection.__init__(self)
+        self.source = source
+        self.index = index
+        self.parser = parser
+        self.games = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, game):
+        """ 'GameTree' of a game, parsed the first time it is asked for."""
+        if game < 0:
+            game += len(self.index)
+        if not 0 <= game < len(self.index):
+            raise IndexError(game)
+        tree = self.games.get(game)
+        if tree is None:
+            parser = self.parser(self.source)
+            parser.index = self.index.offsets[game]
+            tree = parser.parseOneGame()
+            self.games[game] = tree
+        return tree
+
+    def __getslice__(self, low, high):
+        return [self[game] for game in range(len(self))[low:high]]
+
+    def __str__(self):
+        """ SGF representation. Separates game trees with a blank line."""
+        return "\n\n".join([str(self[game]) for game in range(len(self))])
+
+    def cursor(self, gamenum=0):
+        """ Returns a 'Cursor' object for navigation of the given 'GameTree'."""
+        return Cursor(self[gamenum])
+
+def lazy_collection(data, fields=FIELDS):
+    ''' LazyCollection of an SGF string, index not saved '''
+    offsets, ends, info = scan(data, fields)
+    return LazyCollection(data, SGFIndex(offsets, ends, info, tuple(fields), len(data)))
+
+def open_collection(path, fields=FIELDS, rebuild=False, save=False):
+    ''' LazyCollection of an mmap of an SGF file, see index_file '''
+    index, data = index_file(path, fields, rebuild, save)
+    return LazyCollection(data, index, MappedSGFParser)
@@ -0,0 +1,67 @@
+'''
+sgfindex_bench
+
+time to index a collection of the sgf/ samples repeated to the given
+number of games, to open it again from the saved index, and to find
+games by a root property, against parsing the whole collection
+
+usage: python sgfindex_bench.py [games]
+'''
+
+import os, sys, time, shutil, tempfile
+from sgfparser import FastSGFParser
+from sgfindex import open_collection
+
+sgf_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sgf')
+
+def write_collection(path, games):
+    ''' the sgf/ samples repeated to about games games, returns the size '''
+    samples = []
+    for name in sorted(os.listdir(sgf_dir)):
+        if not name.endswith('.sgf'):
+            continue
+        handle = open(os.path.join(sgf_dir, name))
+        samples.append(handle.read().strip())
+        handle.close()
+    text = '\n'.join(samples) + '\n'
+    count = len(FastSGFParser(text).parse())
+    handle = open(path, 'wb')
+    for i in range(max(1, games / count)):
+        handle.write(text)
+    handle.close()
+    return os.path.getsize(path)
+
+def main():
+    games = 100000
+    if len(sys.argv) > 1:
+        games = int(sys.argv[1])
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'games.sgf')
+        size = write_collection(path, games)
+        start = time.time()
+        collection = open_collection(path, save=True)
+        elapsed = time.time() - start
+        print "%d games, %.1f MB" % (len(collection), size / 1e6)
+        print "index: %.2fs (%.1f MB/s), saved %.1f MB" % (
+            elapsed, size / elapsed / 1e6, os.path.getsize(path + '.idx') / 1e6)
+        start = time.time()
+        collection = open_collection(path, save=True)
+        print "reopen: %.3fs" % (time.time() - start)
+        start = time.time()
+        found = collection.index.find(SZ=None)
+        print "find games without SZ: %d games in %.3fs" % (len(found), time.time() - start)
+        start = time.time()
+        for game in found[:1000]:
+            collection[game]
+        print "parse %d of them: %.2fs" % (min(1000, len(found)), time.time() - start)
+        start = time.time()
+        handle = open(path, 'rb')
+        FastSGFParser(handle.read()).parse()
+        handle.close()
+        print "parse everything: %.2fs" % (time.time() - start)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+from sgflib import PropertyValueParseError
+from sgfparser import parse
+from sgfindex import scan, lazy_collection, open_collection, load_index, INDEX_SUFFIX, \
+     SGFIndex, OffsetColumn
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+sgf_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sgf')
+
+def read_samples():
+    ''' contents of the files in sgf/ '''
+    result = []
+    for name in sorted(os.listdir(sgf_dir)):
+        if not name.endswith('.sgf'):
+            continue
+        handle = open(os.path.join(sgf_dir, name))
+        result.append(handle.read())
+        handle.close()
+    return result
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.data = '\n'.join(read_samples())
+        self.data += '\n(;SZ[9]PB[a \\] b]C[x];B[aa]C[\\\\](;W[bb])(;W[cc]))'
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, data):
+        path = os.path.join(self.directory, 'games.sgf')
+        handle = open(path, 'wb')
+        handle.write(data)
+        handle.close()
+        return path
+
+    def test_scan(self):
+        ''' offsets and root properties of every game '''
+        offsets, ends, info = scan(self.data)
+        games = parse(self.data)
+        self.assertEqual(len(offsets), len(games))
+        for k in range(len(games)):
+            game = parse(self.data[offsets[k]:ends[k]])
+            self.assertEqual(str(game), str(games[k]))
+            root = games[k][0]
+            for field, value in zip(('SZ', 'PB', 'PW', 'RE', 'DT'), info[k]):
+                if root.has_key(field):
+                    self.assertEqual(value, root[field][0])
+                else:
+                    self.assertEqual(value, None)
+        self.assertEqual(info[-1][:2], ('9', 'a ] b'))
+        self.assertEqual(len(scan('(;B[aa]) () (;B[bb])')[0]), 1)
+
+    def test_lazy(self):
+        ''' games are parsed when indexed, and only then '''
+        collection = lazy_collection(self.data)
+        games = parse(self.data)
+        self.assertEqual(len(collection), len(games))
+        self.assertEqual(collection.games, {})
+        self.assertEqual(collection.index.find(SZ='9'), [len(games) - 1])
+        self.assertEqual(collection.games, {})
+        self.assertEqual(str(collection[-1]), str(games[-1]))
+        self.assertEqual(collection.games.keys(), [len(games) - 1])
+        self.assertTrue(collection[-1] is collection[len(games) - 1])
+        self.assertTrue(collection[-1] is collection[-1])
+        self.assertEqual(collection.games.keys(), [len(games) - 1])
+        self.assertEqual(str(collection), str(games))
+        self.assertEqual(collection.cursor(2).node['SZ'][0], games[2][0]['SZ'][0])
+        self.assertRaises(IndexError, collection.__getitem__, len(games))
+        self.assertRaises(IndexError, collection.__getitem__, -len(games) - 1)
+
+    def test_saved_index(self):
+        ''' the index is saved and used again until the file changes '''
+        path = self.write(self.data)
+        open_collection(path)
+        self.assertFalse(os.path.exists(path + INDEX_SUFFIX))  # only when asked
+        collection = open_collection(path, save=True)
+        self.assertTrue(os.path.exists(path + INDEX_SUFFIX))
+        saved = load_index(path + INDEX_SUFFIX)
+        self.assertEqual(saved.offsets, collection.index.offsets)
+        self.assertEqual(saved.info, collection.index.info)
+        self.assertEqual(str(open_collection(path)[3]), str(parse(self.data)[3]))
+        #an index of other data with the file's size and time is trusted
+        saved.info[0] = ('1',) * 5
+        saved.save(path + INDEX_SUFFIX)
+        self.assertEqual(open_collection(path).index.get(0, 'SZ'), '1')
+        #a changed file is scanned again
+        data = self.data + '\n(;SZ[5])'
+        os.utime(self.write(data), (time.time() + 10, time.time() + 10))
+        collection = open_collection(path, save=True)
+        self.assertEqual(len(collection), len(parse(data)))
+        self.assertEqual(collection.index.get(0, 'SZ'), parse(data)[0][0]['SZ'][0])
+
+    def test_large_offsets(self):
+        ''' offsets past 4 GB are saved and loaded whole '''
+        offsets = OffsetColumn()
+        ends = OffsetColumn()
+        for offset in (0, 2 ** 32 - 1, 2 ** 32, 5 * 2 ** 32 + 7):
+            offsets.append(offset)
+            ends.append(offset + 100)
+        self.assertEqual([offsets[i] for i in range(4)], [0, 2 ** 32 - 1, 2 ** 32, 5 * 2 ** 32 + 7])
+        self.assertEqual(ends[-1], 5 * 2 ** 32 + 107)
+        path = os.path.join(self.directory, 'large' + INDEX_SUFFIX)
+        SGFIndex(offsets, ends, [('19',) * 5] * 4, size=6 * 2 ** 32).save(path)
+        saved = load_index(path)
+        self.assertEqual(saved.offsets, offsets)
+        self.assertEqual(saved.ends, ends)
+        self.assertEqual(saved.size, 6 * 2 ** 32)
+
+    def test_truncated(self):
+        ''' a file cut off inside a value is rejected at once, as parse does '''
+        data = self.data + '\n(;GM[1];B[aa]C[' + 'a b ' * 5000
+        start = time.time()
+        self.assertRaises(PropertyValueParseError, scan, data)
+        self.assertRaises(PropertyValueParseError, open_collection, self.write(data))
+        self.assertRaises(PropertyValueParseError, parse, data)
+        self.assertTrue(time.time() - start < 1.0)
+
+    def test_damaged_index(self):
+        ''' a saved index cut short or overwritten is scanned again '''
+        path = self.write(self.data)
+        expected = open_collection(path, save=True).index.info
+        handle = open(path + INDEX_SUFFIX, 'rb')
+        saved = handle.read()
+        handle.close()
+        for damaged in (saved[:len(saved) / 2], saved[:-3], saved[:40] + 'x' * 30):
+            handle = open(path + INDEX_SUFFIX, 'wb')
+            handle.write(damaged)
+            handle.close()
+            self.assertEqual(load_index(path + INDEX_SUFFIX), None)
+            self.assertEqual(open_collection(path).index.info, expected)
+
+    def test_empty_file(self):
+        self.assertEqual(len(open_collection(self.write(''))), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,498 @@
+'''
+Single pass SGF parser for badukpy
+
+Gives the same Collection / GameTree / Node / Property objects, and
+raises the same sgflib exceptions, as sgflib.SGFParser, but reads the
+data once from left to right: the next significant character decides
+what comes (a state machine over the character classes of SGF), values
+are cut out with str.find and escapes are handled in the same scan, the
+pieces joined once. sgflib.SGFParser runs a regular expression per token
+and searches again for ']' and '\\' after every escape, adding to the
+value string each time, which is quadratic in long comments.
+
+Variations are followed with a stack instead of recursion, so there is
+no limit on how deeply they nest.
+
+SGFReader reads a file object a chunk at a time instead, for archives
+too large to hold in memory: events() gives what it finds as it goes
+(game and variation starts and ends, nodes, properties), games() one
+GameTree at a time. Only the chunk being read, and the part of a token
+started in the one before, is kept.
+
+MappedSGFParser parses the same way from an mmap (or a string) but
+leaves the values of the move properties (MOVE_PROPERTIES) where they
+are: each is a buffer object over the data, so the moves of a game read
+from a mapped file are not copied until they are decoded (see
+simple_go.sgf_to_move). Python 2's memoryview does not take an mmap,
+buffer is its zero copy slice for one.
+
+usage: FastSGFParser(data).parse() like sgflib.SGFParser, or parse(data)
+       for game in SGFReader(open(path, 'rb')).games(): ...
+'''
+
+import string, gc
+from sgflib import SGFParser, Collection, GameTree, Node, Property, \
+     EndOfDataParseError, GameTreeParseError, PropertyValueParseError, \
+     DuplicatePropertyError
+
+#what sgflib's regular expressions take for \s and [A-Za-z]
+WHITESPACE = ' \t\n\r\f\v'
+LETTERS = string.ascii_letters
+
+#events of SGFReader.events, (event, value)
+GAME_START = 'game start'            # value None
+GAME_END = 'game end'                # value None
+VARIATION_START = 'variation start'  # value None
+VARIATION_END = 'variation end'      # value None
+NODE = 'node'                        # value None, properties follow
+PROPERTY = 'property'                # value (id, list of values)
+
+CHUNK_SIZE = 1 << 16
+
+#properties MappedSGFParser keeps as buffer objects
+MOVE_PROPERTIES = frozenset(['B', 'W', 'AB', 'AW'])
+
+#states of parseGameTree
+IN_TREE = 0        # nodes of the current GameTree
+IN_VARIATIONS = 1  # between the variations of the GameTree on the stack
+
+def skip_whitespace(data, i, end):
+    ''' index of the first non whitespace character from i, end if none '''
+    while i < end and data[i] in WHITESPACE:
+        i += 1
+    return i
+
+def scan_value(data, i, end):
+    """Property value starting at i, just after its '[': escapes taken
+          out ('\\' and a line break dropped, '\\' before any other
+          character dropped), control characters not converted.
+          Returns (value, index after the closing ']').
+          Raises PropertyValueParseError if there is no closing ']'.
+    """
+    close = data.find(']', i, end)
+    if close < 0:
+        raise PropertyValueParseError
+    escape = data.find('\\', i, close)
+    if escape < 0:
+        return data[i:close], close + 1
+    parts = []
+    while escape >= 0:
+        parts.append(data[i:escape])
+        i = escape + 1
+        c = data[i]
+        i += 1
+        if c == '\r':
+            if i < end and data[i] == '\n':
+                i += 1
+        elif c == '\n':
+            if i < end and data[i] == '\r':
+                i += 1
+        else:
+            parts.append(c)
+        if i > close:  # the escaped character was the ']'
+            close = data.find(']', i, end)
+            if close < 0:
+                raise PropertyValueParseError
+        escape = data.find('\\', i, close)
+    parts.append(data[i:close])
+    return ''.join(parts), close + 1
+
+class EmptyObject:
+    """new_node and add_property fill these in and make them Node and
+       Property
+    """
+    pass
+
+def new_node():
+    ''' empty Node, see add_property '''
+    node = EmptyObject()
+    node.__class__ = Node
+    node.data = {}
+    node.order = []
+    return node
+
+def add_property(node, pid, values):
+    """Same as node.addProperty(Property(pid, values)), without going
+          through the typelib constructors.
+          Raises DuplicatePropertyError like Node.addProperty.
+    """
+    if pid in node.data:
+        raise DuplicatePropertyError
+    prop = EmptyObject()
+    prop.__class__ = Property
+    prop.data = values
+    prop.id = pid
+    prop.name = pid
+    node.data[pid] = prop
+    node.order.append(prop)
+
+class FastSGFParser:
+    """
+    Parser for SGF data, see the module doc. 'FastSGFParser.parse()'
+    returns a 'Collection' object for the entire data.
+
+    Instance Attributes:
+    - self.data : string -- The complete SGF data instance.
+    - self.datalen : integer -- Length of 'self.data'.
+    - self.index : integer -- Current parsing position in 'self.data'.
+    - self.ctrltrans : string[256] -- Control character translation
+      table, sgflib.SGFParser's by default.
+    - self.raw_properties : set of string -- Properties whose values
+      are read with 'self.parseRawValues()', none here."""
+
+    ctrltrans = SGFParser.ctrltrans
+    raw_properties = frozenset()
+
+    def __init__(self, data):
+        """ Initialize the instance attributes. See the class itself for info."""
+        self.data = data
+        self.datalen = len(data)
+        self.index = 0
+
+    def parse(self):
+        """ Parses the SGF data stored in 'self.data', and returns a 'Collection'.
+            The cyclic garbage collector is off meanwhile: the tree has no
+            cycles, and with every new object counted it would run over
+            and over on a large collection, about half the time."""
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            c = Collection()
+            while self.index < self.datalen:
+                g = self.parseOneGame()
+                if g:
+                    c.append(g)
+                else:
+                    break
+            return c
+        finally:
+            if enabled:
+                gc.enable()
+
+    def parseOneGame(self):
+        """ Parses one game from 'self.data'. Returns a 'GameTree' containing
+            one game, or 'None' if the end of 'self.data' has been reached."""
+        i = skip_whitespace(self.data, self.index, self.datalen)
+        if i < self.datalen and self.data[i] == '(':
+            self.index = i + 1
+            return self.parseGameTree()
+        return None
+
+    def parseGameTree(self):
+        """ Called when "(" encountered, ends when the matching ")" encountered.
+            Parses and returns one 'GameTree' from 'self.data', variations
+            included. Raises 'GameTreeParseError' if a problem is
+            encountered, 'EndOfDataParseError' if the data ends inside a
+            variation."""
+        data = self.data
+        end = self.datalen
+        i = self.index
+        #(GameTree, its variations so far) of every enclosing GameTree
+        stack = []
+        g = GameTree()
+        state = IN_TREE
+        while True:
+            if state == IN_TREE:
+                if i >= end:
+                    done = True  # data ended, the GameTree with it
+                else:
+                    j = i
+                    if data[j] in WHITESPACE:
+                        j = skip_whitespace(data, j, end)
+                    c = data[j:j + 1]
+                    done = False
+                    if c == ';':                        # found start of node
+                        if g.variations:
+                            raise GameTreeParseError("A node was encountered after a variation.")
+                        node, i = self.parseNode(j + 1)
+                        g.data.append(node)
+                    elif c == '(':                      # found start of variation
+                        stack.append((g, []))
+                        i = j + 1
+                        state = IN_VARIATIONS
+                    elif c == ')':                      # found end of GameTree
+                        i = j + 1
+                        done = True
+                    else:                               # error
+                        self.index = j
+                        raise GameTreeParseError
+                if done:
+                    if not stack:
+                        self.index = i
+                        return g
+                    variations = stack[-1][1]
+                    if g:
+                        variations.append(g)
+                    # check for next variation, and consume "("
+                    j = skip_whitespace(data, i, end)
+                    if j < end and data[j] == '(':
+                        i = j + 1
+                    state = IN_VARIATIONS
+            else:
+                if i >= end:
+                    self.index = i
+                    raise EndOfDataParseError
+                j = skip_whitespace(data, i, end)
+                if j < end and data[j] == ')':
+                    # end of the enclosing GameTree, don't consume it
+                    g, variations = stack.pop()
+                    g.variations = variations
+                else:
+                    g = GameTree()
+                state = IN_TREE
+
+    def parseNode(self, i):
+        """ Called at 'i', just after a ";". Parses one node, which can be
+            empty. Returns ('Node', index after the node).
+            Raises 'EndOfDataParseError' if the end of 'self.data' is
+            reached before the end of the node (i.e., the start of the
+            next node, the start of a variation, or the end of the
+            enclosing game tree)."""
+        data = self.data
+        end = self.datalen
+        node = new_node()
+        while i < end:
+            # property id: letters, then (after whitespace) a "["
+            j = i
+            if data[j] in WHITESPACE:
+                j = skip_whitespace(data, j, end)
+            if j >= end or data[j] not in LETTERS:
+                return node, i                          # reached end of Node
+            k = data.find('[', j)
+            pid = data[j:k].rstrip(WHITESPACE)
+            if k < 0 or not pid.isalpha():
+                return node, i
+            if pid in self.raw_properties:
+                pvlist, i = self.parseRawValues(k)
+            else:
+                pvlist, i = self.parsePropertyValue(k)
+            add_property(node, pid, pvlist)
+        self.index = i
+        raise EndOfDataParseError
+
+    def parsePropertyValue(self, i):
+        """ Called at 'i', before the first "[" of a property. Parses the
+            values up to the next property, node, or variation. Returns
+            (list of values, index after the last "]"). Raises
+            'PropertyValueParseError' if there is a problem."""
+        data = self.data
+        end = self.datalen
+        ctrltrans = self.ctrltrans
+        pvlist = []
+        while i < end:
+            j = i
+            if data[j] in WHITESPACE:
+                j = skip_whitespace(data, j, end)
+            if j >= end or data[j] != '[':
+                break                                   # reached end of Property
+            close = data.find(']', j + 1, end)
+            if close >= 0 and data.find('\\', j + 1, close) < 0:
+                value = data[j + 1:close]               # no escapes
+                i = close + 1
+            else:
+                try:
+                    value, i = scan_value(data, j + 1, end)
+                except PropertyValueParseError:
+                    self.index = j + 1
+                    raise
+            pvlist.append(value.translate(ctrltrans))
+        if not pvlist:
+            self.index = i
+            raise PropertyValueParseError
+        return pvlist, i
+
+    def parseRawValues(self, i):
+        """ Like 'self.parsePropertyValue()', but a value without escapes
+            is a buffer object over 'self.data' instead of a new string,
+            and control characters are left as they are."""
+        data = self.data
+        end = self.datalen
+        pvlist = []
+        while i < end:
+            j = i
+            if data[j] in WHITESPACE:
+                j = skip_whitespace(data, j, end)
+            if j >= end or data[j] != '[':
+                break                                   # reached end of Property
+            close = data.find(']', j + 1, end)
+            if close >= 0 and data.find('\\', j + 1, close) < 0:
+                pvlist.append(buffer(data, j + 1, close - j - 1))
+                i = close + 1
+            else:
+                try:
+                    value, i = scan_value(data, j + 1, end)
+                except PropertyValueParseError:
+                    self.index = j + 1
+                    raise
+                pvlist.append(value)
+        if not pvlist:
+            self.index = i
+            raise PropertyValueParseError
+        return pvlist, i
+
+class MappedSGFParser(FastSGFParser):
+    """
+    FastSGFParser keeping the values of MOVE_PROPERTIES as buffer objects
+    over 'self.data', see the module doc. 'self.data' is usually an mmap;
+    the games keep it alive. To parse one game of a collection set
+    'self.index' to its offset (see sgfindex) and call
+    'self.parseOneGame()'."""
+
+    raw_properties = MOVE_PROPERTIES
+
+def parse(data):
+    ''' Collection of an SGF string, see FastSGFParser '''
+    return FastSGFParser(data).parse()
+
+class SGFReader:
+    """
+    Reads SGF from a file object a chunk at a time, see the module doc.
+    For well formed data games() gives the same games as
+    FastSGFParser.parse(), one at a time; like it, reading stops at the
+    first thing that is not the start of a game, and bad data raises the
+    sgflib parse exceptions.
+
+    Instance Attributes:
+    - self.stream : file object -- Where the data comes from.
+    - self.chunk_size : integer -- Bytes read at a time, at least.
+    - self.data : string -- What is kept of the data read so far.
+    - self.index : integer -- Current parsing position in 'self.data'.
+    - self.ctrltrans : string[256] -- As FastSGFParser.ctrltrans."""
+
+    ctrltrans = SGFParser.ctrltrans
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        """ Initialize the instance attributes. See the class itself for info."""
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.data = ''
+        self.index = 0
+        self.eof = False
+
+    def fill(self):
+        """ Read more data, dropping what was parsed already. A token
+            that goes on over several chunks doubles the read size each
+            time, so it is scanned a bounded number of times. Returns
+            False at the end of the file."""
+        if self.eof:
+            return False
+        kept = self.data[self.index:]
+        chunk = self.stream.read(max(self.chunk_size, len(kept)))
+        if not chunk:
+            self.eof = True
+            return False
+        self.data = kept + chunk
+        self.index = 0
+        return True
+
+    def nextChar(self):
+        """ First non whitespace character from 'self.index', which is left
+            on it; '' at the end of the file."""
+        while True:
+            data = self.data
+            end = len(data)
+            i = skip_whitespace(data, self.index, end)
+            self.index = i
+            if i < end:
+                return data[i]
+            if not self.fill():
+                return ''
+
+    def propertyId(self):
+        """ Id of the property at 'self.index', consumed up to its "[";
+            None if no property starts there."""
+        while True:
+            data = self.data
+            end = len(data)
+            i = self.index
+            k = i
+            while k < end and data[k] in LETTERS:
+                k += 1
+            j = skip_whitespace(data, k, end)
+            if j < end:
+                if k > i and data[j] == '[':
+                    self.index = j
+                    return data[i:k]
+                return None
+            if not self.fill():
+                return None
+
+    def propertyValues(self):
+        """ Values of the property whose first "[" is at 'self.index'.
+            Raises 'PropertyValueParseError' if one is not closed."""
+        pvlist = []
+        while self.nextChar() == '[':
+            while True:
+                try:
+                    value, i = scan_value(self.data, self.index + 1, len(self.data))
+                    break
+                except PropertyValueParseError:
+                    if not self.fill():
+                        raise
+            self.index = i
+            pvlist.append(value.translate(self.ctrltrans))
+        return pvlist
+
+    def events(self):
+        """ Generator of (event, value) pairs, see the event constants.
+            Raises 'GameTreeParseError' for a node after a variation or
+            an unexpected character, 'EndOfDataParseError' if the file
+            ends inside a game."""
+        while self.nextChar() == '(':
+            self.index += 1
+            yield GAME_START, None
+            #per open GameTree, whether it had a variation yet
+            variations = [False]
+            while variations:
+                c = self.nextChar()
+                if c == ';':
+                    if variations[-1]:
+                        raise GameTreeParseError("A node was encountered after a variation.")
+                    self.index += 1
+                    yield NODE, None
+                    while self.nextChar():
+                        pid = self.propertyId()
+                        if pid is None:
+                            break
+                        yield PROPERTY, (pid, self.propertyValues())
+                elif c == '(':
+                    self.index += 1
+                    variations[-1] = True
+                    variations.append(False)
+                    yield VARIATION_START, None
+                elif c == ')':
+                    self.index += 1
+                    variations.pop()
+                    if variations:
+                        yield VARIATION_END, None
+                    else:
+                        yield GAME_END, None
+                elif c == '':
+                    raise EndOfDataParseError
+                else:
+                    raise GameTreeParseError
+
+    def games(self):
+        """ Generator of the games as 'GameTree''s, each built from the
+            events and given as soon as it ends. Empty variations are
+            left out; an empty game ends the reading, as in
+            FastSGFParser.parse()."""
+        trees = []
+        node = None
+        for event, value in self.events():
+            if event == PROPERTY:
+                add_property(node, value[0], value[1])
+            elif event == NODE:
+                node = new_node()
+                trees[-1].data.append(node)
+            elif event == VARIATION_START or event == GAME_START:
+                trees.append(GameTree())
+            elif event == VARIATION_END:
+                variation = trees.pop()
+                if variation:
+                    trees[-1].variations.append(variation)
+            else:
+                game = trees.pop()
+                if not game:
+                    return
+                yield game
@@ -0,0 +1,76 @@
+'''
+sgfparser_bench
+
+parse speed in MB/s of sgflib.SGFParser and sgfparser.FastSGFParser on a
+corpus of the sgf/ samples repeated to the given size, and on one game
+with a long comment full of escapes; and sgfparser.SGFReader reading the
+corpus from a file one game at a time
+
+usage: python sgfparser_bench.py [corpus MB] [comment kB]
+'''
+
+import os, sys, time, tempfile
+from sgflib import SGFParser
+from sgfparser import FastSGFParser, MappedSGFParser, SGFReader
+
+sgf_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sgf')
+
+def corpus(size):
+    ''' the sgf/ files, concatenated and repeated to about size bytes '''
+    games = []
+    for name in sorted(os.listdir(sgf_dir)):
+        if not name.endswith('.sgf'):
+            continue
+        handle = open(os.path.join(sgf_dir, name))
+        games.append(handle.read().strip())
+        handle.close()
+    sample = '\n'.join(games) + '\n'
+    return sample * max(1, size / len(sample))
+
+def comment_game(size):
+    ''' one game with a comment of about size bytes, escaped backslashes
+        and line breaks but no ']' until its end '''
+    line = 'a comment with a \\\\ backslash and a soft line break\\\n'
+    return '(;FF[4]SZ[19]C[%s];B[pd];W[dp])' % (line * (size / len(line)))
+
+def rate(parser, data):
+    ''' (MB/s, games) of parsing data once '''
+    start = time.time()
+    collection = parser(data).parse()
+    elapsed = time.time() - start
+    return len(data) / elapsed / 1e6, len(collection)
+
+def stream_rate(data):
+    ''' (MB/s, games) of reading data from a file with SGFReader '''
+    handle, path = tempfile.mkstemp('.sgf')
+    os.write(handle, data)
+    os.close(handle)
+    start = time.time()
+    stream = open(path, 'rb')
+    games = 0
+    for game in SGFReader(stream).games():
+        games += 1
+    stream.close()
+    elapsed = time.time() - start
+    os.remove(path)
+    return len(data) / elapsed / 1e6, games
+
+def main():
+    megabytes = 4.0
+    kilobytes = 200
+    if len(sys.argv) > 1:
+        megabytes = float(sys.argv[1])
+    if len(sys.argv) > 2:
+        kilobytes = int(sys.argv[2])
+    for title, data in (("corpus", corpus(int(megabytes * 1e6))),
+                        ("comment", comment_game(kilobytes * 1000))):
+        print "%s: %.1f MB" % (title, len(data) / 1e6)
+        for name, parser in (("SGFParser", SGFParser), ("FastSGFParser", FastSGFParser),
+                             ("MappedSGFParser", MappedSGFParser)):
+            speed, games = rate(parser, data)
+            print "  %-16s %6.2f MB/s  %d games" % (name, speed, games)
+        speed, games = stream_rate(data)
+        print "  %-16s %6.2f MB/s  %d games" % ("SGFReader", speed, games)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+from sgflib import SGFParser, GameTreeParseError
+from sgfparser import FastSGFParser, MappedSGFParser, SGFReader, parse, GAME_START, GAME_END, \
+     VARIATION_START, VARIATION_END, NODE, PROPERTY
+from StringIO import StringIO
+import mmap
+import os
+import random
+import tempfile
+import unittest
+
+sgf_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sgf')
+
+def tree_shape(tree):
+    ''' nested lists of everything a GameTree holds, for comparing '''
+    nodes = [[(p.id, p.name, map(str, p)) for p in node] for node in tree]
+    return (nodes, [tree_shape(variation) for variation in tree.variations])
+
+def read_samples():
+    ''' contents of the files in sgf/ '''
+    result = []
+    for name in sorted(os.listdir(sgf_dir)):
+        if not name.endswith('.sgf'):
+            continue
+        handle = open(os.path.join(sgf_dir, name))
+        result.append(handle.read())
+        handle.close()
+    return result
+
+def parse_result(parser, data):
+    ''' shapes of the games parsed, or the exception class raised '''
+    try:
+        return [tree_shape(tree) for tree in parser(data).parse()]
+    except Exception, e:
+        return e.__class__
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def check_same(self, data):
+        self.assertEqual(parse_result(FastSGFParser, data), parse_result(SGFParser, data))
+
+    def test_samples(self):
+        ''' every file in sgf/ parses the same, and prints the same '''
+        for data in read_samples():
+            self.check_same(data)
+            self.assertEqual(str(parse(data)), str(SGFParser(data).parse()))
+
+    def test_values(self):
+        ''' escapes, line breaks, control characters and whitespace '''
+        for data in ['(;C[a\\]b\\\\c\\d])',
+                     '(;C[line\\\r\nbreak\\\n\rtwo\\\nthree\\\rfour])',
+                     '(;C[tab\there\x01])',
+                     '( ; B [aa] [bb]\n;W\t[cc] )',
+                     '(;AB[aa][bb]C[]PB[x]\n(;B[cc])\n(;W[dd](;B[ee])(;B[ff])))',
+                     '(;B[aa]) \n (;W[bb])',
+                     '(;B[aa])garbage(;W[bb])',
+                     '()(;B[aa])',
+                     '(;B[aa]()(;W[bb]))',
+                     '(;CoPyright[x])']:
+            self.check_same(data)
+
+    def test_errors(self):
+        ''' bad data raises what sgflib.SGFParser raises '''
+        for data in ['(;B[aa]', '(;B[aa', '(;B[aa]x)', '(;B[aa](;W[bb])', '(;B[a]B[b])',
+                     '(;B[aa](;W[bb]);B[cc])', '(;B[aa] ', '(;C[\\]', '(;B[aa](;W[bb]']:
+            self.check_same(data)
+
+    def test_random(self):
+        ''' random strings of SGF characters '''
+        random.seed(7)
+        pieces = ['(', ')', ';', 'B', 'W', 'C', 'AB', '[', ']', '[aa]', '\\', '\n', ' ', 'x']
+        for i in range(3000):
+            data = ''.join([random.choice(pieces) for j in range(random.randrange(1, 20))])
+            self.check_same('(;' + data)
+
+    def test_deep_variations(self):
+        ''' no recursion limit on nesting '''
+        data = '(;B[aa]' * 3000 + ')' * 3000
+        collection = parse(data)
+        depth = 0
+        tree = collection[0]
+        while tree.variations:
+            tree = tree.variations[0]
+            depth += 1
+        self.assertEqual(depth, 2999)
+
+    def test_mapped(self):
+        ''' move values are buffers over the data, the rest as parse '''
+        data = '\n'.join(read_samples()) + '(;AB[aa][bb]AW[c\\c]C[x];B[];W[dd])'
+        handle, path = tempfile.mkstemp('.sgf')
+        os.write(handle, data)
+        os.close(handle)
+        stream = open(path, 'rb')
+        mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        stream.close()
+        os.remove(path)
+        for source in (data, mapped):
+            games = MappedSGFParser(source).parse()
+            self.assertEqual([tree_shape(game) for game in games],
+                             [tree_shape(game) for game in parse(data)])
+            self.assertEqual(str(games), str(parse(data)))
+            last = games[-1]
+            self.assertEqual(type(last[0]['AB'][0]), buffer)
+            self.assertEqual(last[0]['AW'][0], 'cc')  # escaped, a string
+            self.assertEqual(type(last[0]['C'][0]), str)
+            self.assertEqual(len(last[1]['B'][0]), 0)
+            parser = MappedSGFParser(source)
+            parser.index = data.rindex('(')
+            self.assertEqual(str(parser.parseOneGame()), str(last))
+
+    def check_stream(self, data, chunk_size):
+        ''' SGFReader.games gives the games parse gives '''
+        games = SGFReader(StringIO(data), chunk_size).games()
+        self.assertEqual([tree_shape(game) for game in games],
+                         [tree_shape(game) for game in parse(data)])
+
+    def test_reader(self):
+        ''' the same games whatever the chunk boundaries '''
+        data = '\n'.join(read_samples())
+        data += '(;C[a\\]b\\\r\nc]AB[aa] [bb]\n(;B[cc])(;W[dd](;B[ee])(;B[ff])))'
+        for chunk_size in (1, 2, 3, 7, 64, 4096):
+            self.check_stream(data, chunk_size)
+
+    def test_reader_events(self):
+        data = '(;SZ[9];B[aa](;W[bb])(;W[cc]C[x][y]))(;B[dd])'
+        events = list(SGFReader(StringIO(data), 2).events())
+        self.assertEqual(events, [(GAME_START, None), (NODE, None), (PROPERTY, ('SZ', ['9'])),
+                                  (NODE, None), (PROPERTY, ('B', ['aa'])),
+                                  (VARIATION_START, None), (NODE, None), (PROPERTY, ('W', ['bb'])),
+                                  (VARIATION_END, None),
+                                  (VARIATION_START, None), (NODE, None), (PROPERTY, ('W', ['cc'])),
+                                  (PROPERTY, ('C', ['x', 'y'])), (VARIATION_END, None),
+                                  (GAME_END, None),
+                                  (GAME_START, None), (NODE, None), (PROPERTY, ('B', ['dd'])),
+                                  (GAME_END, None)])
+
+    def test_reader_bounded(self):
+        ''' games come before the file is read to the end, and only
+            about a chunk of it is kept at a time
+        '''
+        data = ''.join(read_samples()) * 20
+        reader = SGFReader(StringIO(data), 256)
+        largest = 0
+        count = 0
+        for game in reader.games():
+            largest = max(largest, len(reader.data))
+            count += 1
+            if count == 1:
+                self.assertTrue(reader.stream.tell() < len(data) / 10)
+        self.assertEqual(count, len(parse(data)))
+        self.assertTrue(largest < 2048)
+
+    def test_reader_errors(self):
+        ''' bad data raises what parse raises '''
+        for data in ['(;B[aa]', '(;B[aa', '(;B[aa]x)', '(;B[a]B[b])']:
+            try:
+                list(SGFReader(StringIO(data), 3).games())
+                raised = None
+            except Exception, e:
+                raised = e.__class__
+            self.assertEqual(raised, parse_result(FastSGFParser, data))
+        #parse reads the node as a variation without "(" and runs out of data
+        self.assertRaises(GameTreeParseError, list,
+                          SGFReader(StringIO('(;B[aa](;W[bb]);B[cc])')).games())
+
+if __name__ == '__main__':
+    unittest.main()
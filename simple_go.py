@@ -18,22 +18,40 @@
 
 
 import re, string, time, random, sys
+from array import array
 from math import sqrt
-from copy import deepcopy
-from sgflib import Collection,GameTree,Node,SGFParser,Property
-from gametree import GoGameTree
+from sgflib import GameTree,Node,Property
+from gametree import GoGameTree, HashColumn
+from sgfparser import MappedSGFParser
+from sgfindex import open_collection
 
 EMPTY = "."
 BLACK = "X"
 WHITE = "O"
+BORDER = "#"  # off-board sentinel, never seen outside of Board
 
 colors = [BLACK, WHITE]
 
 other_side = {BLACK: WHITE, WHITE: BLACK}
 sgf_side = {BLACK: 'B', WHITE: 'W'}
+sgf_color = {'B': BLACK, 'W': WHITE, 'AB': BLACK, 'AW': WHITE}
+
+#integer codes stored in the flat board array
+EMPTY_CODE = 0
+BLACK_CODE = 1
+WHITE_CODE = 2
+BORDER_CODE = 3
+
+color_code = {EMPTY: EMPTY_CODE, BLACK: BLACK_CODE, WHITE: WHITE_CODE, BORDER: BORDER_CODE}
+code_color = [EMPTY, BLACK, WHITE, BORDER]
+other_code = [EMPTY_CODE, WHITE_CODE, BLACK_CODE, BORDER_CODE]
 
 PASS_MOVE = (-1, -1)
 
+#scoring methods, see score_board
+AREA = "area"  # Tromp-Taylor: stones plus surrounded empty points
+TERRITORY = "territory"  # surrounded empty points plus captured stones
+
 x_coords_string = "ABCDEFGHJKLMNOPQRSTUVXYZ"
 
 def move_as_string(move, board_size):
@@ -60,44 +78,227 @@ def move_to_sgf(m):
     return sgf
 
 def sgf_to_move(sgf):
-    if sgf == '':
+    """(x, y) of an SGF point, 1 based like move_to_sgf. sgf is a string
+          or a buffer (see sgfparser.MappedSGFParser), read in place.
+    """
+    if not len(sgf):
         return PASS_MOVE
-    move = (string.ascii_lowercase.index(sgf[0]), string.ascii_lowercase.index(sgf[1]))
+    move = (string.ascii_lowercase.index(sgf[0]) + 1, string.ascii_lowercase.index(sgf[1]) + 1)
     return move
 
+def main_line(tree, size):
+    """Setup stones and moves of the main line of an sgflib GameTree in
+          file order: ('AB' or 'AW', list of (x, y)), then ('B' or 'W',
+          move) for each move; "tt" is PASS_MOVE (the old FF[3] pass) on
+          boards up to 19. A point that is not two letters raises
+          ValueError or IndexError where it comes.
+    """
+    variation = tree
+    while True:
+        for node in variation:
+            properties = node.data
+            for prop in ('AB', 'AW'):
+                if prop in properties:
+                    yield prop, map(sgf_to_move, properties[prop])
+            for prop in ('B', 'W'):
+                if prop in properties:
+                    move = sgf_to_move(properties[prop][0])
+                    if move == (20, 20) and size <= 19:
+                        move = PASS_MOVE
+                    yield prop, move
+                    break
+        if not variation.variations:
+            return
+        variation = variation.variations[0]
+
 def game_from_sgf(sgfdata, game_number=0):
-    col = SGFParser(sgfdata).parse()
-    cur = col.cursor(game_number)
-    size = int(cur.node['SZ'][0])
+    """Game of game game_number of sgfdata, a string or an mmap of an SGF
+          file. Only the games up to that one are parsed, with
+          MappedSGFParser: the moves are not copied out of sgfdata.
+    """
+    parser = MappedSGFParser(sgfdata)
+    for i in range(game_number + 1):
+        tree = parser.parseOneGame()
+        if not tree:
+            raise IndexError(game_number)
+    return game_from_tree(tree)
+
+def game_from_file(path, game_number=0, save_index=False):
+    """Game of game game_number of an SGF file, read through an mmap
+          and an index of the file (see sgfindex.open_collection; saved
+          next to it if save_index), so only that game is parsed and
+          nothing of the file is copied.
+    """
+    return game_from_tree(open_collection(path, save=save_index)[game_number])
+
+def game_from_tree(tree):
+    """Game of an sgflib GameTree: setup stones and main line moves (see
+          main_line), each move played by the side of its B or W property.
+          Illegal moves are skipped.
+    """
+    size = 19  # the SGF default
+    if 'SZ' in tree[0].data:
+        size = int(tree[0].data['SZ'][0])
     game = Game(size)
+    for prop, value in main_line(tree, size):
+        if prop == 'AB':
+            game.add_black(value)
+        elif prop == 'AW':
+            game.add_white(value)
+        else:
+            game.current_board.side = sgf_color[prop]
+            game.make_move(value)
+    return game
 
-    #build moves list -- if it isn't in order in the file, bad things happen
-    add_black = []
-    add_white = []
-    moves = []
-    while 1:
-        if cur.node.has_key('AB'):
-            add_black += map(sgf_to_move, cur.node['AB'])
-        elif cur.node.has_key('AW'):
-            add_white += map(sfg_to_move, cur.node['AW'])
-        elif cur.node.has_key('B'):
-            moves.append(sgf_to_move(cur.node['B'][0]))
-        elif cur.node.has_key('W'):
-            moves.append(sgf_to_move(cur.node['W'][0]))
-        if cur.atEnd: break
-        cur.next()
-
-    #add black and white (setup positions)
-    if add_black:
-        game.add_black(add_black)
-    if add_white:
-        game.add_white(add_white)
-
-    #move the game along
-    for move in moves:
-        game.make_move(move)
+class BoardGeometry:
+    """Tables shared by every Board of one size.
+          The board is kept as a flat array with a one point wide border of
+          BORDER_CODE around it. Point (x, y) lives at index y*stride + x,
+          so its neighbours are always at index +-stride and +-1 and never
+          need a bounds check: the border simply never matches a colour.
+          Nothing here changes after construction, so one instance per size
+          is shared by all boards, see board_geometry().
+    """
+    def __init__(self, size):
+        self.size = size
+        self.stride = size + 2
+        self.area = self.stride * self.stride
+        #down, up, left, right: same order as Board.iterate_neighbour
+        self.offsets = (-self.stride, self.stride, -1, 1)
+        self.positions = []  # (x, y) in iterate_goban order
+        self.points = []  # flat index in iterate_goban order
+        self.point_of = {}  # (x, y) -> flat index
+        self.pos_of = [None] * self.area  # flat index -> (x, y)
+        self.empty_board = array('b', [BORDER_CODE] * self.area)
+        for x in range(1, size + 1):
+            for y in range(1, size + 1):
+                point = y * self.stride + x
+                self.positions.append((x, y))
+                self.points.append(point)
+                self.point_of[x, y] = point
+                self.pos_of[point] = (x, y)
+                self.empty_board[point] = EMPTY_CODE
+        #all four neighbour indexes (border included) of each board point
+        self.neighbours = [()] * self.area
+        #on-board neighbour positions, what iterate_neighbour returns
+        self.neighbour_pos = {}
+        for point in self.points:
+            around = tuple([point + offset for offset in self.offsets])
+            self.neighbours[point] = around
+            self.neighbour_pos[self.pos_of[point]] = tuple(
+                [self.pos_of[n] for n in around if self.empty_board[n] != BORDER_CODE])
+        #Zobrist keys: zobrist[code][point] is xor-ed into the board hash
+        #while a stone of that colour is on that point. Seeded by size so
+        #every process agrees on the hash of a position.
+        rng = random.Random(size)
+        self.zobrist = [[0] * self.area for code in code_color]
+        for code in (BLACK_CODE, WHITE_CODE):
+            for point in self.points:
+                self.zobrist[code][point] = rng.getrandbits(64)
+        self.zobrist_side = rng.getrandbits(64)  # for hashes that include side to move
+        #for hashes that include the ko point, zobrist_ko[0] (no ko) is 0
+        self.zobrist_ko = [0] * self.area
+        for point in self.points:
+            self.zobrist_ko[point] = rng.getrandbits(64)
+
+    def __copy__(self):
+        return self  # never changes, safe to share
+
+    def __deepcopy__(self, memo):
+        return self
+
+geometries = {}
+
+def board_geometry(size):
+    """return the shared BoardGeometry for given size, creating it on first use
+    """
+    if size not in geometries:
+        geometries[size] = BoardGeometry(size)
+    return geometries[size]
+
+class Goban:
+    """Dictionary like view of the stones on a Board, keyed by (x, y).
+          Board itself works on the flat array, this is here so code written
+          against the old goban dict (Game, the GUI, tests) keeps working.
+    """
+    def __init__(self, board):
+        self.board = board
 
-    return game
+    def __getitem__(self, pos):
+        return code_color[self.board.stones[self.board.geometry.point_of[pos]]]
+
+    def __setitem__(self, pos, color):
+        """Direct placement, no captures. Rebuilds the board's groups on
+              every call, so setting up many stones should use Board.add_stones.
+        """
+        self.board.stones[self.board.geometry.point_of[pos]] = color_code[color]
+        self.board.rebuild_groups()
+
+    def __contains__(self, pos):
+        return pos in self.board.geometry.point_of
+
+    has_key = __contains__
+
+    def __iter__(self):
+        return iter(self.board.geometry.positions)
+
+    def __len__(self):
+        return len(self.board.geometry.points)
+
+    def __eq__(self, other):
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def get(self, pos, default=None):
+        if pos in self:
+            return self[pos]
+        return default
+
+    def keys(self):
+        return list(self.board.geometry.positions)
+
+    def values(self):
+        stones = self.board.stones
+        return [code_color[stones[point]] for point in self.board.geometry.points]
+
+    def items(self):
+        return zip(self.keys(), self.values())
+
+class Groups:
+    """groups[color] view of a Board, lists of (x, y) lists.
+          BLACK and WHITE lists are built from the board's chain tracking,
+          oldest chain first (a merged chain keeps the place of its oldest
+          part, same as the old append and combine lists did), or None if
+          that colour has no stones. EMPTY regions come from
+          Board.empty_regions, recomputed only when asked for after a change.
+    """
+    def __init__(self, board):
+        self.board = board
+
+    def __getitem__(self, color):
+        if color == EMPTY:
+            return self.board.empty_regions()
+        return self.board.chain_groups(color_code[color])
+
+    def __eq__(self, other):
+        for color in (BLACK, WHITE, EMPTY):
+            if self[color] != other[color]:
+                return False
+        return True
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def keys(self):
+        return [BLACK, WHITE, EMPTY]
+
+class EmptyBoard:
+    """Board.copy fills one of these in and makes it a Board, so the copy
+          does not pay for Board.__init__ setting up arrays it replaces.
+    """
+    pass
 
 class Board:
     def __init__(self, size):
@@ -105,28 +306,53 @@ class Board:
               argument: size
         """
         self.size = size
+        self.geometry = board_geometry(size)
         self.side = BLACK  # side to move
         self.captures = {}  # number of stones captured
         self.captures[WHITE] = 0
         self.captures[BLACK] = 0
-        self.groups = {}
-        self.groups[WHITE] = None
-        self.groups[BLACK] = None
+        self.groups = Groups(self)  # chains as (x, y) lists, see Groups
 
         self.territory_white = 0
         self.territory_black = 0
 
-        self.goban = {}  # actual board
-        #Create and initialize board as empty size*size
-        for pos in self.iterate_goban():
-            self.goban[pos] = EMPTY
-        #empty groups
-        self.groups[EMPTY] = [self.goban.keys()]
+        #actual board: flat array with border, see BoardGeometry
+        self.stones = array('b', self.geometry.empty_board)
+        self.goban = Goban(self)  # (x, y) keyed view of self.stones
+        self.hash = 0  # Zobrist hash of the stones, see key()
+
+        #chain tracking, kept up to date by place_stone and remove_chain
+        area = self.geometry.area
+        self.chain = array('h', [0]) * area  # head stone of the chain, 0 if no stone
+        self.next_stone = array('h', [0]) * area  # circular list of the chain stones
+        self.chain_libs = {}  # head -> set of liberty points
+        self.chain_size = {}  # head -> number of stones
+        self.chain_order = {}  # head -> creation number, orders groups lists
+        self.chain_counter = 0
+
+        #every empty point once, in no particular order, and where it is in
+        #that array: add and remove (swap with the last one) are O(1)
+        self.empty_points = array('h', self.geometry.points)
+        self.empty_index = array('h', [-1]) * area
+        for i, point in enumerate(self.empty_points):
+            self.empty_index[point] = i
+        self.ko_point = 0  # point the side to move may not retake, 0 if none
+        #one record per move for undo, see play_point and undo
+        self.journal = []
+        #chain structures used by another board too, see copy and own_chains
+        self.chains_shared = False
+        #3x3 pattern codes and weights, see pattern.enable_patterns
+        self.patterns = None
+
+        #empty groups, None when they need to be recomputed, see empty_regions
+        self.empty_groups = None
 
     def __eq__(left, right):
+        if not isinstance(right, Board):
+            return False
         if (left.captures == right.captures and
             left.groups == right.groups and
-            left.goban == right.goban):
+            left.stones == right.stones):
             return True
         return False
 
@@ -135,33 +361,100 @@ class Board:
             return True
         return False
 
+    def copy(self, lazy=False):
+        """Independent copy of the position, much cheaper than deepcopy.
+              The flat arrays are copied, the per-size geometry (neighbour
+              tables, coordinates, Zobrist keys) is shared and the copy
+              starts with an empty journal, so it can not undo past the
+              position it was made from.
+              With lazy=True the chain structures (chain, next_stone and
+              the chain dicts) are not copied at all: both boards share
+              them until one of the two changes stones, which copies them
+              for itself first, see own_chains. Good for the many copies
+              a playout or search makes that are only looked at or
+              thrown away early.
+        """
+        board = EmptyBoard()
+        board.__class__ = self.__class__
+        board.size = self.size
+        board.geometry = self.geometry
+        board.side = self.side
+        board.captures = self.captures.copy()
+        board.groups = Groups(board)
+        board.territory_white = self.territory_white
+        board.territory_black = self.territory_black
+        board.stones = self.stones[:]
+        board.goban = Goban(board)
+        board.hash = self.hash
+        board.chain_counter = self.chain_counter
+        board.empty_points = self.empty_points[:]
+        board.empty_index = self.empty_index[:]
+        board.ko_point = self.ko_point
+        board.journal = []
+        #only ever replaced, never changed in place: safe to share
+        board.empty_groups = self.empty_groups
+        board.chain = self.chain
+        board.next_stone = self.next_stone
+        board.chain_libs = self.chain_libs
+        board.chain_size = self.chain_size
+        board.chain_order = self.chain_order
+        board.patterns = None
+        if self.patterns is not None:
+            board.patterns = self.patterns.copy(board)
+        if lazy:
+            self.chains_shared = board.chains_shared = True
+        else:
+            board.chains_shared = True
+            board.own_chains()
+        return board
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def own_chains(self):
+        """Give this board its own copy of chain structures it shares with
+              another board since copy(lazy=True). Called before anything
+              that changes them; does nothing if they are not shared.
+        """
+        if not self.chains_shared:
+            return
+        self.chain = self.chain[:]
+        self.next_stone = self.next_stone[:]
+        self.chain_libs = dict([(head, set(liberties))
+                                for head, liberties in self.chain_libs.iteritems()])
+        self.chain_size = self.chain_size.copy()
+        self.chain_order = self.chain_order.copy()
+        self.chains_shared = False
+
     def iterate_goban(self):
         """This goes trough all positions in goban
               Example usage: see above __init__ method
         """
-        for x in range(1, self.size + 1):
-            for y in range(1, self.size + 1):
-                yield x, y
+        return iter(self.geometry.positions)
 
     def iterate_neighbour(self, pos):
         """This goes trough all neighbour positions:
               down, up, left, right
               Example usage: see legal_move method
         """
-        x, y = pos
-        for x2, y2 in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
-            if 1 <= x2 <= self.size and 1 <= y2 <= self.size:
-                yield (x2, y2)
+        neighbours = self.geometry.neighbour_pos.get(pos)
+        if neighbours is None:  # off the board, no precomputed entry
+            x, y = pos
+            neighbours = [(x2, y2) for x2, y2 in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y))
+                          if 1 <= x2 <= self.size and 1 <= y2 <= self.size]
+        return iter(neighbours)
 
     def get_pos_list(self, side):
         """This goes through all positions in goban
             and returns a list of positions of the given side
         """
-        output = []
-        for pos in self.iterate_goban():
-            if self.goban[pos] == side:
-                output.append(pos)
-        return output
+        code = color_code[side]
+        stones = self.stones
+        pos_of = self.geometry.pos_of
+        return [pos_of[point] for point in self.geometry.points if stones[point] == code]
 
     def print_groups(self, groups):
         """Converts the list of list chains to string format
@@ -181,20 +474,47 @@ class Board:
 
     def key(self):
         """This returns unique key for board.
-              Returns board as string.
+              Returns the 64 bit Zobrist hash of the stones: xor of one random
+              key per (point, colour) with a stone on it. place_stone and
+              remove_chain keep it up to date, so this costs nothing.
               Key can be used for example in super-ko detection
         """
-        stones = [self.goban[pos] for pos in self.iterate_goban()]
-        return string.join(stones, "")
+        return self.hash
+
+    def compute_hash(self):
+        '''Zobrist hash of the stones computed from scratch, see key
+        '''
+        stones = self.stones
+        zobrist = self.geometry.zobrist
+        result = 0
+        for point in self.geometry.points:
+            result ^= zobrist[stones[point]][point]
+        return result
 
     def hash_new_move(self, move):
         '''For ko test, does not have the overhead of make move
+           Returns the key the board would have after the side to move
+           plays move: the new stone and any captured chains are xor-ed
+           into the current hash, nothing is copied.
         '''
-        test_board = deepcopy(self.goban)
-        test_board[move] = self.side
-        stones = [test_board[pos] for pos in self.iterate_goban()]
-        key = string.join(stones, "")
-        return key
+        if move == PASS_MOVE:
+            return self.hash
+        point = self.geometry.point_of[move]
+        zobrist = self.geometry.zobrist
+        side = color_code[self.side]
+        opponent = other_code[side]
+        stones = self.stones
+        chain = self.chain
+        result = self.hash ^ zobrist[side][point]
+        captured = []
+        for neighbour in self.geometry.neighbours[point]:
+            head = chain[neighbour]
+            if (stones[neighbour] == opponent and head not in captured and
+                len(self.chain_libs[head]) == 1):
+                captured.append(head)
+                for stone in self.chain_points(head):
+                    result ^= zobrist[opponent][stone]
+        return result
 
     def change_side(self):
         self.side = other_side[self.side]
@@ -207,16 +527,32 @@ class Board:
         """
         if move==PASS_MOVE:
             return True
-        if move not in self.goban: return False
-        if self.goban[move]!=EMPTY: return False
-        for pos in self.iterate_neighbour(move): # prevent suicide
+        point = self.geometry.point_of.get(move)
+        if point is None: return False
+        return self.legal_point(point)
+
+    def legal_point(self, point):
+        """legal_move for a flat array index, see BoardGeometry
+        """
+        stones = self.stones
+        if stones[point]!=EMPTY_CODE: return False
+        if point==self.ko_point: return False
+        side = color_code[self.side]
+        chain = self.chain
+        chain_libs = self.chain_libs
+        for pos in self.geometry.neighbours[point]: # prevent suicide
+            color = stones[pos]
             # neighboor is empty
-            if self.goban[pos]==EMPTY:
+            if color==EMPTY_CODE:
                 return True
+            if color==BORDER_CODE:
+                continue
+            liberties = len(chain_libs[chain[pos]])
             # neighboor is own chain, check that chain has more that one liberty (prevent suicide)
-            if self.goban[pos]==self.side and self.liberties(pos)>1: return True
+            if color==side:
+                if liberties>1: return True
             # neighboor is opponent, and they only have one liberty = capture
-            if self.goban[pos]==other_side[self.side] and self.liberties(pos)==1:
+            elif liberties==1:
                 return True
         return False
 
@@ -301,9 +637,14 @@ class Board:
             1. the number of empty points your stones surround and
             2. the number of your opponent's stones you've captured
             (both during the game, and dead stones on the board at the end)
+
+            Territory comes from the bounding box checks of group_territory,
+            score_board does the same job with one flood fill.
         """
         liberties_white = []
         liberties_black = []
+        self.territory_white = 0
+        self.territory_black = 0
 
         if self.groups[WHITE]:
             for group in self.groups[WHITE]:
@@ -320,44 +661,57 @@ class Board:
     def liberties(self, pos):
         """Count liberties for group at given position.
               Returns number of liberties.
-              This is simple flood algorith tha keeps track of stones and empty intersections visited.
-              pos_list keeps track of stones we need to visit.
-              pos_list starts with argument pos.
-              We go trough each stone in pos_list.
-              First we check whether we have already seen this position and skip it if it so.
-              Then we go trough each neighbour intersection skipping those we have already seen.
-              If intersection is empty we add to liberty_count and mark this as visited.
-              If intersection belongs to same group we add it to stones to go trough (pos_list).
-              If it gets added more than once that is not problem because we as first step skip stones already seen.
-              It would be more complex to check for duplicates now: we would need to check both seen_pos and pos_list.
-              TODO: add senseis diagram illustrating algorithm.
-        """
-        seen_pos = {}
-        liberty_count = 0
-        group_color = self.goban[pos]
-        pos_list = [pos]
-        while pos_list:
-            pos2 = pos_list.pop()
-            if pos2 in seen_pos: continue
-            seen_pos[pos2] = True
-            for pos3 in self.iterate_neighbour(pos2):
-                if pos3 in seen_pos: continue
-                if self.goban[pos3]==EMPTY:
-                    liberty_count = liberty_count + 1
-                    seen_pos[pos3] = True
-                    continue
-                if self.goban[pos3]==group_color:
-                    pos_list.append(pos3)
-        return liberty_count
+              Every chain keeps the set of its liberties up to date as stones
+              are placed and captured (see place_stone and remove_chain),
+              so this is only a lookup of the size of that set.
+        """
+        return self.liberties_point(self.geometry.point_of[pos])
+
+    def liberties_point(self, point):
+        """liberties for a flat array index, see liberties
+        """
+        head = self.chain[point]
+        if not head: # empty point: its empty neighbours, as the old flood fill did
+            stones = self.stones
+            return len([n for n in self.geometry.neighbours[point] if stones[n] == EMPTY_CODE])
+        return len(self.chain_libs[head])
 
     def group(self, pos):
         '''Find the group that pos exists in
         '''
-        for g in self.groups[self.goban[pos]]:
+        point = self.geometry.point_of[pos]
+        head = self.chain[point]
+        if head:
+            pos_of = self.geometry.pos_of
+            return [pos_of[stone] for stone in self.chain_points(head)]
+        for g in self.groups[EMPTY]:
             if pos in g:
                 return g
         return None
 
+    def chain_points(self, head):
+        '''list of the stones in chain with given head, walks the ring
+        '''
+        next_stone = self.next_stone
+        points = [head]
+        point = next_stone[head]
+        while point != head:
+            points.append(point)
+            point = next_stone[point]
+        return points
+
+    def chain_groups(self, code):
+        '''chains of given colour code as (x, y) lists, oldest first,
+           None if there are none. See Groups.
+        '''
+        stones = self.stones
+        heads = [head for head in self.chain_order if stones[head] == code]
+        if not heads:
+            return None
+        heads.sort(key=self.chain_order.get)
+        pos_of = self.geometry.pos_of
+        return [[pos_of[point] for point in self.chain_points(head)] for head in heads]
+
     def liberties_pos(self, pos):
         '''Find liberties given a pos attached to a group
         '''
@@ -370,12 +724,18 @@ class Board:
     def liberties_group(self, group):
         '''Find liberties given group(list of points)
         '''
-        liberties = {}
+        chain = self.chain
+        point_of = self.geometry.point_of
+        heads = set()
         for pos in group:
-            for neighbour in self.iterate_neighbour(pos):
-                if self.goban[neighbour] == EMPTY:
-                    liberties[neighbour] = True
-        return liberties.keys()
+            head = chain[point_of[pos]]
+            if head:
+                heads.add(head)
+        liberties = set()
+        for head in heads:
+            liberties |= self.chain_libs[head]
+        pos_of = self.geometry.pos_of
+        return [pos_of[point] for point in liberties]
 
 
 
@@ -403,191 +763,426 @@ class Board:
         We stop the algorithm when either step fails to remove any item.
         The resultant set X is then the desired set of unconditionally
         alive Black chains.
+        --
+        A Black-enclosed region is a connected part of the points without
+        a Black stone, it is vital to a chain when all its empty points
+        are liberties of that chain (see is_vital). One flood fill finds
+        the regions together with the chains around them and the chains
+        they are vital to, counting for each chain the region's empty
+        points it touches. After that the two steps run as a work list:
+        a removed chain takes the regions around it out of R, which takes
+        a vital region away from the chains those were vital to, so every
+        chain and region is removed at most once and the whole thing is
+        linear in board size.
+        Returns the alive chains as (x, y) lists, oldest first.
         '''
+        code = color_code[color]
+        stones = self.stones
+        chain = self.chain
+        neighbours = self.geometry.neighbours
+        heads = [head for head in self.chain_order if stones[head] == code]
+        around = dict([(head, []) for head in heads])  # head -> regions next to it
+        vital = dict([(head, []) for head in heads])  # head -> regions vital to it
+        region_vital = []  # region -> heads it is vital to
+        seen = set()
+        for point in self.geometry.points:
+            if stones[point] == code or point in seen: continue
+            seen.add(point)
+            region = len(region_vital)
+            borders = set()
+            touched = {}  # head -> empty points of the region next to it
+            empty_count = 0
+            pos_list = [point]
+            while pos_list:
+                current = pos_list.pop()
+                empty = stones[current] == EMPTY_CODE
+                if empty:
+                    empty_count += 1
+                    libs_of = set()
+                for neighbour in neighbours[current]:
+                    other = stones[neighbour]
+                    if other == code:
+                        head = chain[neighbour]
+                        borders.add(head)
+                        if empty:
+                            libs_of.add(head)
+                    elif other != BORDER_CODE and neighbour not in seen:
+                        seen.add(neighbour)
+                        pos_list.append(neighbour)
+                if empty:
+                    for head in libs_of:
+                        touched[head] = touched.get(head, 0) + 1
+            vital_to = [head for head in borders if touched.get(head, 0) == empty_count]
+            region_vital.append(vital_to)
+            for head in borders:
+                around[head].append(region)
+            for head in vital_to:
+                vital[head].append(region)
+
+        vital_count = dict([(head, len(vital[head])) for head in heads])
+        alive = set(heads)
+        healthy = [True] * len(region_vital)
+        dead = [head for head in heads if vital_count[head] < 2]
+        while dead:
+            head = dead.pop()
+            if head not in alive: continue
+            alive.remove(head)
+            for region in around[head]:
+                if not healthy[region]: continue
+                healthy[region] = False
+                for other in region_vital[region]:
+                    vital_count[other] -= 1
+                    if vital_count[other] < 2 and other in alive:
+                        dead.append(other)
+
+        heads = [head for head in heads if head in alive]
+        heads.sort(key=self.chain_order.get)
+        pos_of = self.geometry.pos_of
+        return [[pos_of[point] for point in self.chain_points(head)] for head in heads]
+
+    def undo_move(self, move=None, captures=None):
+        '''
+        undo a move, see undo. The arguments are not needed any more,
+        the journal knows what the move changed.
+        '''
+        return self.undo()
 
-        repeat = True
-        X = deepcopy(self.groups[color])
-        X_flat = []
-        for group in X:
-            for pos in group:
-                X_flat.append(pos)
-
-        R = deepcopy(self.groups[EMPTY])
-        while repeat:
-            repeat = False
-            X_rem = []
-            for i,group in enumerate(X):
-                vital = 0
-                for region in R:
-                    if self.is_vital(group,region):
-                        vital += 1
-                if vital < 2:
-                    repeat = True
-                    X_rem.append(i)
-                    for pos in group:
-                        X_flat.remove(pos)
-            X_rem.reverse()
-            for i in X_rem:
-                X.pop(i)
-            R_rem = []
-            for i,region in enumerate(R):
-                for pos in region:
-                    flag = False
-                    for nei in self.iterate_neighbour(pos):
-                        if self.goban[nei] != EMPTY and (nei not in X_flat):
-                            #the other color is a neighbour or a point not in X of the same color
-                            repeat = True
-                            flat = True
-                            if i not in R_rem:
-                                R_rem.append(i)
-                            break
-                    if flag: break
-            R_rem.reverse()
-            for i in R_rem:
-                R.pop(i)
-
-            if (len(X) == 0):
-                repeat = False
-
-        return X
-
-    def undo_move(self, move, captures):
+    def undo(self):
         '''
-        undo a move
+        undo the last move made by make_move
         --
+        restore captured chains to board
+        split the chains the move joined
         remove from goban
-        remove from group
-        restore captures to board
-        restore captures to groups
-        change sides
+        restore side, ko point and capture count
+        Everything comes from the journal record of the move, so the cost
+        is proportional to what the move changed, not to the board size.
+        Returns the move undone (PASS_MOVE for a pass), None if there is
+        nothing to undo.
         '''
-        self.goban[move] = EMPTY
-        for group in self.groups[self.side]:
-            if move in group:
-                group.remove(move)
-                break
-        if len(captures) > 0:
-            for pos in captures:
-                self.goban[pos] = other_side[self.side]
-            self.groups[other_side[self.side]].append(captures)
-        self.side = other_side[self.side]
+        if not self.journal:
+            return None
+        point, side, ko_point, counter, merges, captured = self.journal.pop()
+        if point:
+            self.own_chains()
+        self.side = side
+        self.ko_point = ko_point
+        self.chain_counter = counter
+        if not point:
+            return PASS_MOVE
+        remove_code = other_code[color_code[side]]
+        removed = 0
+        for head, order, points in reversed(captured):
+            self.restore_chain(head, order, points, remove_code)
+            removed += len(points)
+        if removed:
+            remove_color = code_color[remove_code]
+            self.captures[remove_color] = self.captures[remove_color] - removed
+        for head1, head2, size2, order1, order2 in reversed(merges):
+            self.split_chains(head1, head2, size2, order1, order2)
+        self.lift_stone(point)
+        return self.geometry.pos_of[point]
+
+    def add_stones(self, moves, color):
+        '''Put stones of given colour on the board without captures,
+           for setup positions (see Game.add_black)
+        '''
+        code = color_code[color]
+        point_of = self.geometry.point_of
+        for move in moves:
+            self.stones[point_of[move]] = code
+        self.rebuild_groups()
+
+    def snapshot(self):
+        '''Compact copy of the position as plain values: (size, side,
+           black captures, white captures, ko point, stones as a string).
+           Cheap to pickle, for sending to other processes, see
+           board_from_snapshot. The journal is not included.
+        '''
+        return (self.size, self.side, self.captures[BLACK], self.captures[WHITE],
+                self.ko_point, self.stones.tostring())
 
     def remove_group(self,  pos):
-        """Recursively remove given group from board and updating capture counts.
-              First we remove this stone and then recursively call ourself to remove neighbour stones.
-        """
-        remove_color = self.goban[pos]
-        self.goban[pos] = EMPTY
-        self.captures[remove_color] = self.captures[remove_color] + 1
-        for pos2 in self.iterate_neighbour(pos):
-            if self.goban[pos2] == remove_color:
-                self.remove_group(pos2)
-
-    def __update_groups(self, move):
-        ''' utility function for updating groups lists
-            Assert: move already made (not EMPTY)
-
-        1. If there are no groups for given side just create a new group
-        and assign the point.
-        2. Look at all neighbors of move and see if it connects to an
-        existing group, if so add to that group.
-        3. Test to see if this move combined groups, if so combine the
-        groups
-        4. If move did not join existing group, create new group with
-        move
-        5. Remove the position from the empty group it is in and note the
-        index of that group
-        6. If the position removed was the last one to be removed from the
-        group, delete the group and be done
-        7. There could be up to 4 empty groups broken off by playing a
-        stone, check to see if neighbors of move are in the empty group
-        just played into, and if so create new temporary groups with each
-        of them.
-        8. Going point by point until all points find a home check to see
-        if they neighbor any point in a given group
-        9. If they neighbor points in two groups those groups get combined
-        10. If the resulting list of temporary groups has more than 1
-        group, pop off the old empty group and add the new split ones
+        """Remove given group from board and updating capture counts.
+        """
+        head = self.chain[self.geometry.point_of[pos]]
+        remove_color = code_color[self.stones[head]]
+        removed = self.remove_chain(head)
+        self.captures[remove_color] = self.captures[remove_color] + len(removed)
+
+    def place_stone(self, point, code, merges=None):
+        '''Put a stone on an empty point and update chains: the new stone
+           starts a chain of its own with its empty neighbours as liberties,
+           it takes a liberty from every neighbour chain and is merged with
+           the chains of its own colour. No legality or capture checks.
+           Merges are recorded in merges if given, see merge_chains.
+           Returns the head of the chain the stone ends up in.
         '''
-        # is this the first move
-        if self.groups[self.side] == None:
-            self.groups[self.side] = [[move]]
-        else:
-            # update group lists
-            groups = []
-            # Does this move connect to an existing group
-            for neighbour in self.iterate_neighbour(move):
-                for i, group in enumerate(self.groups[self.side]):
-                    if neighbour in group:
-                        if(len(groups)==0): #only add to the first one
-                            group.append(move)
-                        if i not in groups: #prevent multiple additions
-                            groups.append(i)
-            # Was not found
-            if len(groups) == 0:
-                self.groups[self.side].append([move])
-            # Found in multiple groups
-            elif len(groups) > 1:
-                groups.sort() #order the groups
-                remove = sorted(groups[1:],reverse=True) #create a list of lists to move
-                for i in remove:
-                    self.groups[self.side][groups[0]] += self.groups[self.side][i]
-                    self.groups[self.side].pop(i)
-
-        # empty group manipulation
-        groups = []
-        # remove from empty group
-        index = 0
-        done = False
-        for i,group in enumerate(self.groups[EMPTY]):
-            if move in group:
-                group.remove(move)
-                index = i
-                if len(group)==0: #last item in group
-                    self.groups[EMPTY].pop(i)
-                    done = True
-                break
-        if not done:
-            original = deepcopy(self.groups[EMPTY][index])
-            for neighbour in self.iterate_neighbour(move):
-                if neighbour in original:
-                    groups.append([neighbour])
-                    original.remove(neighbour)
-            while len(original)>0:
-                for pos in original:
-                    found = []
-                    for i,group in enumerate(groups):
-                        for item in group:
-                            if self.is_neighbour(item,pos):
-                                if len(found)<1:
-                                    group.append(pos)
-                                    original.remove(pos)
-                                if i not in found: #don't double add... results in double remove
-                                    found.append(i)
-                    if len(found) > 1: #combine groups
-                        found.sort() #order the groups
-                        remove = sorted(found[1:],reverse=True) #create a list of lists to move
-                        for i in remove:
-                            groups[found[0]] += groups[i]
-                            groups.pop(i)
-                    if len(groups) == 1:
-                        done = True
-                        break
-                if done: break
-
-            if(len(groups)>1):
-                #out with the old, in with the new
-                self.groups[EMPTY].pop(index)
-                for g in groups:
-                    self.groups[EMPTY].append(g)
+        self.own_chains()
+        stones = self.stones
+        chain = self.chain
+        chain_libs = self.chain_libs
+        neighbours = self.geometry.neighbours[point]
+        stones[point] = code
+        self.hash ^= self.geometry.zobrist[code][point]
+        self.empty_groups = None
+        if self.patterns is not None:
+            self.patterns.update(point, code)
+        empty = self.empty_points
+        index = self.empty_index[point]
+        last = empty.pop()
+        if last != point:
+            empty[index] = last
+            self.empty_index[last] = index
+        self.empty_index[point] = -1
+        chain[point] = point
+        self.next_stone[point] = point
+        chain_libs[point] = set([n for n in neighbours if stones[n] == EMPTY_CODE])
+        self.chain_size[point] = 1
+        self.chain_order[point] = self.chain_counter
+        self.chain_counter += 1
+        head = point
+        for neighbour in neighbours:
+            other = chain[neighbour]
+            if other and other != head:
+                chain_libs[other].discard(point)
+                if stones[neighbour] == code:
+                    head = self.merge_chains(head, other, merges)
+        return head
+
+    def merge_chains(self, head1, head2, merges=None):
+        '''Join two chains: the stones of the smaller one get the head of the
+           bigger one and the two stone rings are spliced together.
+           Appends (kept head, merged head, merged size, kept order, merged
+           order) to merges if given, which is what split_chains needs.
+           Returns the head of the joined chain.
+        '''
+        if self.chain_size[head1] < self.chain_size[head2]:
+            head1, head2 = head2, head1
+        if merges is not None:
+            merges.append((head1, head2, self.chain_size[head2],
+                           self.chain_order[head1], self.chain_order[head2]))
+        chain = self.chain
+        next_stone = self.next_stone
+        point = head2
+        while True:
+            chain[point] = head1
+            point = next_stone[point]
+            if point == head2: break
+        next_stone[head1], next_stone[head2] = next_stone[head2], next_stone[head1]
+        self.chain_libs[head1] |= self.chain_libs.pop(head2)
+        self.chain_size[head1] += self.chain_size.pop(head2)
+        self.chain_order[head1] = min(self.chain_order[head1], self.chain_order.pop(head2))
+        return head1
+
+    def remove_chain(self, head):
+        '''Take a chain off the board, its stones become liberties of the
+           neighbouring chains. Does not touch capture counts.
+           Returns the list of removed points.
+        '''
+        self.own_chains()
+        stones = self.stones
+        chain = self.chain
+        chain_libs = self.chain_libs
+        neighbours = self.geometry.neighbours
+        points = self.chain_points(head)
+        zobrist = self.geometry.zobrist[stones[head]]
+        empty = self.empty_points
+        for point in points:
+            self.hash ^= zobrist[point]
+            stones[point] = EMPTY_CODE
+            chain[point] = 0
+            self.empty_index[point] = len(empty)
+            empty.append(point)
+            if self.patterns is not None:
+                self.patterns.update(point, EMPTY_CODE)
+        for point in points:
+            for neighbour in neighbours[point]:
+                other = chain[neighbour]
+                if other:
+                    chain_libs[other].add(point)
+        del chain_libs[head]
+        del self.chain_size[head]
+        del self.chain_order[head]
+        self.empty_groups = None
+        return points
+
+    def split_chains(self, head1, head2, size2, order1, order2):
+        '''Undo merge_chains (arguments as recorded there). Swapping the
+           two ring links again gives back both rings, the stones of the
+           second get their head back and liberties are recounted.
+        '''
+        chain = self.chain
+        next_stone = self.next_stone
+        next_stone[head1], next_stone[head2] = next_stone[head2], next_stone[head1]
+        point = head2
+        while True:
+            chain[point] = head2
+            point = next_stone[point]
+            if point == head2: break
+        self.chain_size[head1] -= size2
+        self.chain_size[head2] = size2
+        self.chain_order[head1] = order1
+        self.chain_order[head2] = order2
+        self.chain_libs[head1] = self.ring_liberties(head1)
+        self.chain_libs[head2] = self.ring_liberties(head2)
+
+    def ring_liberties(self, head):
+        '''liberty set of a chain counted from its stones
+        '''
+        stones = self.stones
+        neighbours = self.geometry.neighbours
+        liberties = set()
+        for point in self.chain_points(head):
+            for neighbour in neighbours[point]:
+                if stones[neighbour] == EMPTY_CODE:
+                    liberties.add(neighbour)
+        return liberties
+
+    def restore_chain(self, head, order, points, code):
+        '''Undo remove_chain: put back a captured chain (points as returned
+           by remove_chain) with no liberties, taking its points away from
+           the liberties of the chains around it.
+        '''
+        stones = self.stones
+        chain = self.chain
+        next_stone = self.next_stone
+        chain_libs = self.chain_libs
+        neighbours = self.geometry.neighbours
+        zobrist = self.geometry.zobrist[code]
+        empty = self.empty_points
+        empty_index = self.empty_index
+        for i in range(len(points)):
+            point = points[i]
+            stones[point] = code
+            chain[point] = head
+            next_stone[points[i - 1]] = point
+            self.hash ^= zobrist[point]
+            if self.patterns is not None:
+                self.patterns.update(point, code)
+            index = empty_index[point]
+            last = empty.pop()
+            if last != point:
+                empty[index] = last
+                empty_index[last] = index
+            empty_index[point] = -1
+        for point in points:
+            for neighbour in neighbours[point]:
+                other = chain[neighbour]
+                if other and other != head:
+                    chain_libs[other].discard(point)
+        chain_libs[head] = set()
+        self.chain_size[head] = len(points)
+        self.chain_order[head] = order
+        self.empty_groups = None
+
+    def lift_stone(self, point):
+        '''Undo place_stone for a stone that is a chain of its own again:
+           the point becomes empty and a liberty of its neighbour chains.
+        '''
+        stones = self.stones
+        chain = self.chain
+        self.hash ^= self.geometry.zobrist[stones[point]][point]
+        stones[point] = EMPTY_CODE
+        chain[point] = 0
+        if self.patterns is not None:
+            self.patterns.update(point, EMPTY_CODE)
+        del self.chain_libs[point]
+        del self.chain_size[point]
+        del self.chain_order[point]
+        self.empty_index[point] = len(self.empty_points)
+        self.empty_points.append(point)
+        for neighbour in self.geometry.neighbours[point]:
+            other = chain[neighbour]
+            if other:
+                self.chain_libs[other].add(point)
+        self.empty_groups = None
+
+    def rebuild_groups(self):
+        '''Recompute chains from the stones alone, for when stones were
+           changed without place_stone/remove_chain
+        '''
+        self.own_chains()
+        stones = self.stones
+        chain = self.chain
+        next_stone = self.next_stone
+        neighbours = self.geometry.neighbours
+        for point in self.geometry.points:
+            chain[point] = 0
+        self.chain_libs = {}
+        self.chain_size = {}
+        self.chain_order = {}
+        self.empty_groups = None
+        self.empty_points = array('h')
+        self.ko_point = 0
+        self.journal = []  # records no longer match the stones
+        seen = set()
+        for point in self.geometry.points:
+            if point in seen: continue
+            color = stones[point]
+            if color == EMPTY_CODE:
+                self.empty_index[point] = len(self.empty_points)
+                self.empty_points.append(point)
+                continue
+            self.empty_index[point] = -1
+            seen.add(point)
+            points = [point]
+            liberties = set()
+            pos_list = [point]
+            while pos_list:
+                for neighbour in neighbours[pos_list.pop()]:
+                    other = stones[neighbour]
+                    if other == color and neighbour not in seen:
+                        seen.add(neighbour)
+                        points.append(neighbour)
+                        pos_list.append(neighbour)
+                    elif other == EMPTY_CODE:
+                        liberties.add(neighbour)
+            for i in range(len(points)):
+                chain[points[i]] = point
+                next_stone[points[i]] = points[i - 1]
+            self.chain_libs[point] = liberties
+            self.chain_size[point] = len(points)
+            self.chain_order[point] = self.chain_counter
+            self.chain_counter += 1
+        self.hash = self.compute_hash()
+        if self.patterns is not None:
+            self.patterns.reset()
+
+    def empty_regions(self):
+        '''Empty groups: connected empty points as (x, y) lists.
+           Stones changing only mark them stale, they are rebuilt here on
+           the first request after that: one flood fill labels every empty
+           point with its region, then one pass in iterate_goban order
+           fills the lists, so the whole thing is linear in board size.
+        '''
+        if self.empty_groups is not None:
+            return self.empty_groups
+        stones = self.stones
+        neighbours = self.geometry.neighbours
+        label = {}
+        count = 0
+        for point in self.geometry.points:
+            if stones[point] != EMPTY_CODE or point in label: continue
+            label[point] = count
+            pos_list = [point]
+            while pos_list:
+                for neighbour in neighbours[pos_list.pop()]:
+                    if stones[neighbour] == EMPTY_CODE and neighbour not in label:
+                        label[neighbour] = count
+                        pos_list.append(neighbour)
+            count += 1
+        regions = [[] for i in range(count)]
+        for point, pos in zip(self.geometry.points, self.geometry.positions):
+            if point in label:
+                regions[label[point]].append(pos)
+        self.empty_groups = regions
+        return regions
 
     def is_neighbour(self,pos1,pos2):
         '''Utility function for testing if one function is a neighbour of another.
         '''
-        for n in self.iterate_neighbour(pos1):
-            if n == pos2:
-                return True
-        return False
+        return pos2 in self.iterate_neighbour(pos1)
 
     def make_move(self, move, change_sides=True):
         """Make move given in argument.
@@ -597,33 +1192,96 @@ class Board:
 
               Keeps track of groups lists
         """
-        captures = []
         if move==PASS_MOVE:
+            self.journal.append((0, self.side, self.ko_point, self.chain_counter, None, None))
+            self.ko_point = 0
             if change_sides: self.change_side()
             return move
-        if self.legal_move(move):
-            self.goban[move] = self.side #make move
-
-            # update groups
-            self.__update_groups(move)
-
-            # check if a group was captured and needs to be removed
-            remove_color = other_side[self.side]
-            for pos in self.iterate_neighbour(move):
-                if self.goban[pos]==remove_color and self.liberties(pos)==0:
-                    self.remove_group(pos)
-                    # remove from groups list
-                    for i,group in enumerate(self.groups[remove_color]):
-                        if pos in group:
-                            captures = self.groups[remove_color].pop(i)
-                            # if a group is removed, it should be addedd as an empty group.
-                            self.groups[EMPTY].append(captures)
-                            break
-
-            if change_sides: self.change_side() # change side
-            return captures
+        point = self.geometry.point_of.get(move)
+        if point is not None and self.legal_point(point):
+            captures = self.play_point(point)
+            if change_sides:
+                self.change_side() # change side
+            else:
+                self.ko_point = 0 # ko only binds the opponent
+            pos_of = self.geometry.pos_of
+            return [pos_of[p] for p in captures]
         return None
 
+    def play_point(self, point):
+        """make_move for a legal flat array index, without changing sides.
+              Places the stone, removes captured opponent chains and sets
+              ko_point when a lone stone captured a lone stone and is left
+              in atari. Pushes the journal record undo needs.
+              Returns list of captured points.
+        """
+        self.own_chains()
+        stones = self.stones
+        chain = self.chain
+        chain_libs = self.chain_libs
+        side = color_code[self.side]
+        merges = []
+        captured = []
+        self.journal.append((point, self.side, self.ko_point, self.chain_counter, merges, captured))
+        head = self.place_stone(point, side, merges) #make move
+
+        # check if a group was captured and needs to be removed
+        remove_code = other_code[side]
+        captures = []
+        for neighbour in self.geometry.neighbours[point]:
+            if stones[neighbour]==remove_code and not chain_libs[chain[neighbour]]:
+                other = chain[neighbour]
+                order = self.chain_order[other]
+                removed = self.remove_chain(other)
+                captured.append((other, order, removed))
+                captures += removed
+        if captures:
+            remove_color = code_color[remove_code]
+            self.captures[remove_color] = self.captures[remove_color] + len(captures)
+        if len(captures)==1 and self.chain_size[head]==1 and len(chain_libs[head])==1:
+            self.ko_point = captures[0]
+        else:
+            self.ko_point = 0
+        return captures
+
+    def legal_moves(self):
+        """all legal moves (pass not included), from the empty point index
+        """
+        pos_of = self.geometry.pos_of
+        return [pos_of[point] for point in self.empty_points if self.legal_point(point)]
+
+    def random_legal_point(self, skip=None):
+        """flat index of a uniformly random legal move, 0 if there is none.
+              Draws from the empty points that are not rejected yet; a
+              rejected point (suicide, ko, or skip(point) true when skip
+              is given) is swapped behind the ones still to draw from, so
+              no list is built and each draw is O(1).
+        """
+        empty = self.empty_points
+        index = self.empty_index
+        rand = random.random
+        count = len(empty)
+        while count:
+            i = int(rand() * count)
+            point = empty[i]
+            if self.legal_point(point) and not (skip and skip(point)):
+                return point
+            count -= 1
+            last = empty[count]
+            empty[i] = last
+            index[last] = i
+            empty[count] = point
+            index[point] = count
+        return 0
+
+    def random_legal_move(self):
+        """random legal move as (x, y), PASS_MOVE if there is none
+        """
+        point = self.random_legal_point()
+        if point:
+            return self.geometry.pos_of[point]
+        return PASS_MOVE
+
     def __str__(self):
         """Convert position to string suitable for printing to screen.
               Returns board as string.
@@ -645,13 +1303,248 @@ class Board:
             else:
                 board_y_coord = str(y)
             line = board_y_coord + "|"
+            row = y * self.geometry.stride
             for x in range(1, self.size+1):
-                line = line + self.goban[x,y]
+                line = line + code_color[self.stones[row + x]]
             s = s + line + "|" + board_y_coord + "\n"
         s = s + "  +" + "-"*self.size + "+\n"
         s = s + board_x_coords + "\n"
         return s
 
+def board_from_snapshot(snapshot):
+    """Board from Board.snapshot(), chains rebuilt from the stones
+    """
+    size, side, black_captures, white_captures, ko_point, stones = snapshot
+    board = Board(size)
+    board.stones = array('b', stones)
+    board.rebuild_groups()
+    board.side = side
+    board.captures[BLACK] = black_captures
+    board.captures[WHITE] = white_captures
+    board.ko_point = ko_point
+    return board
+
+class Score:
+    """Result of score_board, plain values only so it can be cached.
+          black, white: final score, komi included in white
+          black_territory, white_territory: empty points only reached
+            from that colour
+          black_stones, white_stones: stones on the board
+          black_captures, white_captures: stones of that colour captured
+          dame: empty points reached from both colours or from neither
+          owner: colour code of every flat board index, stones count for
+            their own colour, EMPTY_CODE for dame and off board
+    """
+    def __init__(self, method, komi):
+        self.method = method
+        self.komi = komi
+        self.black = self.white = 0
+        self.black_territory = self.white_territory = 0
+        self.black_stones = self.white_stones = 0
+        self.black_captures = self.white_captures = 0
+        self.dame = 0
+        self.owner = None
+
+    def margin(self):
+        """black score minus white score
+        """
+        return self.black - self.white
+
+    def winner(self):
+        """BLACK or WHITE, EMPTY for a draw
+        """
+        if self.black > self.white:
+            return BLACK
+        if self.white > self.black:
+            return WHITE
+        return EMPTY
+
+def score_board(board, komi=0.0, method=TERRITORY):
+    """Score a Board where dead stones have already been removed.
+          Every empty region is flood filled once and belongs to a colour
+          when stones of only that colour border it, so this is linear in
+          board size. AREA counts stones and territory (Tromp-Taylor),
+          TERRITORY counts territory and captured stones (Japanese
+          counting, same as Board.count_territory means to).
+          Does not change the board; the result only depends on the
+          stones, captures, komi and method, so it can be cached under
+          (board.key(), captures, komi, method), see Game.score.
+          Returns a Score.
+    """
+    result = Score(method, komi)
+    stones = board.stones
+    neighbours = board.geometry.neighbours
+    owner = array('b', [EMPTY_CODE]) * board.geometry.area
+    seen = array('b', [0]) * board.geometry.area
+    count = [0, 0, 0, 0]  # stones by colour code
+    territory = [0, 0, 0, 0]  # empty points by owner code, dame under EMPTY_CODE
+    for point in board.geometry.points:
+        code = stones[point]
+        if code != EMPTY_CODE:
+            owner[point] = code
+            count[code] += 1
+            continue
+        if seen[point]:
+            continue
+        #flood fill the empty region, noting which colours it reaches
+        seen[point] = 1
+        region = [point]
+        reached = 0
+        i = 0
+        while i < len(region):
+            for neighbour in neighbours[region[i]]:
+                other = stones[neighbour]
+                if other == EMPTY_CODE:
+                    if not seen[neighbour]:
+                        seen[neighbour] = 1
+                        region.append(neighbour)
+                elif other != BORDER_CODE:
+                    reached |= other
+            i += 1
+        if reached == BLACK_CODE or reached == WHITE_CODE:
+            for p in region:
+                owner[p] = reached
+        else:
+            reached = EMPTY_CODE
+        territory[reached] += len(region)
+    result.black_territory = territory[BLACK_CODE]
+    result.white_territory = territory[WHITE_CODE]
+    result.dame = territory[EMPTY_CODE]
+    result.black_stones = count[BLACK_CODE]
+    result.white_stones = count[WHITE_CODE]
+    result.black_captures = board.captures[BLACK]
+    result.white_captures = board.captures[WHITE]
+    if method == AREA:
+        result.black = result.black_territory + result.black_stones
+        result.white = result.white_territory + result.white_stones
+    else:
+        result.black = result.black_territory + result.white_captures
+        result.white = result.white_territory + result.black_captures
+    result.white += komi
+    result.owner = owner
+    return result
+
+class MoveLog:
+    """Moves of a game in array columns, one entry per move:
+          points: flat board index of the move, 0 for pass
+          sides: colour that moved
+          captures: number of stones it captured
+          hashes: Board.key() after the move (a gametree.HashColumn)
+          ko_points: flat index of the ko point after the move, 0 for none
+       Entries are found by position from the start (0 first move) or
+       from the end (-1 last move) in constant time.
+    """
+    def __init__(self, size):
+        self.geometry = board_geometry(size)
+        self.points = array('h')
+        self.sides = array('c')
+        self.captures = array('i')
+        self.hashes = HashColumn()
+        self.ko_points = array('h')
+
+    def __len__(self):
+        return len(self.points)
+
+    def append(self, board, move, captures):
+        ''' log move, just made on board with the given captured stones '''
+        if move == PASS_MOVE:
+            self.points.append(0)
+        else:
+            self.points.append(self.geometry.point_of[move])
+        self.sides.append(other_side[board.side])
+        self.captures.append(len(captures))
+        self.hashes.append(board.key())
+        self.ko_points.append(board.ko_point)
+
+    def pop(self):
+        ''' forget the last move '''
+        for column in (self.points, self.sides, self.captures, self.hashes, self.ko_points):
+            column.pop()
+
+    def move(self, index):
+        ''' (x, y) or PASS_MOVE of entry index '''
+        point = self.points[index]
+        if not point:
+            return PASS_MOVE
+        return self.geometry.pos_of[point]
+
+    def passes(self):
+        ''' number of passes in a row at the end '''
+        count = 0
+        points = self.points
+        while count < len(points) and not points[-1 - count]:
+            count += 1
+        return count
+
+class SGFRecorder:
+    """SGF record of a game kept as plain tuples, the sgflib GameTree is
+          only built when asked for (see game_tree), so playing games
+          costs one list append per move.
+          setup: [(property, [sgf points])], AB and AW stones
+          nodes: (parent node, sgf side, move) per move, parent -1 for
+            the first move; an undone move stays, the next move is
+            added as another child of its parent, a variation
+          current: node of the last move, -1 before the first
+    """
+    def __init__(self, size):
+        self.size = size
+        self.setup = []
+        self.nodes = []
+        self.current = -1
+        self.tree = None  # built GameTree, None after any change
+
+    def add_stones(self, prop, moves):
+        ''' AB or AW stones on the root node '''
+        self.setup.append((prop, map(move_to_sgf, moves)))
+        self.tree = None
+
+    def make_move(self, side, move):
+        ''' record move (x, y) or PASS_MOVE by side 'B' or 'W' '''
+        self.nodes.append((self.current, side, move))
+        self.current = len(self.nodes) - 1
+        self.tree = None
+
+    def undo_move(self):
+        ''' step back one move, it is kept as a variation '''
+        if self.current >= 0:
+            self.current = self.nodes[self.current][0]
+            self.tree = None
+
+    def game_tree(self):
+        """sgflib.GameTree of the record, built once per change. Where
+              moves were undone the later line comes first, as the main
+              branch, and the lines taken back follow as variations.
+        """
+        if self.tree is not None:
+            return self.tree
+        root = Node([Property('FF',['4']), #file format
+                     Property('SZ',[str(self.size)]),#board size
+                     Property('AP',['BadukPy'])]) #comment
+        for prop, points in self.setup:
+            root.addProperty(Property(prop, points))
+        firsts = []
+        children = [[] for node in self.nodes]
+        for node in range(len(self.nodes)):
+            parent = self.nodes[node][0]
+            if parent < 0:
+                firsts.append(node)
+            else:
+                children[parent].append(node)
+        self.tree = GameTree([root])
+        #(GameTree, nodes following its last one), no recursion
+        work = [(self.tree, firsts)]
+        while work:
+            tree, following = work.pop()
+            while len(following) == 1:
+                parent, side, move = self.nodes[following[0]]
+                tree.append(Node([Property(side,[move_to_sgf(move)])]))
+                following = children[following[0]]
+            for node in reversed(following):
+                variation = GameTree()
+                tree.variations.append(variation)
+                work.append((variation, [node]))
+        return self.tree
+
 class Game:
     def __init__(self, size):
         """Initialize game:
@@ -659,34 +1552,34 @@ class Game:
         """
         self.size = size
         self.current_board = Board(size)
-        self.sgf_game_tree = GameTree()
-        self.sgf_game_tree.append(Node([Property('FF',['4']), #file format
-                          Property('SZ',[str(self.size)]),#board size
-                          Property('AP',['BadukPy'])])) #comment
-        self.cur = self.sgf_game_tree.cursor()
-        #past boards and moves
-        self.board_history = []  #not used
-        #for super-ko detection
+        #SGF record, see SGFRecorder.game_tree
+        self.sgf_record = SGFRecorder(size)
+        #past boards and moves, see MoveLog
+        self.board_history = MoveLog(size)
+        #for super-ko detection: Board.key() hash -> number of times the
+        #position occurs on the line up to the current move
         self.position_seen = {}
-        self.position_seen[self.current_board.key()] = True
+        self.position_seen[self.current_board.key()] = 1
 
         #game tree
         self.game_tree = GoGameTree()
 
         #TODO: handle komi?
         self.komi = 6.5
+        #score_board results by position, see score
+        self.score_cache = {}
+        #move generator, see generate_move
+        self.engine = None
 
     def add_white(self, moves):
-        for move in moves:
-            self.current_board.goban[move] = WHITE
+        self.current_board.add_stones(moves, WHITE)
         self.game_tree.white_placed = moves
-        self.cur.add_white(map(move_to_sgf,moves))
+        self.sgf_record.add_stones('AW', moves)
 
     def add_black(self, moves):
-        for move in moves:
-            self.current_board.goban[move] = BLACK
+        self.current_board.add_stones(moves, BLACK)
         self.game_tree.black_placed = moves
-        self.cur.add_black(map(move_to_sgf,moves))
+        self.sgf_record.add_stones('AB', moves)
 
     def make_move(self, move):
         """make given move and return new board
@@ -697,14 +1590,18 @@ class Game:
         if not self.current_board.legal_move(move): return None
         board_key = self.current_board.hash_new_move(move) #for ko test
         #add to game tree
-        if not self.game_tree.make_move(move, board_key): return None
-        #update sgf_game_tree
-        self.cur.make_move(move_to_sgf(move),sgf_side[self.current_board.side])
+        if not self.game_tree.make_move(move, board_key, self.current_board.side): return None
+        #update sgf record
+        self.sgf_record.make_move(sgf_side[self.current_board.side], move)
         
         if move!=PASS_MOVE:
-            self.position_seen[board_key] = True
+            self.position_seen[board_key] = self.position_seen.get(board_key, 0) + 1
         captures = self.current_board.make_move(move) #make the move
-        self.game_tree.set_captures(captures)
+        if move==PASS_MOVE:
+            captures = []
+        else:
+            self.game_tree.set_captures(captures)
+        self.board_history.append(self.current_board, move, captures)
         return self.current_board
 
     def undo_move(self):
@@ -712,74 +1609,105 @@ class Game:
               or return None if at beginning.
               Update repetition history and make previous position current.
         """
-        move = self.game_tree.undo_move()
-        if not move: return None
+        node = self.game_tree.undo_move()
+        if node is None: return None
+
+        #the undone line's position is no longer seen
+        if self.game_tree.get_move(node) != PASS_MOVE:
+            board_key = self.game_tree.board_hash[node]
+            count = self.position_seen[board_key] - 1
+            if count:
+                self.position_seen[board_key] = count
+            else:
+                del self.position_seen[board_key]
 
-        #update game tree
-        self.cur.undo_moves()
+        #update sgf record
+        self.sgf_record.undo_move()
         
-        captures = self.game_tree.get_captures()
-        self.current_board.undo_move(move, captures)
+        self.current_board.undo()
+        self.board_history.pop()
         
         return self.current_board
 
-    def score(self):
-        ''' Get the current score
+    def score(self, method=TERRITORY):
+        ''' Get the current score as (black, white), komi included.
+            See score_board, results are cached by position so asking
+            again after every move costs a dict lookup.
         '''
-        self.current_board.count_territory()
-        self.current_board.territory_white += self.komi
+        board = self.current_board
+        key = (board.key(), board.captures[BLACK], board.captures[WHITE], self.komi, method)
+        result = self.score_cache.get(key)
+        if result is None:
+            result = score_board(board, self.komi, method)
+            self.score_cache[key] = result
+        board.territory_black = result.black
+        board.territory_white = result.white
 
-        return (self.current_board.territory_black, self.current_board.territory_white)
+        return (result.black, result.white)
+
+    def legal_move(self, move):
+        """Test move legality on the current board (suicide and simple ko),
+              longer repetitions are caught by make_move
+        """
+        return self.current_board.legal_move(move)
 
     def list_moves(self):
         """return all legal moves including pass move
         """
-        all_moves = [PASS_MOVE]
-        for move in self.current_board.iterate_goban():
-            if self.legal_move(move):
-                all_moves.append(move)
-        return all_moves
+        return [PASS_MOVE] + self.current_board.legal_moves()
 
     def select_random_move(self):
-        """return randomly selected move from all legal moves
+        """return randomly selected move from all legal moves,
+              pass only when there is no other legal move
         """
-        return random.choice(self.list_moves())
+        return self.current_board.random_legal_move()
 
     def generate_move(self):
-        """generate move using random move generator
+        """generate move with UCT search, see search.py. The search is
+              kept between calls so it can reuse what it found about the
+              moves that got played; set self.engine to use another one.
         """
-        return self.select_random_move()
+        if self.engine is None:
+            from search import UCTSearch  # search imports this module
+            self.engine = UCTSearch(self.size, komi=self.komi)
+        return self.engine.generate_move(self)
 
     def __str__(self):
         ''' print sfg string '''
-        return str(self.sgf_game_tree)
+        return str(self.sgf_record.game_tree())
 
     def move_history(self, distance):
         ''' returns a move in the history of the current game
-            uses sgf_game_tree
+            uses board_history
             distance is a positive number,
             1 last move
             2 move before last
             ...
+            None if the game does not have that many moves
         '''
-        if distance < 1:
+        if distance < 1 or distance > len(self.board_history):
             #bad input
             return None
-        cur = self.gametree.cursor()
-        #transverse to the end
-        while not cur.atEnd:
-            cur.next()
+        return self.board_history.move(-distance)
 
-        for i in range(distance):
-            cur.previous()
+    def last_move(self):
+        ''' the move made last, None before the first move '''
+        return self.move_history(1)
 
-        move = None
-        if cur.node.has_key('W'):
-            move = sgf_to_move(cur.node['W'][0])
-        elif cur.node.has_key('B'):
-            move = sgf_to_move(cur.node['W'][0])
+    def game_over(self):
+        ''' true when the last two moves were passes '''
+        return self.board_history.passes() >= 2
 
-        return move
+    def ko_point(self):
+        ''' (x, y) the side to move may not take back right now, None if
+            there is no such point
+        '''
+        if not self.board_history:
+            return None
+        point = self.board_history.ko_points[-1]
+        if not point:
+            return None
+        return self.board_history.geometry.pos_of[point]
 
 
 def main():
@@ -791,9 +1719,7 @@ def main():
         print move_as_string(move, g.size)
         print g.current_board
         #if last 2 moves are pass moves: exit loop
-        if len(g.board_history)>=2 and \
-           g.move_history(1)==PASS_MOVE and \
-           g.move_history(2)==PASS_MOVE:
+        if g.game_over():
             break
 
 def grouping_test():
@@ -833,7 +1759,7 @@ def sgf_test():
     sgfdata = sgffile.read()
     sgffile.close()
     g = game_from_sgf(sgfdata, 0)
-    print g.sgf_game_tree
+    print g
 
     savef = open('save.sgf', 'w')
     savef.write(str(g))
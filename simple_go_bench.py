@@ -0,0 +1,85 @@
+'''
+simple_go_bench
+
+random playout throughput of simple_go.Board, and the cost of cloning
+a position for a playout with Board.copy, eager and lazy
+
+usage: python simple_go_bench.py [size] [seconds]
+'''
+
+import sys, time, random
+from simple_go import Board, PASS_MOVE
+
+def scanned_move(board):
+    ''' random legal move from a scan of the whole board, None if none '''
+    candidates = [m for m in board.iterate_goban() if board.legal_move(m)]
+    if candidates:
+        return random.choice(candidates)
+    return None
+
+def sampled_move(board):
+    ''' random legal move drawn from the board's empty points, None if none '''
+    move = board.random_legal_move()
+    if move == PASS_MOVE:
+        return None
+    return move
+
+def random_playouts(size, seconds, select=scanned_move):
+    ''' play uniformly random legal moves until no move is left or
+        2*size*size moves were made, for about the given number of seconds
+        returns (games, moves, elapsed)
+    '''
+    games = 0
+    moves = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        board = Board(size)
+        for i in range(2 * size * size):
+            move = select(board)
+            if move is None: break
+            board.make_move(move)
+            moves += 1
+        games += 1
+    return games, moves, time.time() - start
+
+def clones(size, seconds, clone, playout):
+    ''' clone a half full position for about the given number of seconds,
+        with a short random playout on every clone if playout is true
+        returns (clones, elapsed)
+    '''
+    root = Board(size)
+    for i in range(size * size / 2):
+        root.make_move(root.random_legal_move())
+    count = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        board = clone(root)
+        if playout:
+            for i in range(size):
+                board.make_move(board.random_legal_move())
+        count += 1
+    return count, time.time() - start
+
+def main():
+    size = 9
+    seconds = 5.0
+    if len(sys.argv) > 1:
+        size = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        seconds = float(sys.argv[2])
+    random.seed(1)
+    print "%dx%d random playouts" % (size, size)
+    for name, select in (("full scan", scanned_move), ("sampled", sampled_move)):
+        games, moves, elapsed = random_playouts(size, seconds, select)
+        print "%-10s games: %d  moves: %d  time: %.2fs" % (name, games, moves, elapsed)
+        print "%-10s %.1f games/sec  %.1f moves/sec" % ("", games / elapsed, moves / elapsed)
+    print "%dx%d clones of a half full board" % (size, size)
+    for name, clone in (("copy", lambda board: board.copy()),
+                        ("lazy copy", lambda board: board.copy(lazy=True))):
+        count, elapsed = clones(size, seconds / 4, clone, False)
+        played, played_elapsed = clones(size, seconds / 4, clone, True)
+        print "%-10s %.1f clones/sec  %.1f clones+%d moves/sec" % (
+            name, count / elapsed, played / played_elapsed, size)
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,38 @@
 import simple_go
 import unittest
+import random
+import os
+import mmap
+import shutil
+import tempfile
 from copy import deepcopy
 
 
+def flood_liberties(board, pos):
+    ''' reference liberty count by plain flood fill over the goban view '''
+    color = board.goban[pos]
+    seen = set([pos])
+    liberties = set()
+    todo = [pos]
+    while todo:
+        for n in board.iterate_neighbour(todo.pop()):
+            if board.goban[n] == simple_go.EMPTY:
+                liberties.add(n)
+            elif board.goban[n] == color and n not in seen:
+                seen.add(n)
+                todo.append(n)
+    return len(liberties)
+
+
+def board_state(board):
+    ''' everything make_move changes, for comparing boards after undo '''
+    rings = dict([(head, board.chain_points(head)) for head in board.chain_libs])
+    return (board.side, board.ko_point, board.key(), dict(board.captures),
+            board.stones.tostring(), [board.chain[p] for p in board.geometry.points],
+            deepcopy(board.chain_libs), dict(board.chain_size), dict(board.chain_order), rings,
+            sorted(board.empty_points), board.groups[simple_go.EMPTY])
+
+
 class TestSequenceFunctions(unittest.TestCase):
 
     def setUp(self):
@@ -51,6 +81,24 @@ class TestSequenceFunctions(unittest.TestCase):
             test += 1
         self.assertEqual(expected, test)
 
+    def test_flat_board(self):
+        ''' tests the flat array and the goban view of it '''
+        geometry = self.board.geometry
+        self.assertEqual(len(self.board.stones), (self.size + 2) ** 2)
+        self.assertEqual(self.board.stones.count(simple_go.BORDER_CODE), 4 * (self.size + 1))
+        self.assertTrue(geometry is simple_go.Board(self.size).geometry)
+        point = geometry.point_of[(1, 1)]
+        self.assertEqual(geometry.pos_of[point], (1, 1))
+        for neighbour in geometry.neighbours[point]:
+            self.assertTrue(neighbour in geometry.points or
+                            self.board.stones[neighbour] == simple_go.BORDER_CODE)
+        self.assertEqual((0, 5) in self.board.goban, False)
+        self.board.make_move((0, 5))
+        self.assertEqual(self.board.goban.values().count(simple_go.EMPTY), self.size * self.size)
+        self.board.make_move((2, 2))
+        self.assertEqual(self.board.goban[2, 2], simple_go.BLACK)
+        self.assertEqual(self.board.get_pos_list(simple_go.BLACK), [(2, 2)])
+
     def test_firstMove(self):
         pos = (3, 3)
         board = self.game.make_move(pos)
@@ -101,6 +149,330 @@ class TestSequenceFunctions(unittest.TestCase):
         self.assertEqual(self.board.liberties(pos3), 4)
         self.assertEqual(self.board.liberties(pos4), 4)
 
+    def test_chain_merge_capture(self):
+        ''' chains merge, lose liberties and get them back on capture '''
+        self.board.make_move((2, 2), False)
+        self.board.make_move((2, 4), False)
+        self.assertEqual(len(self.board.groups[simple_go.BLACK]), 2)
+        self.board.make_move((2, 3), False)
+        self.assertEqual(sorted(self.board.group((2, 2))), [(2, 2), (2, 3), (2, 4)])
+        self.assertEqual(self.board.liberties((2, 4)), 8)
+        self.board.side = simple_go.WHITE
+        for pos in [(1, 2), (1, 3), (1, 4), (2, 1), (2, 5), (3, 2), (3, 3)]:
+            self.board.make_move(pos, False)
+        self.assertEqual(self.board.liberties((2, 2)), 1)
+        self.assertEqual(self.board.liberties((3, 3)), 4)
+        self.board.make_move((3, 4), False)
+        self.assertEqual(self.board.groups[simple_go.BLACK], None)
+        self.assertEqual(self.board.captures[simple_go.BLACK], 3)
+        self.assertEqual(self.board.liberties((3, 3)), 8)
+        self.assertEqual(sorted(self.board.liberties_group(self.board.group((1, 3)))),
+                         [(1, 1), (1, 5), (2, 2), (2, 3), (2, 4)])
+
+    def test_chain_liberties_random(self):
+        ''' chain liberty sets match a flood fill during random games '''
+        random.seed(3)
+        for game in range(3):
+            board = simple_go.Board(7)
+            for i in range(80):
+                moves = [m for m in board.iterate_goban() if board.legal_move(m)]
+                if not moves: break
+                board.make_move(random.choice(moves))
+                for pos in board.iterate_goban():
+                    if board.goban[pos] == simple_go.EMPTY: continue
+                    self.assertEqual(board.liberties(pos), flood_liberties(board, pos))
+
+    def test_empty_regions(self):
+        ''' empty groups split by a wall and join again after a capture '''
+        for i in range(1, self.size + 1):
+            self.board.make_move((4, i), False)
+        regions = self.board.groups[simple_go.EMPTY]
+        self.assertEqual(sorted(map(len, regions)), [3 * self.size, 9 * self.size])
+        self.assertTrue(self.board.groups[simple_go.EMPTY] is regions)  # not recomputed
+        self.board.side = simple_go.WHITE
+        for i in range(1, self.size + 1):
+            self.board.make_move((3, i), False)
+            self.board.make_move((5, i), False)
+        self.assertEqual(self.board.captures[simple_go.BLACK], self.size)
+        regions = self.board.groups[simple_go.EMPTY]
+        self.assertEqual(sorted(map(len, regions)), [self.size, 2 * self.size, 8 * self.size])
+        self.assertEqual(regions[1], [(4, i) for i in range(1, self.size + 1)])
+
+    def test_empty_points(self):
+        ''' the empty point index follows placements and captures '''
+        random.seed(7)
+        board = simple_go.Board(7)
+        geometry = board.geometry
+        for i in range(150):
+            move = board.random_legal_move()
+            if move == simple_go.PASS_MOVE: break
+            self.assertTrue(board.legal_move(move))
+            board.make_move(move)
+            expected = [p for p in geometry.points if board.stones[p] == simple_go.EMPTY_CODE]
+            self.assertEqual(sorted(board.empty_points), sorted(expected))
+            for i, point in enumerate(board.empty_points):
+                self.assertEqual(board.empty_index[point], i)
+        self.assertEqual(sorted(board.legal_moves()),
+                         sorted([m for m in board.iterate_goban() if board.legal_move(m)]))
+
+    def test_board_ko(self):
+        ''' the board itself forbids retaking a ko at once '''
+        for move in [(2, 1), (3, 1), (1, 2), (4, 2), (2, 3), (3, 3), (5, 5), (2, 2)]:
+            self.board.make_move(move)
+        self.assertEqual(self.board.make_move((3, 2)), [(2, 2)])
+        self.assertEqual(self.board.legal_move((2, 2)), False)
+        self.assertTrue((2, 2) not in self.board.legal_moves())
+        self.board.make_move((6, 6))
+        self.board.make_move((7, 7))
+        self.assertEqual(self.board.legal_move((2, 2)), True)
+
+    def test_make_undo_random(self):
+        ''' random make/undo sequences give back the same board '''
+        random.seed(13)
+        for game in range(20):
+            board = simple_go.Board(5)
+            original = deepcopy(board)
+            history = [board_state(board)]
+            for step in range(200):
+                if history[1:] and random.random() < 0.3:
+                    board.undo()
+                    history.pop()
+                    self.assertEqual(board_state(board), history[-1])
+                else:
+                    if random.random() < 0.05:
+                        move = simple_go.PASS_MOVE
+                    else:
+                        move = board.random_legal_move()
+                    board.make_move(move)
+                    history.append(board_state(board))
+            while board.undo():
+                history.pop()
+                self.assertEqual(board_state(board), history[-1])
+            self.assertEqual(board, original)
+            self.assertEqual(board_state(board), board_state(original))
+
+    def test_copy(self):
+        ''' copies, eager and lazy, do not share changes with the original '''
+        random.seed(17)
+        for lazy in (False, True):
+            board = simple_go.Board(7)
+            for i in range(30):
+                board.make_move(board.random_legal_move())
+            state = board_state(board)
+            board2 = board.copy(lazy)
+            self.assertTrue(board2.geometry is board.geometry)
+            self.assertEqual(board2.journal, [])
+            self.assertEqual(board_state(board2), state)
+            copy_states = [board_state(board2)]
+            for i in range(30):
+                board2.make_move(board2.random_legal_move())
+                copy_states.append(board_state(board2))
+            self.assertEqual(board_state(board), state)
+            # the original moving on leaves the copy alone too
+            board3 = board.copy(lazy)
+            for i in range(30):
+                board.make_move(board.random_legal_move())
+            self.assertEqual(board_state(board3), state)
+            while board.undo():
+                pass
+            self.assertEqual(board_state(board3), state)
+            while board2.undo():
+                self.assertEqual(board_state(board2), copy_states[len(board2.journal)])
+        self.assertTrue(isinstance(deepcopy(board), simple_go.Board))
+        self.assertEqual(board_state(deepcopy(board)), board_state(board))
+
+    def test_get_alive(self):
+        ''' Benson: the life_test position, one eye, an eye holding a dead stone '''
+        board = simple_go.Board(5)
+        black = ['A5','A4','B4','C4','C5','D4','E4']
+        white = ['A2','B2','B1','C2','D2','E2','E3']
+        for i in range(7):
+            board.make_move(simple_go.string_as_move(black[i], 5))
+            board.make_move(simple_go.string_as_move(white[i], 5))
+        for color, stones in ((simple_go.BLACK, black), (simple_go.WHITE, white)):
+            alive = board.get_alive(color)
+            self.assertEqual(len(alive), 1)
+            self.assertEqual(sorted(alive[0]),
+                             sorted([simple_go.string_as_move(m, 5) for m in stones]))
+        # filling B5 leaves black with one eye
+        board.make_move(simple_go.string_as_move('B5', 5), False)
+        self.assertEqual(board.get_alive(simple_go.BLACK), [])
+        self.assertEqual(len(board.get_alive(simple_go.WHITE)), 1)
+        # a white stone inside the D5-E5 eye does not make it less of an eye
+        board = simple_go.Board(5)
+        board.add_stones([simple_go.string_as_move(m, 5) for m in black], simple_go.BLACK)
+        board.add_stones([simple_go.string_as_move('D5', 5)], simple_go.WHITE)
+        self.assertEqual(len(board.get_alive(simple_go.BLACK)), 1)
+        self.assertEqual(board.get_alive(simple_go.WHITE), [])
+
+    def test_score_board(self):
+        ''' flood fill scoring, area and territory '''
+        board = simple_go.Board(5)
+        # black wall on column B, white wall on column D, C is dame
+        board.add_stones([(2, y) for y in range(1, 6)], simple_go.BLACK)
+        board.add_stones([(4, y) for y in range(1, 6)], simple_go.WHITE)
+        board.captures[simple_go.WHITE] = 2
+        area = simple_go.score_board(board, 0.5, simple_go.AREA)
+        self.assertEqual((area.black, area.white), (10, 10.5))
+        self.assertEqual((area.black_territory, area.white_territory, area.dame), (5, 5, 5))
+        self.assertEqual(area.winner(), simple_go.WHITE)
+        territory = simple_go.score_board(board, 0.5)
+        self.assertEqual((territory.black, territory.white), (7, 5.5))
+        self.assertEqual(territory.margin(), 1.5)
+        point_of = board.geometry.point_of
+        self.assertEqual(territory.owner[point_of[1, 3]], simple_go.BLACK_CODE)
+        self.assertEqual(territory.owner[point_of[3, 3]], simple_go.EMPTY_CODE)
+        self.assertEqual(territory.owner[point_of[4, 3]], simple_go.WHITE_CODE)
+        # scoring leaves the board alone
+        self.assertEqual(board.territory_black, 0)
+        self.assertEqual(board.captures[simple_go.WHITE], 2)
+
+    def test_game_score(self):
+        ''' Game.score does not add up over calls '''
+        for move in [(2, 2), (12, 12)]:
+            self.game.make_move(move)
+        first = self.game.score()
+        self.assertEqual(self.game.score(), first)
+        self.assertEqual(first, (0, self.game.komi))
+        self.game.make_move((3, 3))
+        self.assertEqual(self.game.score(simple_go.AREA), (2, 1 + self.game.komi))
+        self.board.make_move((1, 1))
+        self.board.count_territory()
+        once = self.board.territory_black
+        self.board.count_territory()
+        self.assertEqual(self.board.territory_black, once)
+
+    def test_game_undo(self):
+        ''' Game.undo_move takes a capture back '''
+        for move in [(2, 1), (1, 1), (5, 5), (3, 3)]:
+            self.game.make_move(move)
+        before = board_state(self.game.current_board)
+        self.game.make_move((1, 2))
+        self.assertEqual(self.game.current_board.captures[simple_go.WHITE], 1)
+        self.assertNotEqual(self.game.undo_move(), None)
+        self.assertEqual(board_state(self.game.current_board), before)
+
+    def test_move_history(self):
+        ''' move log: last moves, ko point, two passes, undo '''
+        game = simple_go.Game(9)
+        self.assertEqual(game.last_move(), None)
+        self.assertEqual(game.ko_point(), None)
+        moves = [(2, 1), (3, 1), (1, 2), (4, 2), (2, 3), (3, 3), (9, 9), (2, 2), (3, 2)]
+        for move in moves:
+            game.make_move(move)
+        self.assertEqual(len(game.board_history), len(moves))
+        self.assertEqual(game.last_move(), (3, 2))
+        self.assertEqual(game.move_history(2), (2, 2))
+        self.assertEqual(game.move_history(len(moves)), (2, 1))
+        self.assertEqual(game.move_history(len(moves) + 1), None)
+        self.assertEqual(game.board_history.captures[-1], 1)
+        self.assertEqual(game.board_history.sides[-1], simple_go.BLACK)
+        self.assertEqual(game.board_history.hashes[-1], game.current_board.key())
+        hashes = game.board_history.hashes
+        self.assertTrue(max([hashes[i] for i in range(len(hashes))]) >= 2 ** 32)  # all 64 bits kept
+        self.assertEqual(game.ko_point(), (2, 2))
+        game.make_move(simple_go.PASS_MOVE)
+        self.assertEqual(game.ko_point(), None)
+        self.assertFalse(game.game_over())
+        game.make_move(simple_go.PASS_MOVE)
+        self.assertTrue(game.game_over())
+        game.undo_move()
+        self.assertFalse(game.game_over())
+        self.assertEqual(game.last_move(), simple_go.PASS_MOVE)
+        self.assertEqual(len(game.board_history), len(moves) + 1)
+
+    def test_sgf_record(self):
+        ''' moves are recorded as tuples, the SGF tree is built on demand '''
+        game = simple_go.Game(9)
+        game.add_black([(3, 3)])
+        for move in [(1, 1), (2, 2), (4, 4)]:
+            game.make_move(move)
+        self.assertEqual(game.sgf_record.tree, None)
+        game.undo_move()
+        game.make_move((5, 5))
+        game.make_move(simple_go.PASS_MOVE)
+        self.assertEqual(str(game),
+                         "(;FF[4]SZ[9]AP[BadukPy]AB[cc];B[aa];W[bb]\n(;B[ee];W[])\n(;B[dd]))")
+        self.assertTrue(game.sgf_record.game_tree() is game.sgf_record.game_tree())
+
+    def test_game_from_sgf(self):
+        ''' games replay from a string, an mmap or a file's index '''
+        data = ('(;FF[4]SZ[9]AB[cc][dd]AW[ee];B[aa];W[ba];B[])\n'
+                '(;SZ[5];B[bb];W[cc](;B[ab])(;B[dd]))')
+        for point in [(1, 1), (9, 9), (3, 7)]:
+            self.assertEqual(simple_go.sgf_to_move(simple_go.move_to_sgf(point)), point)
+        self.assertEqual(simple_go.sgf_to_move(''), simple_go.PASS_MOVE)
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'games.sgf')
+        handle = open(path, 'wb')
+        handle.write(data)
+        handle.close()
+        handle = open(path, 'rb')
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        handle.close()
+        try:
+            for game in (simple_go.game_from_sgf(data), simple_go.game_from_sgf(mapped),
+                         simple_go.game_from_file(path)):
+                self.assertEqual(game.size, 9)
+                board = game.current_board
+                self.assertEqual(board.goban[3, 3], simple_go.BLACK)
+                self.assertEqual(board.goban[4, 4], simple_go.BLACK)
+                self.assertEqual(board.goban[5, 5], simple_go.WHITE)
+                self.assertEqual(board.goban[1, 1], simple_go.BLACK)
+                self.assertEqual(board.goban[2, 1], simple_go.WHITE)
+                self.assertEqual(game.last_move(), simple_go.PASS_MOVE)
+            self.assertEqual(os.listdir(directory), ['games.sgf'])  # no index saved
+            game = simple_go.game_from_file(path, 1, save_index=True)
+            self.assertEqual(sorted(os.listdir(directory)), ['games.sgf', 'games.sgf.idx'])
+            self.assertEqual(game.size, 5)
+            self.assertEqual(game.current_board.goban[3, 3], simple_go.WHITE)
+            self.assertEqual(game.last_move(), (1, 2))
+            self.assertRaises(IndexError, simple_go.game_from_sgf, data, 2)
+            #sides come from the B and W properties, "tt" is a pass
+            game = simple_go.game_from_sgf('(;SZ[9]AB[cc];W[aa];B[tt];W[bb];W[ca])')
+            board = game.current_board
+            self.assertEqual(board.goban[1, 1], simple_go.WHITE)
+            self.assertEqual(board.goban[2, 2], simple_go.WHITE)
+            self.assertEqual(board.goban[3, 1], simple_go.WHITE)
+            self.assertEqual(game.last_move(), (3, 1))
+            self.assertEqual(game.game_tree.side[game.game_tree.current], simple_go.WHITE)
+            self.assertEqual(str(game.sgf_record.game_tree()).count(';W['), 3)
+        finally:
+            mapped.close()
+            shutil.rmtree(directory)
+
+    def test_zobrist_hash(self):
+        ''' incremental hash matches a full recompute and hash_new_move '''
+        random.seed(5)
+        board = simple_go.Board(7)
+        self.assertEqual(board.key(), 0)
+        for i in range(100):
+            moves = [m for m in board.iterate_goban() if board.legal_move(m)]
+            if not moves: break
+            move = random.choice(moves)
+            expected = board.hash_new_move(move)
+            board.make_move(move)
+            self.assertEqual(board.key(), expected)
+            self.assertEqual(board.key(), board.compute_hash())
+
+    def test_zobrist_transposition(self):
+        ''' the same stones reached in a different order hash the same '''
+        board2 = simple_go.Board(self.size)
+        for move in [(1, 1), (5, 5), (2, 2), (6, 6)]:
+            self.board.make_move(move)
+        for move in [(2, 2), (6, 6), (1, 1), (5, 5)]:
+            board2.make_move(move)
+        self.assertEqual(self.board.key(), board2.key())
+        self.assertNotEqual(self.board.key(), simple_go.Board(self.size).key())
+
+    def test_ko_recapture(self):
+        ''' Game rejects retaking a ko straight away '''
+        for move in [(2, 1), (3, 1), (1, 2), (4, 2), (2, 3), (3, 3), (5, 5), (2, 2)]:
+            self.assertNotEqual(self.game.make_move(move), None)
+        self.assertNotEqual(self.game.make_move((3, 2)), None)  # takes the ko
+        self.assertEqual(self.game.current_board.goban[2, 2], simple_go.EMPTY)
+        self.assertEqual(self.game.make_move((2, 2)), None)  # can't take back
+
     def test_string_move_functions(self):
         ''' test string/move conversion functions '''
         test = {(1, 1): "A1", (2, 3): "B3", (5, 5): "E5"}